@@ -1,5 +1,8 @@
 import streamlit as st
 
+import database
+from escala import equipes, manutencao, tarefas
+
 st.set_page_config(layout="wide", page_title="Sistema de Escalas", page_icon="🗓️")
 
 # --- Definicao das Paginas ---
@@ -8,6 +11,7 @@ st.set_page_config(layout="wide", page_title="Sistema de Escalas", page_icon="
 pg_gerador = st.Page("pages/Gerador_de_Escala.py", title="Gerar Escala (Matriz)", icon="🚀", default=True)
 pg_historico = st.Page("pages/Historico_de_escalas.py", title="Histórico e Excel", icon="📂") # Atenção ao 'escalas' minusculo ou maiusculo
 pg_ciclo = st.Page("pages/Gerador_de_ciclo.py", title="Criar Novo Ciclo", icon="🔄")
+pg_carga = st.Page("pages/Analise_de_Carga.py", title="Análise de Carga", icon="📊")
 
 pg_analistas = st.Page("pages/Gerenciar_Analistas.py", title="Gerenciar Analistas", icon="👥")
 pg_indisp = st.Page("pages/Registrar_Indisponibilidade.py", title="Registrar Indisponibilidade", icon="⛔")
@@ -15,9 +19,34 @@ pg_sobreaviso = st.Page("pages/Sobreaviso.py", title="Cadastrar Sobreaviso", ico
 
 pg_config = st.Page("pages/Configuracoes.py", title="Configurações do Sistema", icon="⚙️")
 
+# --- Equipe ---
+# Com equipes cadastradas, cada sessao escolhe a sua e todas as paginas passam a ler/gravar so na particao dela
+def trocar_equipe():
+    # Estado das paginas (ciclo aberto, edicoes) pertence a equipe anterior: ids de ciclo se repetem entre equipes
+    for chave in list(st.session_state.keys()):
+        if chave != "equipe":
+            del st.session_state[chave]
+
+df_equipes = equipes.listar_equipes()
+if df_equipes.empty:
+    database.usar_equipe(None)
+else:
+    nomes_equipes = dict(zip(df_equipes['slug'], df_equipes['nome']))
+    equipe_sel = st.sidebar.selectbox("Equipe", options=[None, *nomes_equipes], key="equipe",
+                                      format_func=lambda slug: nomes_equipes.get(slug, "Padrão"), on_change=trocar_equipe)
+    database.usar_equipe(equipe_sel)
+
+# Versoes das tabelas (chave dos caches) lidas uma vez neste rerun
+database.renovar_versoes()
+
+# Limpeza periodica de indisponibilidades (thread de fundo, uma vez por processo e banco)
+manutencao.agendar()
+# Tarefas de fundo que ficaram na fila quando o processo parou
+tarefas.retomar_pendentes()
+
 # --- Montagem do Menu ---
 pg = st.navigation({
-    "Escala & Geração": [pg_gerador, pg_ciclo, pg_historico],
+    "Escala & Geração": [pg_gerador, pg_ciclo, pg_historico, pg_carga],
     "Gestão de Dados": [pg_analistas, pg_indisp, pg_sobreaviso],
     "Sistema": [pg_config]
 })
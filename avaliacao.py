@@ -0,0 +1,163 @@
+"""
+Avaliacao de qualidade de uma escala gerada (ou salva).
+
+Mede o que o tempo de geracao nao mostra: vagas nao preenchidas por regra de
+staff, espalhamento de horas entre analistas, atendimento das preferencias,
+violacoes da regra de descanso Dom->Sab e cobertura de mentor.
+
+Uso (linha de comando), avaliando todos os ciclos salvos em escala_salva:
+    python avaliacao.py
+    python avaliacao.py --db escala.db --ciclo 2 --json
+"""
+import argparse
+import json
+import sys
+
+import pandas as pd
+
+import engine
+from escala import arquivo, dados, db
+
+TURNOS_TRABALHO = ["Manha", "Noite", "Integral"]
+LINHAS_RODAPE = ["MENTOR", "SOBREAVISO"]
+SEM_MENTOR = ["(Nao Encontrado)", "", None]
+
+
+def avaliar_escala(df_escala, df_analistas, regras_staff, horas_turno, niveis_experientes=None):
+    """
+    Recebe a matriz (analistas x colunas de dia, com ou sem as linhas MENTOR/SOBREAVISO)
+    e devolve um dicionario com as metricas de qualidade.
+    """
+    if niveis_experientes is None:
+        niveis_experientes = dados.REGRAS_QUALIDADE["niveis_experientes"]
+
+    colunas_datas = list(df_escala.columns)
+    df_turnos = df_escala.drop(index=LINHAS_RODAPE, errors='ignore')
+
+    mapa_pref_dia = dict(zip(df_analistas['nome'], df_analistas['pref_dia'])) if not df_analistas.empty else {}
+    mapa_pref_turno = dict(zip(df_analistas['nome'], df_analistas['pref_turno'])) if not df_analistas.empty else {}
+    mapa_experiencia = dict(zip(df_analistas['nome'], df_analistas['nivel'])) if not df_analistas.empty else {}
+
+    # 1. Vagas nao preenchidas por regra (dia_tipo/turno)
+    vagas_nao_preenchidas = {}
+    for coluna_dia in colunas_datas:
+        tipo_dia = engine.classificar_dia(coluna_dia)
+        preenchidas = df_turnos[coluna_dia].value_counts()
+        for turno, quantidade in regras_staff.get(tipo_dia, {}).items():
+            chave = f"{tipo_dia}/{turno}"
+            falta = max(0, int(quantidade) - int(preenchidas.get(turno, 0)))
+            vagas_nao_preenchidas[chave] = vagas_nao_preenchidas.get(chave, 0) + falta
+
+    # 2. Espalhamento de horas (equivalente ao contagem_horas do engine)
+    horas_por_celula = df_turnos.apply(lambda col: col.map(horas_turno)).fillna(0.0).astype(float)
+    contagem_horas = horas_por_celula.sum(axis=1)
+
+    # 3. Preferencias atendidas (dia e turno contam separadamente)
+    consideradas = 0
+    atendidas = 0
+    for nome, linha in df_turnos.iterrows():
+        pref_d = mapa_pref_dia.get(nome, "Tanto faz")
+        pref_t = mapa_pref_turno.get(nome, "Tanto faz")
+        for coluna_dia, turno in linha.items():
+            if turno not in TURNOS_TRABALHO: continue
+            if pref_d and pref_d != "Tanto faz":
+                consideradas += 1
+                if pref_d == engine.classificar_dia(coluna_dia): atendidas += 1
+            if pref_t and pref_t != "Tanto faz":
+                consideradas += 1
+                if (pref_t == "Integral") == (turno == "Integral"): atendidas += 1
+
+    # 4. Violacoes da regra de descanso (trabalhou Domingo e o Sabado seguinte)
+    trabalhando = df_turnos.isin(TURNOS_TRABALHO)
+    violacoes_fds = 0
+    for col_sabado, col_domingo in engine.mapear_domingo_anterior(colunas_datas).items():
+        violacoes_fds += int((trabalhando[col_sabado] & trabalhando[col_domingo]).sum())
+
+    # 5. Cobertura de mentor (linha MENTOR salva ou, se nao houver, experiente trabalhando no dia)
+    if "MENTOR" in df_escala.index:
+        linha_mentor = df_escala.loc["MENTOR"]
+        dias_com_mentor = int((linha_mentor.notna() & ~linha_mentor.isin(SEM_MENTOR)).sum())
+    else:
+        experientes = [nome for nome in df_turnos.index if mapa_experiencia.get(nome) in niveis_experientes]
+        dias_com_mentor = int(trabalhando.loc[experientes].any(axis=0).sum()) if experientes else 0
+
+    total_dias = len(colunas_datas)
+    return {
+        "vagas_nao_preenchidas": vagas_nao_preenchidas,
+        "total_vagas_nao_preenchidas": sum(vagas_nao_preenchidas.values()),
+        "horas_max": float(contagem_horas.max()) if not contagem_horas.empty else 0.0,
+        "horas_min": float(contagem_horas.min()) if not contagem_horas.empty else 0.0,
+        "horas_desvio": float(contagem_horas.std(ddof=0)) if not contagem_horas.empty else 0.0,
+        "taxa_preferencia": (atendidas / consideradas) if consideradas else None,
+        "violacoes_fds": violacoes_fds,
+        "cobertura_mentor": (dias_com_mentor / total_dias) if total_dias else None,
+    }
+
+
+def carregar_escalas_salvas(conn, ids_ciclo=None):
+    """Devolve {id_ciclo: (nome_ciclo, matriz)} a partir de escala_salva, na ordem dos dias do ciclo."""
+    df_salva = pd.read_sql_query(
+        "SELECT id_ciclo, nome_analista, nome_coluna_dia, turno FROM escala_salva", conn)
+    # Ciclos antigos movidos para o Parquet (escala/arquivo.py)
+    ids_arquivados = pd.read_sql_query("SELECT id FROM ciclos WHERE arquivado", conn)['id'].astype(int).tolist()
+    if ids_ciclo:
+        ids_arquivados = [i for i in ids_arquivados if i in ids_ciclo]
+    if ids_arquivados:
+        df_arquivo = arquivo.ler_arquivo(ids_ciclo=ids_arquivados)
+        df_salva = pd.concat([df_salva, df_arquivo[df_salva.columns]], ignore_index=True)
+    df_dias = pd.read_sql_query(
+        "SELECT id_ciclo, nome_coluna FROM ciclo_dias ORDER BY data_dia ASC", conn)
+    df_ciclos = pd.read_sql_query("SELECT id, nome_ciclo FROM ciclos", conn)
+    nomes_ciclo = dict(zip(df_ciclos['id'], df_ciclos['nome_ciclo']))
+
+    escalas = {}
+    for id_ciclo, df_ciclo in df_salva.groupby('id_ciclo'):
+        if ids_ciclo and id_ciclo not in ids_ciclo: continue
+        matriz = df_ciclo.pivot(index='nome_analista', columns='nome_coluna_dia', values='turno')
+        ordem = [c for c in df_dias.loc[df_dias['id_ciclo'] == id_ciclo, 'nome_coluna'] if c in matriz.columns]
+        escalas[int(id_ciclo)] = (nomes_ciclo.get(id_ciclo, str(id_ciclo)), matriz.reindex(columns=ordem or None))
+    return escalas
+
+
+def avaliar_ciclos_salvos(conn, ids_ciclo=None):
+    df_analistas = pd.read_sql_query("SELECT nome, nivel, pref_dia, pref_turno FROM analistas", conn)
+    regras_staff = dados.load_staff_rules_from_db(conn)
+    horas_turno = dados.load_shift_hours_from_db(conn)
+
+    resultados = []
+    for id_ciclo, (nome_ciclo, matriz) in carregar_escalas_salvas(conn, ids_ciclo).items():
+        metricas = avaliar_escala(matriz, df_analistas, regras_staff, horas_turno)
+        resultados.append({"id_ciclo": id_ciclo, "nome_ciclo": nome_ciclo, **metricas})
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Avalia a qualidade das escalas salvas em escala_salva.")
+    parser.add_argument("--db", help="Arquivo SQLite ou URL postgresql:// (padrao: ESCALA_DB_URL/ESCALA_DB)")
+    parser.add_argument("--ciclo", type=int, action="append", help="Avalia apenas este id de ciclo (pode repetir)")
+    parser.add_argument("--json", action="store_true", help="Uma linha JSON por ciclo (para comparar modos/benchmarks)")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db.configurar(args.db)
+    conn = db.get_db_connection()
+    try:
+        resultados = avaliar_ciclos_salvos(conn, args.ciclo)
+    finally:
+        conn.close()
+
+    if not resultados:
+        print("Nenhuma escala salva encontrada.", file=sys.stderr)
+        return 1
+
+    if args.json:
+        for r in resultados:
+            print(json.dumps(r, ensure_ascii=False))
+    else:
+        df = pd.DataFrame(resultados).drop(columns=["vagas_nao_preenchidas"]).set_index("id_ciclo")
+        print(df.to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,39 @@
 import random
-import utils
+from collections import namedtuple
 
+import pandas as pd
+from escala import ausencias, dados
+from escala.descanso import ControleDescanso
+import profiler
+from log_alocacao import LogAlocacao, SLOT_PROCESSADO, SEM_CANDIDATOS, LIMITE_HORAS, DESCANSO, SKILL_FALTANTE
 
-def executar_logica_de_alocacao(df_proposta, df_analistas, colunas_datas, regras_staff, regras_qualidade):
-    log_messages = []
-    log_messages.append("--- Iniciando Alocacao (v12 - Com Preferencias) ---")
 
-    # Carrega dados
-    HORAS_TURNO = utils.load_shift_hours_from_db()
-    MAX_HORAS = utils.load_max_hours_limit()
+# Metadados de cada dia do ciclo, montados uma vez (o loop do engine nao olha o texto do rotulo)
+DiaEscala = namedtuple("DiaEscala", ["coluna", "data", "tipo", "dia_semana"])
 
-    lista_analistas = df_analistas['nome'].tolist()
 
-    # Mapas de Preferencia
-    mapa_pref_dia = dict(zip(df_analistas['nome'], df_analistas['pref_dia']))  # Sabado, Domingo, Tanto faz
-    mapa_pref_turno = dict(zip(df_analistas['nome'], df_analistas['pref_turno']))  # Integral, Curto, Tanto faz
+def classificar_dia(coluna_dia):
+    # Tipo do dia a partir do rotulo da coluna ("17/01\nSab", "18/01\nDom", "21/04\nTiradentes")
+    # So para matrizes sem ciclo_dias tipado (ex: escalas salvas antigas); o engine usa DiaEscala.tipo
+    if "Dom" in coluna_dia:
+        return "Domingo"
+    elif "Sab" in coluna_dia:
+        return "Sabado"
+    return "Feriado"
+
+
+def montar_dias(df_dias_ciclo):
+    # df_dias_ciclo vem de dados.carregar_dias_ciclo (nome_coluna, data_dia, dia_tipo, dia_semana)
+    datas = pd.to_datetime(df_dias_ciclo['data_dia']).dt.date.tolist()
+    tipos = df_dias_ciclo['dia_tipo'].tolist() if 'dia_tipo' in df_dias_ciclo else [None] * len(datas)
+    dias = []
+    for coluna, data, tipo in zip(df_dias_ciclo['nome_coluna'], datas, tipos):
+        dias.append(DiaEscala(coluna, data, tipo if isinstance(tipo, str) else classificar_dia(coluna), data.weekday()))
+    return dias
 
-    # Contadores
-    contagem_turnos = {nome: 0 for nome in lista_analistas}
-    contagem_horas = {nome: 0.0 for nome in lista_analistas}
 
+def mapear_domingo_anterior(colunas_datas):
+    # Liga cada Sabado ao Domingo que veio antes dele no ciclo (regra de descanso) pelo rotulo
     mapa_domingo_anterior = {}
     coluna_domingo_anterior = None
     for col in colunas_datas:
@@ -28,14 +42,82 @@ def executar_logica_de_alocacao(df_proposta, df_analistas, colunas_datas, regras
         elif "Sab" in col and coluna_domingo_anterior:
             mapa_domingo_anterior[col] = coluna_domingo_anterior
             coluna_domingo_anterior = None
+    return mapa_domingo_anterior
 
-    for coluna_dia in colunas_datas:
-        if "Dom" in coluna_dia:
-            tipo_dia = "Domingo"
-        elif "Sab" in coluna_dia:
-            tipo_dia = "Sabado"
+
+def mascaras_de_skill(df_analistas):
+    # {skill: {nome: bool}} calculado uma vez por geracao (NULL/ausente conta como sem a skill)
+    mascaras = {}
+    for skill in dados.SKILLS:
+        if skill in df_analistas:
+            valores = df_analistas[skill].fillna(False).astype(bool).tolist()
         else:
-            tipo_dia = "Feriado"
+            valores = [False] * len(df_analistas)
+        mascaras[skill] = dict(zip(df_analistas['nome'], valores))
+    return mascaras
+
+
+def selecionar_com_skills(candidatos_ordenados, vagas, exigencias, mascaras):
+    """
+    Pega os mais baratos garantindo primeiro o minimo de cada skill exigida no turno.
+    Devolve (selecionados, {skill: quantos faltaram}).
+    """
+    selecionados = []
+    faltas = {}
+    for skill, minimo in exigencias.items():
+        tem_skill = mascaras.get(skill, {})
+        cobertos = sum(1 for nome in selecionados if tem_skill.get(nome))
+        for nome in candidatos_ordenados:
+            if cobertos >= minimo or len(selecionados) >= vagas: break
+            if tem_skill.get(nome) and nome not in selecionados:
+                selecionados.append(nome)
+                cobertos += 1
+        if cobertos < minimo:
+            faltas[skill] = minimo - cobertos
+
+    for nome in candidatos_ordenados:
+        if len(selecionados) >= vagas: break
+        if nome not in selecionados:
+            selecionados.append(nome)
+    return selecionados, faltas
+
+
+@profiler.cronometrar("engine")
+def executar_logica_de_alocacao(df_proposta, df_analistas, dias, regras_staff, regras_qualidade, regras_descanso=None,
+                                saldo_anterior=None, regras_skill=None, horas_turno=None, max_horas=None):
+    # dias: lista de DiaEscala (montar_dias), na ordem das colunas de df_proposta
+    # regras_descanso: None le de configuracao_limites (ver escala/descanso.py)
+    # saldo_anterior: {nome: {"turnos": x, "horas": y}} dos ciclos anteriores (dados.carregar_saldo_anterior)
+    # regras_skill: None le de regras_skill ({dia_tipo: {turno: {skill: minimo}}})
+    # horas_turno / max_horas: None le do banco; passando tudo o engine roda sem tocar no banco (escala/cenarios.py)
+    log = LogAlocacao()
+    log.info("--- Iniciando Alocacao (v12 - Com Preferencias) ---")
+
+    # Carrega dados
+    HORAS_TURNO = horas_turno if horas_turno is not None else dados.load_shift_hours_from_db()
+    MAX_HORAS = max_horas if max_horas is not None else dados.load_max_hours_limit()
+    if regras_descanso is None:
+        regras_descanso = dados.load_rest_rules_from_db()
+    if regras_skill is None:
+        regras_skill = dados.load_skill_rules_from_db()
+
+    lista_analistas = df_analistas['nome'].tolist()
+
+    # Mapas de Preferencia
+    mapa_pref_dia = dict(zip(df_analistas['nome'], df_analistas['pref_dia']))  # Sabado, Domingo, Tanto faz
+    mapa_pref_turno = dict(zip(df_analistas['nome'], df_analistas['pref_turno']))  # Integral, Curto, Tanto faz
+
+    # Contadores (o balanceamento comeca do saldo dos ciclos anteriores; o limite de horas e so deste ciclo)
+    saldo_anterior = saldo_anterior or {}
+    contagem_turnos = {nome: saldo_anterior.get(nome, {}).get("turnos", 0) for nome in lista_analistas}
+    contagem_horas = {nome: 0.0 for nome in lista_analistas}
+
+    descanso = ControleDescanso(lista_analistas, regras_descanso, HORAS_TURNO)
+    mascaras = mascaras_de_skill(df_analistas)
+
+    for dia in dias:
+        coluna_dia = dia.coluna
+        tipo_dia = dia.tipo
 
         regras_do_dia = regras_staff.get(tipo_dia, {})
 
@@ -48,17 +130,30 @@ def executar_logica_de_alocacao(df_proposta, df_analistas, colunas_datas, regras
 
             if vagas_total == 0: continue
 
-            log_messages.append(f"Processando: {coluna_dia} - {turno}")
-
             candidatos = []
+            barrados_por_horas = 0
+            barrados_por_descanso = {}
             for nome in lista_analistas:
                 # Filtro 1: Disponibilidade e Limite de Horas
                 if df_proposta.loc[nome, coluna_dia] == "FOLGA":
-                    if (contagem_horas[nome] + horas_deste) <= MAX_HORAS:
-                        candidatos.append(nome)
+                    if (contagem_horas[nome] + horas_deste) > MAX_HORAS:
+                        barrados_por_horas += 1
+                        continue
+                    # Filtro 2: Regras de descanso (janelas sobre as datas reais)
+                    motivo = descanso.bloqueio(nome, dia, turno)
+                    if motivo:
+                        barrados_por_descanso[motivo] = barrados_por_descanso.get(motivo, 0) + 1
+                        continue
+                    candidatos.append(nome)
+
+            if barrados_por_horas:
+                log.registrar(LIMITE_HORAS, coluna_dia, turno, detalhe=barrados_por_horas, quantidade=barrados_por_horas)
+            if barrados_por_descanso:
+                log.registrar(DESCANSO, coluna_dia, turno, detalhe=barrados_por_descanso,
+                              quantidade=sum(barrados_por_descanso.values()))
 
             if not candidatos:
-                log_messages.append(f"  -> ALERTA: Sem candidatos.")
+                log.registrar(SEM_CANDIDATOS, coluna_dia, turno)
                 continue
 
             random.shuffle(candidatos)
@@ -81,23 +176,100 @@ def executar_logica_de_alocacao(df_proposta, df_analistas, colunas_datas, regras
                     if pref_t == "Integral" and turno != "Integral": custo += 50  # Queria Integral, mas turno e curto
                     if pref_t == "Curto" and turno == "Integral": custo += 50  # Queria Curto, mas turno e Integral
 
-                # 4. Regra de Descanso (Dom/Sab)
-                if tipo_dia == "Sabado" and "Sab" in coluna_dia and coluna_dia in mapa_domingo_anterior:
-                    col_domingo = mapa_domingo_anterior[coluna_dia]
-                    if df_proposta.loc[nome, col_domingo] != "FOLGA":
-                        custo += 200  # Penalidade ALTA pra evitar trabalhar fds inteiro
+                # 4. Regra de Descanso (Dom/Sab): penalidade ALTA pra evitar trabalhar fds inteiro
+                custo += descanso.penalidade(nome, dia)
 
                 custo_alocacao[nome] = custo
 
             candidatos.sort(key=lambda nome: custo_alocacao[nome])
 
-            # Aloca (Top X mais baratos)
-            selecionados = candidatos[:vagas_total]
+            # Aloca (Top X mais baratos, garantindo antes a cobertura de skill do turno)
+            exigencias = regras_skill.get(tipo_dia, {}).get(turno, {})
+            if exigencias:
+                selecionados, faltas_skill = selecionar_com_skills(candidatos, vagas_total, exigencias, mascaras)
+                if faltas_skill:
+                    log.registrar(SKILL_FALTANTE, coluna_dia, turno, detalhe=faltas_skill, quantidade=sum(faltas_skill.values()))
+            else:
+                selecionados = candidatos[:vagas_total]
 
             for nome in selecionados:
                 df_proposta.loc[nome, coluna_dia] = turno
                 contagem_turnos[nome] += 1
                 contagem_horas[nome] += horas_deste
+                descanso.registrar(nome, dia, turno)
+
+            log.registrar(SLOT_PROCESSADO, coluna_dia, turno, detalhe=len(selecionados))
+
+    log.info("--- Concluido ---")
+    return df_proposta, log
+
+
+def montar_proposta(df_analistas, df_indisp, dias, df_ausencias=None):
+    # Matriz inicial (todos de FOLGA) com as indisponibilidades marcadas como "Ferias" (casadas pela data real).
+    # Folgas avulsas (um dia) e periodos de ausencias viram a mesma mascara analista x dia (escala/ausencias.py)
+    lista_analistas = df_analistas["nome"].tolist()
+    df_proposta = pd.DataFrame("FOLGA", index=lista_analistas, columns=[dia.coluna for dia in dias])
+
+    periodos = []
+    if not df_indisp.empty:
+        periodos.append(pd.DataFrame({"id_analista": df_indisp['id_analista'],
+                                      "data_inicio": df_indisp['data'], "data_fim": df_indisp['data']}))
+    if df_ausencias is not None and not df_ausencias.empty:
+        periodos.append(df_ausencias[['id_analista', 'data_inicio', 'data_fim']])
+    if periodos:
+        fora = ausencias.mascara(df_analistas['id'].tolist(), [dia.data for dia in dias], pd.concat(periodos, ignore_index=True))
+        df_proposta = df_proposta.mask(fora, "Ferias")
+    return df_proposta
+
+
+def definir_mentores(df_escala, df_analistas, niveis_experientes):
+    # Mentor do dia: o Integral (se experiente) ou um experiente sorteado entre Manha/Noite
+    mapa_experiencia = dict(zip(df_analistas['nome'], df_analistas['nivel']))
+    mentor_row = []
+
+    for coluna in df_escala.columns:
+        turno_do_dia = df_escala[coluna]
+        mentor_encontrado = None
+        analista_integral_list = turno_do_dia[turno_do_dia == "Integral"].index.tolist()
+        if analista_integral_list:
+            nome_integral = analista_integral_list[0]
+            if mapa_experiencia.get(nome_integral) in niveis_experientes:
+                mentor_encontrado = nome_integral
+        if not mentor_encontrado:
+            trabalhando_manha = turno_do_dia[turno_do_dia == "Manha"].index.tolist()
+            trabalhando_noite = turno_do_dia[turno_do_dia == "Noite"].index.tolist()
+            candidatos = trabalhando_manha + trabalhando_noite
+            candidatos_experientes = [nome for nome in candidatos if
+                                      mapa_experiencia.get(nome) in niveis_experientes]
+            if candidatos_experientes:
+                random.shuffle(candidatos_experientes)
+                mentor_encontrado = candidatos_experientes[0]
+        mentor_row.append(mentor_encontrado if mentor_encontrado else "(Nao Encontrado)")
+    return mentor_row
+
+
+def definir_sobreaviso(df_escala, df_sobreaviso, mapa_coluna_data):
+    # Quem esta de sobreaviso em cada dia (df_sobreaviso com data_inicio/data_fim ja em date)
+    sobreaviso_row = []
+    for coluna in df_escala.columns:
+        dia_atual = mapa_coluna_data.get(coluna)
+        analista_sobreaviso = "(Vazio)"
+        if dia_atual and not df_sobreaviso.empty:
+            match = df_sobreaviso[
+                (df_sobreaviso['data_inicio'] <= dia_atual) &
+                (df_sobreaviso['data_fim'] >= dia_atual)
+                ]
+            if not match.empty:
+                analista_sobreaviso = match.iloc[0]['nome_analista']
+        sobreaviso_row.append(analista_sobreaviso)
+    return sobreaviso_row
+
+
+def adicionar_rodape(df_escala, df_analistas, df_sobreaviso, mapa_coluna_data, niveis_experientes):
+    # Acrescenta as linhas MENTOR e SOBREAVISO e ordena os analistas por nome
+    df_escala.loc["MENTOR"] = definir_mentores(df_escala, df_analistas, niveis_experientes)
+    df_escala.loc["SOBREAVISO"] = definir_sobreaviso(df_escala, df_sobreaviso, mapa_coluna_data)
 
-    log_messages.append("--- Concluido ---")
-    return df_proposta, log_messages
\ No newline at end of file
+    linhas_analistas = sorted([nome for nome in df_escala.index if nome not in ["MENTOR", "SOBREAVISO"]])
+    linhas_ordenadas = linhas_analistas + ["MENTOR", "SOBREAVISO"]
+    return df_escala.reindex(index=linhas_ordenadas)
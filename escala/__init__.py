@@ -0,0 +1,15 @@
+"""
+Geracao de escalas sem Streamlit (CLI e API Python para lotes).
+
+    python -m escala generate --ciclo 3 --db escala.db --salvar --xlsx saida/
+
+    from escala import gerar_ciclo, gerar_lote
+"""
+
+
+def __getattr__(nome):
+    # Import preguicoso: "import escala.db" nao deve carregar pandas/engine junto
+    if nome in ("gerar_ciclo", "gerar_lote", "listar_ciclos"):
+        from escala import lote
+        return getattr(lote, nome)
+    raise AttributeError(nome)
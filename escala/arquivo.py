@@ -0,0 +1,152 @@
+"""
+Arquivo morto em Parquet comprimido: escalas salvas particionadas por ano/ciclo e
+folgas antigas (retencao do escala/manutencao.py) por ano:
+
+    <pasta>/escalas/ano=2026/id_ciclo=12/<arquivo>.parquet
+    <pasta>/indisponibilidades/ano=2025/<arquivo>.parquet
+    <pasta>/ausencias/ano=2025/<arquivo>.parquet
+
+arquivar_ciclos(meses) copia para o Parquet as escalas dos ciclos que terminaram ha
+mais de `meses` meses, marca ciclos.arquivado e apaga as linhas de escala_salva (o
+resumo_analista_ciclo fica, entao saldo e Analise de Carga nao mudam). A tabela quente
+fica so com os ciclos recentes.
+
+dados.carregar_escala_salva le daqui quando o ciclo esta arquivado; ler_arquivo() usa
+pyarrow.dataset com o filtro empurrado para as particoes (so abre os arquivos do ciclo/ano).
+
+Pasta: ESCALA_ARQUIVO/<particao> ou, sem a variavel, <arquivo do banco>_arquivo ao lado do
+SQLite (escala_arquivo/, escala.suporte_arquivo/). No Postgres a particao e o schema da equipe.
+"""
+import os
+import re
+import shutil
+from datetime import date, datetime
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from escala import db, resumo
+
+COLUNAS = ["nome_analista", "nome_coluna_dia", "turno", "data_salvamento"]
+MESES_PADRAO = 6
+
+
+def pasta_arquivo():
+    dsn = db.get_dsn()
+    if db.usando_postgres():
+        schema = re.search(r"search_path%3D(\w+)", dsn)
+        particao = schema.group(1) if schema else "public"
+        return os.path.join(os.environ.get("ESCALA_ARQUIVO", "escala_arquivo"), particao)
+    caminho = dsn[len("sqlite:///"):] if dsn.startswith("sqlite:///") else dsn
+    raiz, _ = os.path.splitext(caminho)
+    if "ESCALA_ARQUIVO" in os.environ:
+        return os.path.join(os.environ["ESCALA_ARQUIVO"], os.path.basename(raiz))
+    return f"{raiz}_arquivo"
+
+
+def ciclos_para_arquivar(conn, meses=MESES_PADRAO):
+    """Ciclos com escala na tabela quente que terminaram antes de hoje - meses."""
+    limite = date.today() - relativedelta(months=meses)
+    return pd.read_sql_query(f"""
+        SELECT c.id, c.nome_ciclo, c.data_inicio, c.data_fim
+        FROM ciclos c
+        WHERE c.data_fim < '{limite}'
+        AND c.id IN (SELECT DISTINCT id_ciclo FROM escala_salva)
+        ORDER BY c.data_inicio
+    """, conn)
+
+
+def arquivar_ciclos(meses=MESES_PADRAO, ids_ciclo=None):
+    """
+    Move as escalas dos ciclos fechados para o Parquet. ids_ciclo restringe a lista.
+    Devolve [(id_ciclo, linhas)]. O Parquet e gravado antes da transacao: se o banco
+    falhar, o ciclo continua na tabela quente e a proxima execucao regrava o arquivo.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    db.init_all_db_tables()
+    pasta = os.path.join(pasta_arquivo(), "escalas")
+    conn = db.get_db_connection()
+    try:
+        df_ciclos = ciclos_para_arquivar(conn, meses)
+        if ids_ciclo:
+            df_ciclos = df_ciclos[df_ciclos['id'].isin(ids_ciclo)]
+        if df_ciclos.empty:
+            return []
+
+        # Garante o resumo dos ciclos antes de tirar as linhas da tabela quente
+        from escala import dados
+        resumo.preencher_ciclos_faltantes(conn, dados.load_shift_hours_from_db(conn))
+
+        arquivados = []
+        for id_ciclo, data_inicio in zip(df_ciclos['id'], df_ciclos['data_inicio']):
+            id_ciclo = int(id_ciclo)
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(COLUNAS)} FROM escala_salva WHERE id_ciclo = {id_ciclo}", conn)
+            df['data_salvamento'] = df['data_salvamento'].astype(str)
+            df['ano'] = pd.Timestamp(data_inicio).year
+            df['id_ciclo'] = id_ciclo
+            pq.write_to_dataset(
+                pa.Table.from_pandas(df, preserve_index=False), pasta,
+                partition_cols=["ano", "id_ciclo"], compression="zstd",
+                existing_data_behavior="delete_matching",
+            )
+
+            db.run_query(conn, "UPDATE ciclos SET arquivado = TRUE WHERE id = ?", (id_ciclo,))
+            db.run_query(conn, "DELETE FROM escala_salva WHERE id_ciclo = ?", (id_ciclo,))
+            conn.commit()
+            arquivados.append((id_ciclo, len(df)))
+        return arquivados
+    finally:
+        conn.close()
+
+
+def ler_arquivo(ids_ciclo=None, anos=None, nomes_analista=None):
+    """
+    Linhas arquivadas (id_ciclo, nome_analista, nome_coluna_dia, turno, data_salvamento).
+    Os filtros viram um predicado do pyarrow.dataset: particoes de outros anos/ciclos nem sao abertas.
+    """
+    pasta = os.path.join(pasta_arquivo(), "escalas")
+    colunas_saida = ["id_ciclo", *COLUNAS]
+    if not os.path.isdir(pasta):
+        return pd.DataFrame(columns=colunas_saida)
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(pasta, format="parquet", partitioning="hive")
+    filtro = None
+    for campo, valores in (("id_ciclo", ids_ciclo), ("ano", anos), ("nome_analista", nomes_analista)):
+        if valores:
+            condicao = ds.field(campo).isin(list(valores))
+            filtro = condicao if filtro is None else filtro & condicao
+    tabela = dataset.to_table(columns=colunas_saida, filter=filtro)
+    df = tabela.to_pandas()
+    df['id_ciclo'] = df['id_ciclo'].astype(int)
+    return df
+
+
+def arquivar_registros(df, conjunto="indisponibilidades", coluna_data="data"):
+    """
+    Acrescenta linhas removidas pela retencao (folgas ou ausencias) a <pasta>/<conjunto>,
+    uma particao por ano de coluna_data. Datas e textos vao como texto.
+    """
+    if df.empty:
+        return 0
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df.astype({coluna: str for coluna in df.columns if df[coluna].dtype == object})
+    df['ano'] = pd.to_datetime(df[coluna_data]).dt.year
+    # Nome unico por gravacao: execucoes seguintes acrescentam arquivos na mesma particao
+    pq.write_to_dataset(
+        pa.Table.from_pandas(df, preserve_index=False), os.path.join(pasta_arquivo(), conjunto),
+        partition_cols=["ano"], compression="zstd", existing_data_behavior="overwrite_or_ignore",
+        basename_template=f"{datetime.now():%Y%m%d%H%M%S%f}-{{i}}.parquet",
+    )
+    return len(df)
+
+
+def apagar_arquivo():
+    # Usado pelo "RESETAR TUDO" da pagina Configuracoes
+    shutil.rmtree(pasta_arquivo(), ignore_errors=True)
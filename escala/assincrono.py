@@ -0,0 +1,74 @@
+"""
+Carga concorrente das leituras de uma pagina.
+
+    carga = assincrono.carregar_tudo({
+        "analistas": dados.carregar_dados_locais,
+        "regras_staff": dados.load_staff_rules_from_db,
+        "dias": (dados.carregar_dias_ciclo, id_ciclo),
+    })
+    df_dias = carga["dias"]
+
+Cada carregador roda numa thread (asyncio.to_thread) e abre a propria conexao
+(get_read_connection / get_db_connection), entao a pagina espera mais ou menos
+a consulta mais lenta em vez da soma de todas. sqlite3 e psycopg2 soltam o GIL
+enquanto esperam o banco, e os carregadores continuam sendo as funcoes
+sincronas de escala/dados.py (pandas.read_sql_query precisa de uma conexao DB-API).
+
+carregar_tudo_async() serve para quem ja esta num loop; carregar_tudo() e a
+ponte sincrona usada pelo Streamlit e pela CLI.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import profiler
+
+# Igual ao pool de leitura do SQLite (db.TAMANHO_POOL_LEITURA)
+MAX_CONCORRENCIA = 8
+
+
+def _normalizar(tarefa):
+    # Aceita func ou (func, *args)
+    if callable(tarefa):
+        return tarefa, ()
+    func, *args = tarefa
+    return func, tuple(args)
+
+
+async def carregar_tudo_async(tarefas, ignorar_erros=False, inicializar=None):
+    """
+    tarefas: {nome: func | (func, *args)}. Devolve {nome: resultado} na mesma ordem.
+    ignorar_erros=True devolve a excecao no lugar do resultado em vez de propagar.
+    inicializar: chamado no inicio de cada thread (o adaptador Streamlit liga o contexto do rerun).
+    """
+    execucao = profiler.execucao_atual()
+    limite = asyncio.Semaphore(MAX_CONCORRENCIA)
+
+    def executar(func, args):
+        # Queries e conexoes das threads contam no rerun que disparou a carga
+        profiler.usar_execucao(execucao)
+        if inicializar is not None:
+            inicializar()
+        return func(*args)
+
+    async def rodar(func, args):
+        async with limite:
+            return await asyncio.to_thread(executar, func, args)
+
+    nomes = list(tarefas)
+    resultados = await asyncio.gather(
+        *(rodar(*_normalizar(tarefas[nome])) for nome in nomes),
+        return_exceptions=ignorar_erros,
+    )
+    return dict(zip(nomes, resultados))
+
+
+def carregar_tudo(tarefas, ignorar_erros=False, inicializar=None):
+    """Ponte sincrona para carregar_tudo_async (ver o docstring do modulo)."""
+    corrotina = carregar_tudo_async(tarefas, ignorar_erros, inicializar)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(corrotina)
+    # Ja existe um loop nesta thread (notebook, servidor async): roda o nosso em outra
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="escala-carga") as executor:
+        return executor.submit(asyncio.run, corrotina).result()
@@ -0,0 +1,71 @@
+"""
+Ausencias em periodo (ferias, licencas): uma linha (id_analista, data_inicio, data_fim, tipo)
+por pedido na tabela ausencias, em vez de uma linha por dia em indisponibilidades.
+Folgas avulsas continuam em indisponibilidades.
+
+Para montar a escala, mascara() cruza os periodos com as datas do ciclo de uma vez
+(numpy, periodos x dias) e devolve a matriz analista x dia de quem esta fora.
+"""
+import numpy as np
+import pandas as pd
+
+from escala import db
+
+TIPOS = ["Ferias", "Licenca"]
+
+
+def registrar(conn, linhas):
+    """Grava [(id_analista, data_inicio, data_fim, tipo, data_importacao)]; o mesmo periodo repetido so atualiza a data de importacao. Sem commit."""
+    if not linhas:
+        return 0
+    db.run_many(conn, """
+        INSERT INTO ausencias (id_analista, data_inicio, data_fim, tipo, data_importacao)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (id_analista, data_inicio, data_fim, tipo) DO UPDATE SET data_importacao = excluded.data_importacao
+    """, linhas)
+    return len(linhas)
+
+
+def carregar(data_inicio=None, data_fim=None, conn=None):
+    """Ausencias que cruzam [data_inicio, data_fim] (sem limites: todas)."""
+    filtros, params = [], []
+    if data_inicio is not None:
+        filtros.append("data_fim >= ?")
+        params.append(str(data_inicio))
+    if data_fim is not None:
+        filtros.append("data_inicio <= ?")
+        params.append(str(data_fim))
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    sql = f"SELECT * FROM ausencias {where}"
+    if db.usando_postgres():
+        sql = sql.replace('?', '%s')
+
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        if fechar: conn.close()
+
+
+def mascara(ids_analista, datas, df_periodos):
+    """
+    Matriz booleana len(ids_analista) x len(datas): True onde algum periodo do analista cobre a data.
+    df_periodos: id_analista, data_inicio, data_fim (inclusive). Analistas fora de ids_analista sao ignorados.
+    """
+    resultado = np.zeros((len(ids_analista), len(datas)), dtype=bool)
+    if df_periodos is None or df_periodos.empty or not len(datas):
+        return resultado
+    linha_por_id = {id_analista: i for i, id_analista in enumerate(ids_analista)}
+    linhas = df_periodos['id_analista'].map(linha_por_id)
+    validos = linhas.notna().to_numpy()
+    if not validos.any():
+        return resultado
+
+    dias = pd.to_datetime(pd.Series(list(datas))).to_numpy()
+    inicios = pd.to_datetime(df_periodos['data_inicio']).to_numpy()[validos]
+    fins = pd.to_datetime(df_periodos['data_fim']).to_numpy()[validos]
+    # periodos x dias; cada periodo marca a linha do seu analista
+    cobre = (inicios[:, None] <= dias[None, :]) & (fins[:, None] >= dias[None, :])
+    np.logical_or.at(resultado, linhas[validos].astype(int).to_numpy(), cobre)
+    return resultado
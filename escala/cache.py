@@ -0,0 +1,191 @@
+"""
+Cache compartilhado para dados de referencia que quase nunca mudam
+(analistas, regras de staff, horas por turno, feriados do Banco Mestre).
+
+    @cache.compartilhado("analistas", ttl=600)
+    def carregar_analistas_ativos(conn=None): ...
+
+A chave leva o banco, a funcao, os argumentos e a versao das tabelas declaradas
+(db.versoes): uma escrita numa delas faz a proxima leitura ir ao banco, e o ttl
+limita a idade de qualquer entrada. DataFrames sao guardados em Parquet
+(pyarrow, que ja vem com o Streamlit); o resto em pickle.
+
+Backend (variavel de ambiente ESCALA_CACHE ou configurar()):
+    vazio / "memoria"              LRU dentro do processo (padrao)
+    caminho.db / sqlite:///...     arquivo SQLite (WAL + mmap) que as replicas do mesmo host dividem
+    "desligado"                    sem cache
+
+Chamadas com conexao externa (ou qualquer argumento que nao seja str/int/float/bool/None)
+vao direto ao banco. Falhas do cache nunca derrubam a leitura: viram um miss.
+"""
+import collections
+import functools
+import hashlib
+import io
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import profiler
+from escala import db
+
+TTL_PADRAO = 600
+
+_backend = None
+_backend_configurado = False
+
+
+class CacheMemoria:
+    """LRU no processo: divide as entradas entre as sessoes de uma replica."""
+
+    def __init__(self, max_itens=256):
+        self.max_itens = max_itens
+        self._itens = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def ler(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira, dados = item
+            if expira < time.time():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return dados
+
+    def gravar(self, chave, dados, ttl):
+        with self._lock:
+            self._itens[chave] = (time.time() + ttl, dados)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+class CacheArquivo:
+    """Arquivo SQLite lido e gravado por todas as replicas do host (uma conexao por thread)."""
+
+    def __init__(self, caminho, max_itens=1024):
+        self.caminho = caminho
+        self.max_itens = max_itens
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={64 * 1024 * 1024}")
+            conn.execute("CREATE TABLE IF NOT EXISTS entradas (chave TEXT PRIMARY KEY, expira REAL NOT NULL, dados BLOB NOT NULL)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def ler(self, chave):
+        linha = self._conn().execute("SELECT expira, dados FROM entradas WHERE chave = ?", (chave,)).fetchone()
+        if linha is None or linha[0] < time.time():
+            return None
+        return linha[1]
+
+    def gravar(self, chave, dados, ttl):
+        conn = self._conn()
+        agora = time.time()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO entradas (chave, expira, dados) VALUES (?, ?, ?)", (chave, agora + ttl, dados))
+            # Limpeza na propria gravacao: vencidas e o excedente que expira primeiro
+            conn.execute("DELETE FROM entradas WHERE expira < ?", (agora,))
+            conn.execute("DELETE FROM entradas WHERE chave NOT IN (SELECT chave FROM entradas ORDER BY expira DESC LIMIT ?)",
+                         (self.max_itens,))
+
+    def limpar(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entradas")
+
+
+def _criar_backend(valor):
+    valor = (valor or "memoria").strip()
+    if valor == "desligado":
+        return None
+    if valor == "memoria":
+        return CacheMemoria()
+    return CacheArquivo(valor[len("sqlite:///"):] if valor.startswith("sqlite:///") else valor)
+
+
+def configurar(backend=None):
+    # backend: objeto com ler/gravar, texto no formato do ESCALA_CACHE ou None (volta ao ambiente)
+    global _backend, _backend_configurado
+    if backend is None:
+        _backend, _backend_configurado = None, False
+    else:
+        _backend = _criar_backend(backend) if isinstance(backend, str) else backend
+        _backend_configurado = True
+
+
+def backend_atual():
+    global _backend, _backend_configurado
+    if not _backend_configurado:
+        _backend = _criar_backend(os.environ.get("ESCALA_CACHE"))
+        _backend_configurado = True
+    return _backend
+
+
+def _serializar(valor):
+    if isinstance(valor, pd.DataFrame):
+        try:
+            buffer = io.BytesIO()
+            valor.to_parquet(buffer)
+            return b"P" + buffer.getvalue()
+        except Exception:
+            pass  # coluna que o Arrow nao converte (tipos misturados): vai em pickle
+    return b"K" + pickle.dumps(valor)
+
+
+def _desserializar(dados):
+    if dados[:1] == b"P":
+        return pd.read_parquet(io.BytesIO(dados[1:]))
+    return pickle.loads(dados[1:])
+
+
+def _argumentos_simples(args, kwargs):
+    return all(v is None or isinstance(v, (str, int, float, bool)) for v in (*args, *kwargs.values()))
+
+
+def compartilhado(*tabelas, ttl=TTL_PADRAO):
+    def decorador(func):
+        nome = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            backend = backend_atual()
+            if backend is None or not _argumentos_simples(args, kwargs):
+                return func(*args, **kwargs)
+            # Hash da chave: o DSN do Postgres (com senha) nao vai para o arquivo de cache
+            texto = repr((db.get_dsn(), nome, args, sorted(kwargs.items()), db.versoes(tabelas)))
+            chave = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+            try:
+                dados = backend.ler(chave)
+            except Exception:
+                dados = None
+            if dados is not None:
+                profiler.contar("cache_hits")
+                return _desserializar(dados)
+
+            valor = func(*args, **kwargs)
+            try:
+                backend.gravar(chave, _serializar(valor), ttl)
+            except Exception:
+                pass
+            return valor
+        wrapper.tabelas = tabelas
+        return wrapper
+    return decorador
@@ -0,0 +1,103 @@
+"""
+Calendario dos ciclos: quais dias entram na escala (fins de semana e feriados do Banco Mestre).
+
+Monta os dias com pd.date_range e mascaras vetorizadas e grava o ciclo inteiro
+com um INSERT do ciclo + um executemany dos dias.
+"""
+from datetime import timedelta
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from escala import db
+
+DIAS_SEMANA = {5: "Sab", 6: "Dom"}
+TIPOS_DIA = {5: "Sabado", 6: "Domingo"}
+
+
+def fim_do_ciclo(data_inicio):
+    # Ciclo vai do dia escolhido (15) ate o dia 16 do mes seguinte
+    return (data_inicio + relativedelta(months=1)).replace(day=16)
+
+
+def carregar_feriados(conn, data_inicio, data_fim):
+    """Feriados ativos do Banco Mestre no intervalo, como Series {Timestamp: nome_feriado}."""
+    df_mestre = pd.read_sql_query(f"""
+        SELECT data_iso, nome_feriado
+        FROM feriados_anuais
+        WHERE usar_na_escala
+        AND data_iso BETWEEN '{pd.Timestamp(data_inicio).date()}' AND '{pd.Timestamp(data_fim).date()}'
+    """, conn)
+    return pd.Series(df_mestre['nome_feriado'].values, index=pd.to_datetime(df_mestre['data_iso']))
+
+
+def montar_dias_ciclo(data_inicio, data_fim, feriados=None):
+    """
+    Devolve um DataFrame (nome_coluna, data_dia, dia_tipo, dia_semana) com os dias do ciclo que
+    entram na escala: feriados do Banco Mestre (prioridade, com o nome no rotulo) e fins de semana.
+    """
+    dias = pd.Series(pd.date_range(data_inicio, data_fim, freq="D"))
+    if feriados is None:
+        feriados = pd.Series(dtype=object)
+
+    nomes_feriado = dias.map(feriados)
+    eh_feriado = nomes_feriado.notna()
+    eh_fim_de_semana = dias.dt.dayofweek >= 5
+    selecao = eh_feriado | eh_fim_de_semana
+
+    dias = dias[selecao]
+    nomes_feriado = nomes_feriado[selecao].astype(str)
+    eh_feriado = eh_feriado[selecao]
+
+    # Formata bonitinho (nome do feriado cortado em 20 caracteres)
+    nome_curto = nomes_feriado.where(nomes_feriado.str.len() <= 20, nomes_feriado.str[:20] + '...')
+    rotulo = nome_curto.where(eh_feriado, dias.dt.dayofweek.map(DIAS_SEMANA))
+
+    return pd.DataFrame({
+        "nome_coluna": dias.dt.strftime('%d/%m') + "\n" + rotulo,
+        "data_dia": dias.dt.strftime('%Y-%m-%d'),
+        "dia_tipo": pd.Series("Feriado", index=dias.index).where(eh_feriado, dias.dt.dayofweek.map(TIPOS_DIA)),
+        "dia_semana": dias.dt.dayofweek.astype(int),
+    }).reset_index(drop=True)
+
+
+def criar_ciclo(conn, nome_ciclo, data_inicio, data_fim=None, feriados=None):
+    """
+    Grava o ciclo e seus dias (sem commit). feriados pode vir pre-carregado (ex: ano inteiro).
+    Devolve (id_ciclo, quantidade_de_dias).
+    """
+    if data_fim is None:
+        data_fim = fim_do_ciclo(data_inicio)
+    if feriados is None:
+        feriados = carregar_feriados(conn, data_inicio, data_fim)
+
+    df_dias = montar_dias_ciclo(data_inicio, data_fim, feriados)
+
+    id_ciclo = db.inserir_retornando_id(
+        conn,
+        "INSERT INTO ciclos (nome_ciclo, data_inicio, data_fim) VALUES (?, ?, ?)",
+        (nome_ciclo, data_inicio.strftime('%Y-%m-%d'), data_fim.strftime('%Y-%m-%d'))
+    )
+    # Inserimos com ativo=TRUE (Postgres exige True, nao 1)
+    db.run_many(conn,
+        "INSERT INTO ciclo_dias (id_ciclo, nome_coluna, data_dia, ativo, dia_tipo, dia_semana) VALUES (?, ?, ?, TRUE, ?, ?)",
+        [(id_ciclo, nome_coluna, data_dia, dia_tipo, int(dia_semana))
+         for nome_coluna, data_dia, dia_tipo, dia_semana in df_dias.itertuples(index=False)])
+    return id_ciclo, len(df_dias)
+
+
+def criar_ciclos_do_ano(conn, ano, dia_inicio=15, prefixo="Ciclo"):
+    """
+    Cria os 12 ciclos do ano (um por mes, comecando no dia_inicio) carregando os feriados uma vez so.
+    Devolve a lista de (nome_ciclo, id_ciclo, quantidade_de_dias). Sem commit.
+    """
+    inicios = [pd.Timestamp(ano, mes, dia_inicio).date() for mes in range(1, 13)]
+    feriados = carregar_feriados(conn, inicios[0], fim_do_ciclo(inicios[-1]))
+
+    criados = []
+    for data_inicio in inicios:
+        data_fim = fim_do_ciclo(data_inicio)
+        nome_ciclo = f"{prefixo} {data_inicio.strftime('%d/%m')} à {(data_fim - timedelta(days=1)).strftime('%d/%m/%Y')}"
+        id_ciclo, qtd_dias = criar_ciclo(conn, nome_ciclo, data_inicio, data_fim, feriados)
+        criados.append((nome_ciclo, id_ciclo, qtd_dias))
+    return criados
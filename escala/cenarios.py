@@ -0,0 +1,121 @@
+"""
+Simulacao "e se" das regras de geracao, sem gravar nada no banco.
+
+    base = cenarios.carregar_base(id_ciclo)              # le o banco uma vez
+    df = cenarios.comparar(base, {
+        "Atual": {},
+        "Limite 36h": {"max_horas_ciclo": 36},
+        "Sabado reforcado": {"regras_staff": {"Sabado": {"Manha": 6}}},
+    }, workers=4)
+
+Chaves aceitas em cada cenario (o que nao vier fica como no banco):
+    regras_staff      {dia_tipo: {turno: qtd}}, mesclado com as regras atuais
+    max_horas_ciclo   limite de horas por analista no ciclo
+    horas_turno       {turno: horas}, mesclado
+    regras_descanso   {regra: valor}, mesclado (ver escala/descanso.py)
+    regras_skill      {dia_tipo: {turno: {skill: minimo}}}, substitui as atuais
+    usar_saldo        False ignora o saldo dos ciclos anteriores
+
+Cada cenario roda o engine em memoria sobre a mesma base; com workers > 1
+os cenarios vao para processos separados (como no escala.lote).
+"""
+import copy
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import avaliacao
+import engine
+from escala import dados, db
+
+CHAVES_CENARIO = {"regras_staff", "max_horas_ciclo", "horas_turno", "regras_descanso", "regras_skill", "usar_saldo"}
+
+
+def carregar_base(id_ciclo, dsn=None):
+    """Tudo o que o engine precisa para o ciclo, lido uma vez (dicionario picklavel para os workers)."""
+    if dsn:
+        db.configurar(dsn)
+    db.init_all_db_tables()
+    conn = db.get_db_connection()
+    try:
+        pacote = dados.carregar_pacote_ciclo(id_ciclo, conn)
+        if pacote is None:
+            raise ValueError(f"Ciclo {id_ciclo} nao encontrado")
+        return {
+            "id_ciclo": int(id_ciclo),
+            "df_analistas": pacote["df_analistas"],
+            "df_indisp": pacote["df_indisp"],
+            "df_ausencias": pacote["df_ausencias"],
+            "dias": engine.montar_dias(pacote["df_dias_ciclo"]),
+            "regras_staff": dados.load_staff_rules_from_db(conn),
+            "horas_turno": dados.load_shift_hours_from_db(conn),
+            "max_horas_ciclo": dados.load_max_hours_limit(conn),
+            "regras_descanso": dados.load_rest_rules_from_db(conn),
+            "regras_skill": dados.load_skill_rules_from_db(conn),
+            "saldo_anterior": dados.carregar_saldo_anterior(id_ciclo, conn),
+        }
+    finally:
+        conn.close()
+
+
+def aplicar_cenario(base, alteracoes):
+    """Copia da base com as alteracoes do cenario aplicadas."""
+    desconhecidas = set(alteracoes) - CHAVES_CENARIO
+    if desconhecidas:
+        raise ValueError(f"Chave(s) de cenario desconhecida(s): {', '.join(sorted(desconhecidas))}")
+
+    config = {chave: copy.deepcopy(base[chave]) for chave in ("regras_staff", "horas_turno", "regras_descanso", "regras_skill")}
+    for dia_tipo, turnos in alteracoes.get("regras_staff", {}).items():
+        config["regras_staff"].setdefault(dia_tipo, {}).update(turnos)
+    config["horas_turno"].update(alteracoes.get("horas_turno", {}))
+    config["regras_descanso"].update(alteracoes.get("regras_descanso", {}))
+    if "regras_skill" in alteracoes:
+        config["regras_skill"] = copy.deepcopy(alteracoes["regras_skill"])
+    config["max_horas_ciclo"] = float(alteracoes.get("max_horas_ciclo", base["max_horas_ciclo"]))
+    config["saldo_anterior"] = base["saldo_anterior"] if alteracoes.get("usar_saldo", True) else {}
+    return config
+
+
+def rodar_cenario(base, alteracoes, semente=None):
+    """Roda o engine em memoria e devolve as metricas (cobertura, horas, justica) do cenario."""
+    if semente is not None:
+        random.seed(semente)
+    t0 = time.perf_counter()
+    config = aplicar_cenario(base, alteracoes)
+
+    df_proposta = engine.montar_proposta(base["df_analistas"], base["df_indisp"], base["dias"], base["df_ausencias"])
+    df_escala, log = engine.executar_logica_de_alocacao(
+        df_proposta, base["df_analistas"], base["dias"], config["regras_staff"], dados.REGRAS_QUALIDADE,
+        regras_descanso=config["regras_descanso"],
+        saldo_anterior=config["saldo_anterior"],
+        regras_skill=config["regras_skill"],
+        horas_turno=config["horas_turno"],
+        max_horas=config["max_horas_ciclo"],
+    )
+    metricas = avaliacao.avaliar_escala(df_escala, base["df_analistas"], config["regras_staff"], config["horas_turno"])
+    metricas.pop("vagas_nao_preenchidas")
+    return {**log.resumo(), **metricas, "segundos": round(time.perf_counter() - t0, 3)}
+
+
+def _executar(tarefa):
+    base, nome, alteracoes, semente = tarefa
+    try:
+        return {"cenario": nome, **rodar_cenario(base, alteracoes, semente)}
+    except Exception as e:
+        return {"cenario": nome, "erro": str(e)}
+
+
+def comparar(base, cenarios, workers=1, semente=0):
+    """
+    cenarios: {nome: alteracoes}. Todos usam a mesma semente (diferenca vem das regras, nao do sorteio).
+    Devolve um DataFrame com uma linha por cenario.
+    """
+    tarefas = [(base, nome, alteracoes, semente) for nome, alteracoes in cenarios.items()]
+    if workers <= 1 or len(tarefas) <= 1:
+        resultados = [_executar(t) for t in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            resultados = list(executor.map(_executar, tarefas))
+    return pd.DataFrame(resultados).set_index("cenario")
@@ -0,0 +1,149 @@
+import argparse
+import json
+import sys
+
+import pandas as pd
+
+from escala import db, lote
+
+
+def _comando_generate(args):
+    bancos = args.db or [None]
+    if args.equipe:
+        # Cada equipe vira o DSN da sua particao (arquivo ou schema)
+        bancos = [db.dsn_da_equipe(equipe, dsn) for dsn in bancos for equipe in args.equipe]
+    tarefas = []
+    for dsn in bancos:
+        ids = args.ciclo or lote.listar_ciclos(dsn, apenas_pendentes=not args.sobrescrever)
+        tarefas.extend((dsn, id_ciclo) for id_ciclo in ids)
+
+    if not tarefas:
+        print("Nenhum ciclo para gerar.", file=sys.stderr)
+        return 1
+
+    resultados = lote.gerar_lote(
+        tarefas,
+        workers=args.workers,
+        salvar=args.salvar,
+        sobrescrever=args.sobrescrever,
+        pasta_xlsx=args.xlsx,
+        semente=args.semente,
+        usar_saldo=not args.sem_saldo,
+    )
+
+    if args.json:
+        for r in resultados:
+            print(json.dumps(r, ensure_ascii=False, default=str))
+    else:
+        print(pd.DataFrame(resultados).to_string(index=False))
+    return 0 if all(r["status"] != "erro" for r in resultados) else 2
+
+
+def _comando_simular(args):
+    # Import tardio: so quem simula paga o import do engine/avaliacao aqui
+    from escala import cenarios
+
+    with open(args.cenarios, encoding="utf-8") as f:
+        lista_cenarios = json.load(f)
+    if args.incluir_atual and "Atual" not in lista_cenarios:
+        lista_cenarios = {"Atual": {}, **lista_cenarios}
+
+    dsn = db.dsn_da_equipe(args.equipe, args.db) if args.equipe else args.db
+    base = cenarios.carregar_base(args.ciclo, dsn)
+    df = cenarios.comparar(base, lista_cenarios, workers=args.workers, semente=args.semente)
+    if args.json:
+        for nome, linha in df.iterrows():
+            print(json.dumps({"cenario": nome, **linha.dropna().to_dict()}, ensure_ascii=False, default=str))
+    else:
+        print(df.to_string())
+    return 0 if "erro" not in df or df["erro"].isna().all() else 2
+
+
+def _comando_arquivar(args):
+    from escala import arquivo
+
+    dsn = db.dsn_da_equipe(args.equipe, args.db) if args.equipe else args.db
+    if dsn:
+        db.configurar(dsn)
+    arquivados = arquivo.arquivar_ciclos(args.meses, ids_ciclo=args.ciclo)
+    for id_ciclo, linhas in arquivados:
+        print(f"ciclo {id_ciclo}: {linhas} linhas -> {arquivo.pasta_arquivo()}")
+    if not arquivados:
+        print("Nenhum ciclo para arquivar.", file=sys.stderr)
+    return 0
+
+
+def _comando_manutencao(args):
+    from escala import manutencao
+
+    dsn = db.dsn_da_equipe(args.equipe, args.db) if args.equipe else args.db
+    if dsn:
+        db.configurar(dsn)
+    resultado = manutencao.executar(vacuum=True)
+    print(json.dumps(resultado))
+    return 0
+
+
+def _comando_worker(args):
+    from escala import tarefas
+
+    dsn = db.dsn_da_equipe(args.equipe, args.db) if args.equipe else args.db
+    if dsn:
+        db.configurar(dsn)
+    tarefas.processar_fila(intervalo=args.intervalo, uma_vez=args.uma_vez)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m escala", description="Geracao de escalas sem a interface Streamlit.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_gen = sub.add_parser("generate", aliases=["gerar"], help="Gera a escala de um ou mais ciclos")
+    p_gen.add_argument("--ciclo", type=int, action="append",
+                       help="Id do ciclo (pode repetir). Sem --ciclo: todos os ciclos sem escala salva")
+    p_gen.add_argument("--db", action="append",
+                       help="Arquivo SQLite ou URL postgresql:// (pode repetir: uma equipe por banco)")
+    p_gen.add_argument("--equipe", action="append",
+                       help="Equipe cadastrada no banco (pode repetir); usa a particao da equipe em cada --db")
+    p_gen.add_argument("--workers", type=int, default=1, help="Processos em paralelo (padrao: 1)")
+    p_gen.add_argument("--salvar", action="store_true", help="Grava o resultado em escala_salva")
+    p_gen.add_argument("--sobrescrever", action="store_true", help="Gera mesmo se o ciclo ja tiver escala salva")
+    p_gen.add_argument("--xlsx", metavar="PASTA", help="Grava um .xlsx por ciclo nesta pasta")
+    p_gen.add_argument("--semente", type=int, help="Semente do random (resultados reproduziveis)")
+    p_gen.add_argument("--sem-saldo", action="store_true", help="Nao compensa o saldo dos ciclos salvos anteriores")
+    p_gen.add_argument("--json", action="store_true", help="Uma linha JSON por ciclo")
+    p_gen.set_defaults(func=_comando_generate)
+
+    p_sim = sub.add_parser("simular", aliases=["whatif"], help="Compara cenarios de regras num ciclo sem gravar nada")
+    p_sim.add_argument("--ciclo", type=int, required=True, help="Id do ciclo")
+    p_sim.add_argument("--cenarios", required=True, metavar="ARQUIVO.json",
+                       help='JSON {"nome": {"max_horas_ciclo": 36, "regras_staff": {...}}, ...} (ver escala/cenarios.py)')
+    p_sim.add_argument("--db", help="Arquivo SQLite ou URL postgresql://")
+    p_sim.add_argument("--equipe", help="Equipe cadastrada no banco (particao da equipe)")
+    p_sim.add_argument("--workers", type=int, default=1, help="Processos em paralelo (padrao: 1)")
+    p_sim.add_argument("--semente", type=int, default=0, help="Semente do random, a mesma em todos os cenarios")
+    p_sim.add_argument("--incluir-atual", action="store_true", help="Acrescenta o cenario 'Atual' (regras do banco)")
+    p_sim.add_argument("--json", action="store_true", help="Uma linha JSON por cenario")
+    p_sim.set_defaults(func=_comando_simular)
+
+    p_arq = sub.add_parser("arquivar", help="Move as escalas dos ciclos encerrados para o arquivo Parquet")
+    p_arq.add_argument("--meses", type=int, default=6, help="Ciclos encerrados ha mais de N meses (padrao: 6)")
+    p_arq.add_argument("--ciclo", type=int, action="append", help="Arquiva apenas este id de ciclo (pode repetir)")
+    p_arq.add_argument("--db", help="Arquivo SQLite ou URL postgresql://")
+    p_arq.add_argument("--equipe", help="Equipe cadastrada no banco (particao da equipe)")
+    p_arq.set_defaults(func=_comando_arquivar)
+
+    p_man = sub.add_parser("manutencao", help="Remove folgas repetidas, aplica a retencao e otimiza a tabela")
+    p_man.add_argument("--db", help="Arquivo SQLite ou URL postgresql://")
+    p_man.add_argument("--equipe", help="Equipe cadastrada no banco (particao da equipe)")
+    p_man.set_defaults(func=_comando_manutencao)
+
+    p_wrk = sub.add_parser("worker", help="Executa as tarefas de fundo pendentes (importacao, geracao, exportacao)")
+    p_wrk.add_argument("--db", help="Arquivo SQLite ou URL postgresql://")
+    p_wrk.add_argument("--equipe", help="Equipe cadastrada no banco (particao da equipe)")
+    p_wrk.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre consultas a fila vazia (padrao: 2)")
+    p_wrk.add_argument("--uma-vez", action="store_true", help="Sai quando a fila esvaziar")
+    p_wrk.set_defaults(func=_comando_worker)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,494 @@
+"""
+Carregadores e gravacao de dados da escala, sem Streamlit.
+
+O utils.py da aplicacao reexporta estas funcoes e so acrescenta o st.cache_data.
+"""
+import io
+from datetime import datetime
+
+import pandas as pd
+
+import profiler
+from escala import arquivo, db, descanso, resumo
+
+# Regras globais de qualidade
+REGRAS_QUALIDADE = {
+    "min_experientes_por_turno": 1,
+    "niveis_experientes": ["Senior", "Especialista", "Pleno"]
+}
+
+# Colunas booleanas de analistas que podem ser exigidas por turno (regras_skill)
+SKILLS = {"skill_cplug": "Cplug", "skill_dd": "DD"}
+
+SQL_ANALISTAS_ATIVOS = """
+        SELECT id, \
+               nome, \
+               email, \
+               nivel, \
+               data_admissao, \
+               ativo, \
+               skill_cplug, \
+               skill_dd, \
+               pref_dia, \
+               pref_turno
+        FROM analistas
+        WHERE ativo
+        ORDER BY nome \
+        """
+
+def carregar_analistas_ativos(conn=None):
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        df_analistas = pd.read_sql_query(SQL_ANALISTAS_ATIVOS, conn)
+    finally:
+        if fechar: conn.close()
+    # Remove colunas duplicadas se houver
+    return df_analistas.loc[:, ~df_analistas.columns.duplicated()]
+
+def carregar_dados_locais():
+    db.init_all_db_tables()
+    conn = db.get_read_connection()
+    try:
+        # CORREÇÃO AQUI: Mudamos 'WHERE ativo = 1' para 'WHERE ativo'
+        # Isso funciona tanto no SQLite (1) quanto no Postgres (TRUE)
+        df_analistas = carregar_analistas_ativos(conn)
+
+        df_indisp = pd.read_sql_query("SELECT * FROM indisponibilidades", conn)
+        conn.close()
+        return df_analistas, df_indisp
+    except Exception as e:
+        # st.error(f"Erro ao carregar dados: {e}") 
+        try: conn.close()
+        except: pass
+        return pd.DataFrame(), pd.DataFrame()
+
+def load_staff_rules_from_db(conn=None):
+    # Aceita uma conexao externa (CLI/scripts); senao abre e fecha a propria
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    regras = {}
+    padrao = {
+        "Sabado":  {"Manha": 5, "Noite": 4, "Integral": 1}, 
+        "Domingo": {"Manha": 4, "Noite": 3, "Integral": 1},
+        "Feriado": {"Manha": 5, "Noite": 4, "Integral": 1}
+    }
+    try:
+        df = pd.read_sql_query("SELECT dia_tipo, turno, quantidade FROM regras_staff", conn)
+        if df.empty: return padrao
+        for _, row in df.iterrows():
+            if row['dia_tipo'] not in regras: regras[row['dia_tipo']] = {}
+            regras[row['dia_tipo']][row['turno']] = row['quantidade']
+        for dia, turnos in padrao.items():
+            if dia not in regras: regras[dia] = turnos
+            else:
+                for turno, qtd in turnos.items():
+                    if turno not in regras[dia]: regras[dia][turno] = qtd
+        return regras
+    except:
+        return padrao
+    finally:
+        if fechar: conn.close()
+
+def load_skill_rules_from_db(conn=None):
+    # {dia_tipo: {turno: {skill: quantidade minima}}}; sem regras = {}
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    regras = {}
+    try:
+        df = pd.read_sql_query("SELECT dia_tipo, turno, skill, quantidade FROM regras_skill WHERE quantidade > 0", conn)
+        for dia_tipo, turno, skill, quantidade in df.itertuples(index=False):
+            if skill in SKILLS:
+                regras.setdefault(dia_tipo, {}).setdefault(turno, {})[skill] = int(quantidade)
+        return regras
+    except:
+        return regras
+    finally:
+        if fechar: conn.close()
+
+def load_shift_hours_from_db(conn=None):
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    padrao = {"Manha": 5.5, "Noite": 5.0, "Integral": 10.0}
+    try:
+        df = pd.read_sql_query("SELECT turno, horas FROM configuracao_turnos", conn)
+        if df.empty: return padrao
+        return dict(zip(df['turno'], df['horas']))
+    except:
+        return padrao
+    finally:
+        if fechar: conn.close()
+
+def load_max_hours_limit(conn=None):
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        df = pd.read_sql_query("SELECT valor FROM configuracao_limites WHERE chave='max_horas_ciclo'", conn)
+        if df.empty: return 30.0
+        return float(df.iloc[0]['valor'])
+    except:
+        return 30.0
+    finally:
+        if fechar: conn.close()
+
+def load_rest_rules_from_db(conn=None):
+    # Regras de descanso (escala.descanso) guardadas como chaves em configuracao_limites
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    regras = dict(descanso.REGRAS_PADRAO)
+    try:
+        df = pd.read_sql_query("SELECT chave, valor FROM configuracao_limites", conn)
+        for chave, valor in zip(df['chave'], df['valor']):
+            if chave in regras: regras[chave] = int(valor)
+        return regras
+    except:
+        return regras
+    finally:
+        if fechar: conn.close()
+
+def carregar_feriados_mestre(conn=None):
+    # Banco Mestre de feriados (pagina Configuracoes); os ciclos leem por intervalo em calendario.carregar_feriados
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        return pd.read_sql_query("SELECT * FROM feriados_anuais ORDER BY data_iso", conn)
+    finally:
+        if fechar: conn.close()
+
+def carregar_dias_ciclo(id_ciclo, conn=None):
+    # Apenas dias ATIVOS, em ordem cronologica (Sem usar = 1 para compatibilidade Postgres)
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        return pd.read_sql_query(
+            f"SELECT nome_coluna, data_dia, dia_tipo, dia_semana FROM ciclo_dias WHERE id_ciclo = {int(id_ciclo)} AND ativo ORDER BY data_dia ASC",
+            conn)
+    finally:
+        if fechar: conn.close()
+
+def carregar_saldo_anterior(id_ciclo, conn=None):
+    # Saldo (turnos/horas acima ou abaixo da media) dos ciclos salvos antes deste, ver escala/resumo.py.
+    # So le: o resumo dos ciclos antigos e preenchido no init_all_db_tables e a cada escala salva
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        return resumo.carregar_saldo(conn, id_ciclo)
+    finally:
+        if fechar: conn.close()
+
+def carregar_escala_salva(id_ciclo, conn=None):
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        df = pd.read_sql_query(
+            f"SELECT nome_analista, nome_coluna_dia, turno FROM escala_salva WHERE id_ciclo = {int(id_ciclo)}",
+            conn)
+        if not df.empty:
+            return df
+        df_arquivado = pd.read_sql_query(f"SELECT id FROM ciclos WHERE id = {int(id_ciclo)} AND arquivado", conn)
+    finally:
+        if fechar: conn.close()
+    # Ciclo antigo: a escala esta no Parquet (escala/arquivo.py)
+    if df_arquivado.empty:
+        return df
+    return arquivo.ler_arquivo(ids_ciclo=[int(id_ciclo)])[['nome_analista', 'nome_coluna_dia', 'turno']]
+
+def carregar_matriz_salva(id_ciclo, conn=None):
+    """
+    (nome_ciclo, matriz) da escala salva como o Historico mostra: colunas na ordem dos dias,
+    analistas em ordem alfabetica e MENTOR/SOBREAVISO no fim. Matriz vazia se nao ha escala.
+    """
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        df_historico = carregar_escala_salva(id_ciclo, conn)
+        df_ciclo = pd.read_sql_query(f"SELECT nome_ciclo FROM ciclos WHERE id = {int(id_ciclo)}", conn)
+        df_dias_ciclo = pd.read_sql_query(
+            f"SELECT nome_coluna FROM ciclo_dias WHERE id_ciclo = {int(id_ciclo)} ORDER BY data_dia ASC", conn)
+    finally:
+        if fechar: conn.close()
+    nome_ciclo = df_ciclo.iloc[0]['nome_ciclo'] if not df_ciclo.empty else str(id_ciclo)
+    if df_historico.empty:
+        return nome_ciclo, pd.DataFrame()
+
+    # Ordem das linhas (Analistas + Mentor + Sobreaviso)
+    linhas_salvas = df_historico['nome_analista'].unique()
+    linhas_ordenadas = sorted([nome for nome in linhas_salvas if nome not in ["MENTOR", "SOBREAVISO"]])
+    if "MENTOR" in linhas_salvas: linhas_ordenadas.append("MENTOR")
+    if "SOBREAVISO" in linhas_salvas: linhas_ordenadas.append("SOBREAVISO")
+
+    matriz = df_historico.pivot(index='nome_analista', columns='nome_coluna_dia', values='turno')
+    matriz = matriz.reindex(columns=df_dias_ciclo['nome_coluna'].tolist())
+    return nome_ciclo, matriz.reindex(index=linhas_ordenadas).dropna(how='all')
+
+def carregar_sobreaviso(conn=None):
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        df_sobreaviso = pd.read_sql_query("SELECT * FROM sobreaviso", conn)
+    finally:
+        if fechar: conn.close()
+    if not df_sobreaviso.empty:
+        df_sobreaviso['data_inicio'] = pd.to_datetime(df_sobreaviso['data_inicio']).dt.date
+        df_sobreaviso['data_fim'] = pd.to_datetime(df_sobreaviso['data_fim']).dt.date
+    return df_sobreaviso
+
+def registrar_indisponibilidades(conn, linhas):
+    """
+    Grava [(id_analista, data 'YYYY-MM-DD', data_importacao)] de uma vez. O UNIQUE(id_analista, data)
+    decide: data repetida so atualiza data_importacao (fica valendo a ultima importacao). Sem commit.
+    """
+    if not linhas:
+        return 0
+    db.run_many(conn, """
+        INSERT INTO indisponibilidades (id_analista, data, data_importacao)
+        VALUES (?, ?, ?)
+        ON CONFLICT (id_analista, data) DO UPDATE SET data_importacao = excluded.data_importacao
+    """, linhas)
+    return len(linhas)
+
+# --- Listagens paginadas (telas de folgas e sobreaviso) ---
+TAMANHO_PAGINA = 50
+
+def _ler_pagina(sql, filtros, params, chave, cursor, limite, conn):
+    """
+    Keyset: ordena por `chave` (duas colunas, decrescente) e continua depois do cursor,
+    sem OFFSET. Le limite+1 linhas so para saber se existe a proxima pagina.
+    Devolve (df, proximo_cursor ou None).
+    """
+    filtros, params = list(filtros), list(params)
+    if cursor is not None:
+        filtros.append(f"({chave[0]} < ? OR ({chave[0]} = ? AND {chave[1]} < ?))")
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    sql = f"{sql} {where} ORDER BY {chave[0]} DESC, {chave[1]} DESC LIMIT {int(limite) + 1}"
+    if db.usando_postgres():
+        sql = sql.replace('?', '%s')
+
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        df = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        if fechar: conn.close()
+    if len(df) <= limite:
+        return df, None
+    df = df.iloc[:limite]
+    ultima = df.iloc[-1]
+    return df, (str(ultima['cursor_data']), int(ultima['id']))
+
+def pagina_indisponibilidades(id_analista=None, data_inicio=None, data_fim=None, cursor=None,
+                              limite=TAMANHO_PAGINA, conn=None):
+    """Folgas (datas mais recentes primeiro) filtradas por analista e periodo no banco. cursor: o devolvido pela pagina anterior."""
+    filtros, params = [], []
+    if id_analista is not None:
+        filtros.append("i.id_analista = ?")
+        params.append(int(id_analista))
+    if data_inicio is not None:
+        filtros.append("i.data >= ?")
+        params.append(str(data_inicio))
+    if data_fim is not None:
+        filtros.append("i.data <= ?")
+        params.append(str(data_fim))
+    sql = """
+        SELECT i.id, a.nome AS analista, i.data AS cursor_data, i.data_importacao
+        FROM indisponibilidades i
+        JOIN analistas a ON a.id = i.id_analista
+    """
+    df, proximo = _ler_pagina(sql, filtros, params, ("i.data", "i.id"), cursor, limite, conn)
+    df['data'] = pd.to_datetime(df['cursor_data']).dt.date
+    return df.drop(columns='cursor_data'), proximo
+
+def pagina_ausencias(id_analista=None, data_inicio=None, data_fim=None, cursor=None,
+                     limite=TAMANHO_PAGINA, conn=None):
+    """Periodos de ferias/licenca (inicio mais recente primeiro); o periodo pega os que cruzam a janela."""
+    filtros, params = [], []
+    if id_analista is not None:
+        filtros.append("au.id_analista = ?")
+        params.append(int(id_analista))
+    if data_inicio is not None:
+        filtros.append("au.data_fim >= ?")
+        params.append(str(data_inicio))
+    if data_fim is not None:
+        filtros.append("au.data_inicio <= ?")
+        params.append(str(data_fim))
+    sql = """
+        SELECT au.id, a.nome AS analista, au.tipo, au.data_inicio AS cursor_data, au.data_fim, au.data_importacao
+        FROM ausencias au
+        JOIN analistas a ON a.id = au.id_analista
+    """
+    df, proximo = _ler_pagina(sql, filtros, params, ("au.data_inicio", "au.id"), cursor, limite, conn)
+    df.insert(3, 'data_inicio', pd.to_datetime(df['cursor_data']).dt.date)
+    df['data_fim'] = pd.to_datetime(df['data_fim']).dt.date
+    return df.drop(columns='cursor_data'), proximo
+
+def pagina_sobreaviso(nome=None, data_inicio=None, data_fim=None, cursor=None, limite=TAMANHO_PAGINA, conn=None):
+    """Sobreavisos (inicio mais recente primeiro); nome e trecho do nome, o periodo pega os que cruzam a janela."""
+    filtros, params = [], []
+    if nome:
+        filtros.append("LOWER(nome_analista) LIKE ?")
+        params.append(f"%{nome.strip().lower()}%")
+    if data_inicio is not None:
+        filtros.append("data_fim >= ?")
+        params.append(str(data_inicio))
+    if data_fim is not None:
+        filtros.append("data_inicio <= ?")
+        params.append(str(data_fim))
+    sql = "SELECT id, nome_analista, data_inicio AS cursor_data, data_fim FROM sobreaviso"
+    df, proximo = _ler_pagina(sql, filtros, params, ("data_inicio", "id"), cursor, limite, conn)
+    df.insert(2, 'data_inicio', pd.to_datetime(df['cursor_data']).dt.date)
+    df['data_fim'] = pd.to_datetime(df['data_fim']).dt.date
+    return df.drop(columns='cursor_data'), proximo
+
+class ConflitoDeRevisao(Exception):
+    """Outra sessao salvou o ciclo depois que esta abriu (a revisao no banco ja nao e a esperada)."""
+    def __init__(self, id_ciclo, revisao_esperada, revisao_atual):
+        super().__init__(
+            f"A escala deste ciclo foi salva por outra pessoa (revisao {revisao_atual}; voce abriu a revisao {revisao_esperada})."
+        )
+        self.id_ciclo = id_ciclo
+        self.revisao_esperada = revisao_esperada
+        self.revisao_atual = revisao_atual
+
+def carregar_revisao(id_ciclo, conn=None):
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        df = pd.read_sql_query(f"SELECT revisao FROM ciclos WHERE id = {int(id_ciclo)}", conn)
+        if df.empty or pd.isna(df.iloc[0]['revisao']): return 0
+        return int(df.iloc[0]['revisao'])
+    finally:
+        if fechar: conn.close()
+
+def carregar_pacote_ciclo(id_ciclo, conn=None):
+    """
+    O que a geracao de um ciclo le, limitado a janela do ciclo (primeiro ao ultimo dia ativo),
+    numa conexao e uma consulta por conjunto. None se o ciclo nao existe; senao
+    {"id_ciclo", "nome_ciclo", "revisao", "df_analistas", "df_indisp", "df_ausencias",
+     "df_sobreaviso", "df_dias_ciclo", "df_escala_salva"}.
+    """
+    id_ciclo = int(id_ciclo)
+    inicio = f"(SELECT MIN(data_dia) FROM ciclo_dias WHERE id_ciclo = {id_ciclo} AND ativo)"
+    fim = f"(SELECT MAX(data_dia) FROM ciclo_dias WHERE id_ciclo = {id_ciclo} AND ativo)"
+    fechar = conn is None
+    if fechar: conn = db.get_read_connection()
+    try:
+        df_ciclo = pd.read_sql_query(f"SELECT nome_ciclo, revisao FROM ciclos WHERE id = {id_ciclo}", conn)
+        if df_ciclo.empty:
+            return None
+        pacote = {
+            "id_ciclo": id_ciclo,
+            "nome_ciclo": df_ciclo.iloc[0]['nome_ciclo'],
+            "revisao": 0 if pd.isna(df_ciclo.iloc[0]['revisao']) else int(df_ciclo.iloc[0]['revisao']),
+            "df_analistas": carregar_analistas_ativos(conn),
+            # So as folgas dos analistas ativos dentro da janela
+            "df_indisp": pd.read_sql_query(f"""
+                SELECT i.* FROM indisponibilidades i
+                JOIN analistas a ON a.id = i.id_analista
+                WHERE a.ativo AND i.data BETWEEN {inicio} AND {fim}
+            """, conn),
+            # Periodos de ausencia (ferias) que cruzam a janela
+            "df_ausencias": pd.read_sql_query(f"""
+                SELECT au.* FROM ausencias au
+                JOIN analistas a ON a.id = au.id_analista
+                WHERE a.ativo AND au.data_fim >= {inicio} AND au.data_inicio <= {fim}
+            """, conn),
+            # Sobreavisos que cruzam a janela
+            "df_sobreaviso": pd.read_sql_query(
+                f"SELECT * FROM sobreaviso WHERE data_inicio <= {fim} AND data_fim >= {inicio}", conn),
+            "df_dias_ciclo": carregar_dias_ciclo(id_ciclo, conn),
+            "df_escala_salva": carregar_escala_salva(id_ciclo, conn),
+        }
+    finally:
+        if fechar: conn.close()
+    df_sobreaviso = pacote["df_sobreaviso"]
+    if not df_sobreaviso.empty:
+        df_sobreaviso['data_inicio'] = pd.to_datetime(df_sobreaviso['data_inicio']).dt.date
+        df_sobreaviso['data_fim'] = pd.to_datetime(df_sobreaviso['data_fim']).dt.date
+    return pacote
+
+def salvar_escala_historico(conn, id_ciclo, df_final, revisao_esperada=None):
+    """
+    Substitui a escala salva do ciclo pela matriz df_final (analistas + MENTOR/SOBREAVISO)
+    e atualiza resumo_analista_ciclo na mesma transacao.
+    Com revisao_esperada, so grava se o ciclo ainda estiver nessa revisao; senao desfaz
+    e levanta ConflitoDeRevisao. Sem ela (CLI --sobrescrever), grava por cima.
+    Nao faz commit: quem chama decide (pagina ou lote da CLI).
+    """
+    # 1. Prepara tudo antes de pegar o lock de escrita (melt + leituras de apoio)
+    df_para_salvar = df_final.rename_axis('nome_analista').reset_index().melt(
+        id_vars='nome_analista',
+        var_name='nome_coluna_dia',
+        value_name='turno'
+    )
+    agora = datetime.now()
+    linhas = [(int(id_ciclo), nome, coluna, turno, agora)
+              for nome, coluna, turno in df_para_salvar[['nome_analista', 'nome_coluna_dia', 'turno']].itertuples(index=False)]
+    horas_turno = load_shift_hours_from_db(conn)
+    datas_coluna = resumo.datas_do_ciclo(conn, id_ciclo)
+
+    # 2. Troca condicional da revisao: a primeira escrita da transacao (no SQLite ja segura o lock)
+    if revisao_esperada is None:
+        db.run_query(conn, "UPDATE ciclos SET revisao = COALESCE(revisao, 0) + 1, arquivado = FALSE WHERE id = ?", (int(id_ciclo),))
+    else:
+        cursor = db.run_query(conn, "UPDATE ciclos SET revisao = COALESCE(revisao, 0) + 1, arquivado = FALSE WHERE id = ? AND COALESCE(revisao, 0) = ?",
+                              (int(id_ciclo), int(revisao_esperada)))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            raise ConflitoDeRevisao(id_ciclo, revisao_esperada, carregar_revisao(id_ciclo, conn))
+
+    # 3. Substitui as linhas do ciclo (DELETE + executemany) e o resumo
+    db.run_query(conn, "DELETE FROM escala_salva WHERE id_ciclo = ?", (int(id_ciclo),))
+    db.run_many(conn, """
+        INSERT INTO escala_salva (id_ciclo, nome_analista, nome_coluna_dia, turno, data_salvamento)
+        VALUES (?, ?, ?, ?, ?)
+    """, linhas)
+    resumo.atualizar_ciclo(conn, id_ciclo, df_final, horas_turno, datas_coluna)
+    return len(linhas)
+
+def diferencas_escala(df_minha, df_salva):
+    """Celulas diferentes entre duas matrizes: DataFrame (analista, dia, minha, salva)."""
+    linhas = df_minha.index.union(df_salva.index, sort=False)
+    colunas = df_minha.columns.union(df_salva.columns, sort=False)
+    minha = df_minha.reindex(index=linhas, columns=colunas)
+    salva = df_salva.reindex(index=linhas, columns=colunas)
+    diferente = (minha.fillna("") != salva.fillna("")).stack()
+    diferente = diferente[diferente]
+    return pd.DataFrame([
+        {"analista": nome, "dia": coluna.replace("\n", " "), "minha": minha.at[nome, coluna], "salva": salva.at[nome, coluna]}
+        for nome, coluna in diferente.index
+    ], columns=["analista", "dia", "minha", "salva"])
+
+def mesclar_escalas(df_base, df_minha, df_salva):
+    """
+    Mescla de tres vias: parte da versao salva e reaplica as celulas que esta sessao mudou em relacao
+    a base que abriu. Devolve (df_mesclada, conflitos) - conflitos = celulas que os dois mudaram diferente.
+    """
+    df_mesclada = df_salva.reindex(index=df_minha.index.union(df_salva.index, sort=False), columns=df_minha.columns)
+    base = df_base.reindex(index=df_minha.index, columns=df_minha.columns)
+    salva = df_mesclada.reindex(index=df_minha.index)
+    mudei = df_minha.fillna("") != base.fillna("")
+    mudaram = salva.notna() & (salva.fillna("") != base.fillna(""))
+    conflito = mudei & mudaram & (df_minha.fillna("") != salva.fillna(""))
+
+    df_mesclada.update(df_minha.where(mudei))
+    # Celulas que a versao salva nem tem (ciclo ainda nao salvo, analista novo) ficam como as minhas
+    df_mesclada = df_mesclada.fillna(df_minha)
+    conflitos = diferencas_escala(df_minha.where(conflito), salva.where(conflito))
+    return df_mesclada, conflitos
+
+@profiler.cronometrar("to_excel")
+def to_excel(df):
+    # openpyxl so e carregado quando alguem exporta (deixa o import do modulo leve para os workers)
+    from openpyxl.worksheet.datavalidation import DataValidation
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Escala', index=True)
+        ws = writer.sheets['Escala']
+        opcoes = ["FOLGA", "Manha", "Noite", "Integral", "Ferias"]
+        formula = f'"{",".join(opcoes)}"'
+        dv = DataValidation(type="list", formula1=formula, allow_blank=True)
+        if ws.max_row > 2: 
+            dv.add(f"B2:{ws.cell(ws.max_row - 2, ws.max_column).coordinate}")
+            ws.add_data_validation(dv)
+    return output.getvalue()
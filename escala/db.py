@@ -0,0 +1,547 @@
+"""
+Nucleo da camada de dados, sem Streamlit (importavel por CLI, workers e testes).
+
+O banco vem de um DSN explicito (configurar) ou das variaveis de ambiente:
+    ESCALA_DB_URL / POSTGRES_URL -> postgresql://...
+    ESCALA_DB                    -> caminho do arquivo SQLite (padrao: escala.db)
+A aplicacao Streamlit usa o adaptador database.py, que so acrescenta a leitura do st.secrets.
+
+Equipes: com usar_equipe("suporte") (vale para a thread/contexto atual, ou seja, para a
+sessao do Streamlit) o mesmo deploy atende outra equipe numa particao propria -
+no SQLite um arquivo por equipe (escala.suporte.db), no Postgres um schema por equipe
+(equipe_suporte, via search_path). As consultas nao mudam: cada equipe so enxerga
+as proprias tabelas. O cadastro das equipes fica no banco base (escala/equipes.py).
+
+No SQLite o banco roda em WAL (leitores nao esperam o escritor) com os PRAGMAs de
+PRAGMAS_SQLITE, e get_read_connection() entrega conexoes somente-leitura de um pool
+para as secoes que so fazem SELECT (close() devolve a conexao ao pool).
+
+Cada INSERT/UPDATE/DELETE feito por run_query/run_many incrementa a versao da
+tabela em versao_tabelas, na mesma transacao; os caches da aplicacao usam
+versoes() na chave e so deixam de valer quando uma tabela de que dependem muda.
+Com renovar_versoes() no inicio do rerun, versao_tabelas e lida uma vez por rerun
+(nao uma por carregador em cache); uma escrita no rerun volta a ler do banco.
+"""
+import contextvars
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+import profiler
+
+DB_NAME = 'escala.db'
+
+_dsn = None
+_tabelas_inicializadas = set()
+
+# Perfil do SQLite: aplicado em toda conexao (journal_mode=WAL e persistente, ligado uma vez por arquivo)
+PRAGMAS_SQLITE = [
+    ("synchronous", "NORMAL"),        # seguro com WAL e bem mais barato que FULL a cada commit
+    ("busy_timeout", 5000),           # espera o lock por ate 5s em vez de "database is locked"
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -16000),           # negativo = KiB (~16 MB por conexao)
+    ("temp_store", "MEMORY"),
+]
+TAMANHO_POOL_LEITURA = 8
+
+# Escritas nessas tabelas nao mudam a versao de nada (nenhum cache le delas; tarefas grava o progresso a cada passo)
+TABELAS_SEM_VERSAO = ("versao_tabelas", "agendamentos", "tarefas")
+
+# Tabela alvo de um INSERT/UPDATE/DELETE (o que run_query/run_many marcam como alterado)
+_RE_ESCRITA = re.compile(r"^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+(\w+)", re.IGNORECASE)
+
+# Equipe da sessao atual (ContextVar: asyncio.to_thread copia para as threads de carga)
+_equipe = contextvars.ContextVar("equipe", default=None)
+_RE_EQUIPE = re.compile(r"^[a-z0-9_]{1,40}$")
+
+# Versoes lidas no rerun atual (renovar_versoes(), chamado pelo Sistema.py a cada rerun):
+# os carregadores em cache da pagina dividem uma leitura de versao_tabelas por banco
+# (ContextVar: asyncio.to_thread copia para as threads de carga)
+_versoes_rerun = contextvars.ContextVar("versoes_rerun", default=None)
+# Reruns de fragmento nao passam pelo Sistema.py: depois disso as versoes sao lidas de novo
+VALIDADE_VERSOES = 5
+
+_wal_ativado = set()
+_pools_leitura = {}
+_lock_pools = threading.Lock()
+
+
+def configurar(dsn=None):
+    # dsn: URL postgresql://..., "sqlite:///caminho.db" ou so o caminho do arquivo. None volta ao ambiente.
+    global _dsn
+    _dsn = dsn
+
+
+def dsn_configurado():
+    return _dsn is not None
+
+
+def get_dsn_base():
+    # Banco sem equipe (onde fica o cadastro de equipes)
+    if _dsn:
+        return _dsn
+    return (os.environ.get("ESCALA_DB_URL") or os.environ.get("POSTGRES_URL")
+            or os.environ.get("ESCALA_DB") or DB_NAME)
+
+
+def get_dsn():
+    equipe = _equipe.get()
+    return dsn_da_equipe(equipe) if equipe else get_dsn_base()
+
+
+def validar_equipe(slug):
+    if not _RE_EQUIPE.match(slug or ""):
+        raise ValueError(f"Identificador de equipe invalido: {slug!r} (use a-z, 0-9 e _)")
+    return slug
+
+
+def dsn_da_equipe(slug, base=None):
+    """DSN da particao da equipe: arquivo irmao no SQLite, search_path=equipe_<slug> no Postgres."""
+    validar_equipe(slug)
+    base = base or get_dsn_base()
+    if base.startswith(("postgres://", "postgresql://")):
+        separador = "&" if "?" in base else "?"
+        return f"{base}{separador}options=-csearch_path%3D{schema_da_equipe(slug)}"
+    prefixo = "sqlite:///" if base.startswith("sqlite:///") else ""
+    raiz, extensao = os.path.splitext(_caminho_sqlite(base))
+    return f"{prefixo}{raiz}.{slug}{extensao or '.db'}"
+
+
+def schema_da_equipe(slug):
+    return f"equipe_{validar_equipe(slug)}"
+
+
+def usar_equipe(slug):
+    """Equipe das proximas conexoes neste contexto (None = banco base). Chamado a cada rerun pelo Sistema.py."""
+    _equipe.set(validar_equipe(slug) if slug else None)
+
+
+def equipe_atual():
+    return _equipe.get()
+
+
+@contextmanager
+def na_equipe(slug):
+    # Troca de equipe so dentro do bloco (ex: ler o cadastro no banco base)
+    token = _equipe.set(validar_equipe(slug) if slug else None)
+    try:
+        yield
+    finally:
+        _equipe.reset(token)
+
+
+def usando_postgres():
+    return get_dsn().startswith(("postgres://", "postgresql://"))
+
+
+def _caminho_sqlite(dsn):
+    return dsn[len("sqlite:///"):] if dsn.startswith("sqlite:///") else dsn
+
+
+def get_db_connection():
+    profiler.contar("conexoes")
+    dsn = get_dsn()
+    if usando_postgres():
+        # CONEXÃO POSTGRESQL (NUVEM) - psycopg2 so e importado quando usado
+        import psycopg2
+        return psycopg2.connect(dsn)
+    else:
+        # CONEXÃO SQLITE (LOCAL)
+        caminho = _caminho_sqlite(dsn)
+        conn = sqlite3.connect(caminho, timeout=5)
+        _aplicar_pragmas(conn)
+        if caminho not in _wal_ativado:
+            conn.execute("PRAGMA journal_mode=WAL")
+            _wal_ativado.add(caminho)
+        conn.row_factory = sqlite3.Row
+        # Conta cada instrucao executada, inclusive as leituras feitas via pandas
+        conn.set_trace_callback(lambda _sql: profiler.contar("queries"))
+        return conn
+
+
+def _aplicar_pragmas(conn):
+    for nome, valor in PRAGMAS_SQLITE:
+        conn.execute(f"PRAGMA {nome}={valor}")
+
+
+class _ConexaoLeitura(sqlite3.Connection):
+    # Conexao do pool de leitura: close() devolve ao pool (pandas continua vendo um sqlite3.Connection)
+    pool = None
+    devolvida = False
+
+    def close(self):
+        if self.devolvida:
+            return  # close() repetido: a conexao ja foi devolvida
+        if self.pool is not None:
+            if self.in_transaction:
+                self.rollback()
+            try:
+                self.pool.put_nowait(self)
+                self.devolvida = True
+                return
+            except queue.Full:
+                pass
+        super().close()
+
+
+def get_read_connection():
+    """
+    Conexao somente-leitura para secoes que so fazem SELECT. No SQLite vem de um pool
+    (mode=ro, WAL: nao espera quem esta salvando); no Postgres e uma conexao normal.
+    Use como as outras: conn.close() no fim (aqui devolve ao pool).
+    """
+    dsn = get_dsn()
+    caminho = _caminho_sqlite(dsn)
+    if usando_postgres() or caminho == ":memory:" or not os.path.exists(caminho):
+        return get_db_connection()
+    if caminho not in _wal_ativado:
+        get_db_connection().close()  # liga o WAL pela conexao de escrita
+
+    with _lock_pools:
+        pool = _pools_leitura.setdefault(caminho, queue.LifoQueue(maxsize=TAMANHO_POOL_LEITURA))
+    try:
+        conn = pool.get_nowait()
+        conn.devolvida = False
+        return conn
+    except queue.Empty:
+        pass
+
+    profiler.contar("conexoes")
+    conn = sqlite3.connect(Path(caminho).resolve().as_uri() + "?mode=ro", uri=True, timeout=5,
+                           check_same_thread=False, factory=_ConexaoLeitura)
+    _aplicar_pragmas(conn)
+    conn.row_factory = sqlite3.Row
+    conn.set_trace_callback(lambda _sql: profiler.contar("queries"))
+    conn.pool = pool
+    return conn
+
+# --- Funcao Auxiliar para Executar Queries Compatíveis ---
+def _adaptar_sql(sql):
+    # Troca placeholder
+    sql = sql.replace('?', '%s')
+
+    # Ajustes de Tipagem do Postgres
+    sql = sql.replace('INTEGER PRIMARY KEY AUTOINCREMENT', 'SERIAL PRIMARY KEY')
+
+    # CORREÇÃO DO ERRO: Troca DATETIME por TIMESTAMP globalmente
+    sql = sql.replace('DATETIME', 'TIMESTAMP')
+
+    # Ajuste opcional para data atual
+    sql = sql.replace('DEFAULT CURRENT_TIMESTAMP', 'DEFAULT NOW()')
+    return sql
+
+def run_query(conn, sql, params=()):
+    """
+    Função wrapper para lidar com diferenças entre SQLite (?) e Postgres (%s)
+    """
+    is_postgres = usando_postgres()
+    
+    # 1. Ajusta o SQL para o dialeto correto
+    if is_postgres:
+        sql = _adaptar_sql(sql)
+    
+    # 2. Executa
+    try:
+        if is_postgres:
+            from psycopg2.extras import RealDictCursor
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+        else:
+            cursor = conn.cursor()
+            
+        if is_postgres:
+            profiler.contar("queries")
+        cursor.execute(sql, params)
+        _marcar_se_escrita(conn, sql)
+        return cursor
+    except Exception as e:
+        # Loga o erro para facilitar debug no Streamlit Cloud
+        print(f"Erro ao executar SQL: {sql}") 
+        raise e
+
+def run_many(conn, sql, lista_params):
+    """
+    Igual ao run_query, mas executa o mesmo INSERT/UPDATE para varias linhas de uma vez (executemany).
+    """
+    is_postgres = usando_postgres()
+    if is_postgres:
+        sql = _adaptar_sql(sql)
+    try:
+        cursor = conn.cursor()
+        if is_postgres:
+            profiler.contar("queries")
+        cursor.executemany(sql, lista_params)
+        _marcar_se_escrita(conn, sql)
+        return cursor
+    except Exception as e:
+        print(f"Erro ao executar SQL em lote: {sql}")
+        raise e
+
+def _marcar_se_escrita(conn, sql):
+    encontrado = _RE_ESCRITA.match(sql)
+    if encontrado and encontrado.group(1).lower() not in TABELAS_SEM_VERSAO:
+        marcar_alteradas(conn, encontrado.group(1).lower())
+
+def marcar_alteradas(conn, *tabelas):
+    # Sem commit: a versao sobe junto com a escrita (rollback desfaz as duas)
+    memo = _versoes_rerun.get()
+    if memo is not None:
+        # O rerun que escreve volta a ler as versoes do banco (ve a propria escrita)
+        memo["escreveu"] = True
+    for tabela in tabelas:
+        run_query(conn, """
+            INSERT INTO versao_tabelas (tabela, versao) VALUES (?, 1)
+            ON CONFLICT (tabela) DO UPDATE SET versao = versao_tabelas.versao + 1
+        """, (tabela,))
+
+def renovar_versoes():
+    """Inicio de um rerun: versoes() passa a ler o banco uma vez so ate a primeira escrita (ou VALIDADE_VERSOES)."""
+    _versoes_rerun.set({"inicio": time.monotonic(), "escreveu": False, "por_dsn": {}, "lock": threading.Lock()})
+
+def esquecer_versoes():
+    """Fora de um rerun (threads de fundo que copiaram o contexto): versoes() volta a ler sempre do banco."""
+    _versoes_rerun.set(None)
+
+def _ler_versoes(conn=None):
+    fechar = conn is None
+    if fechar:
+        init_all_db_tables()
+        conn = get_read_connection()
+    try:
+        linhas = run_query(conn, "SELECT tabela, versao FROM versao_tabelas").fetchall()
+    finally:
+        if fechar: conn.close()
+    return {linha['tabela']: linha['versao'] for linha in linhas}
+
+def versoes(tabelas, conn=None):
+    """Tupla com a versao atual de cada tabela (0 = nunca alterada), na ordem pedida."""
+    memo = _versoes_rerun.get()
+    if (conn is None and memo is not None and not memo["escreveu"]
+            and time.monotonic() - memo["inicio"] < VALIDADE_VERSOES):
+        dsn = get_dsn()
+        # Lock: as threads de carga do mesmo rerun esperam a primeira leitura em vez de repeti-la
+        with memo["lock"]:
+            atuais = memo["por_dsn"].get(dsn)
+            if atuais is None:
+                atuais = memo["por_dsn"][dsn] = _ler_versoes()
+    else:
+        atuais = _ler_versoes(conn)
+    return tuple(int(atuais.get(tabela, 0)) for tabela in tabelas)
+
+def inserir_retornando_id(conn, sql, params=()):
+    """
+    Executa um INSERT e devolve o id gerado: RETURNING no Postgres, lastrowid no SQLite.
+    Evita o SELECT extra pelo nome depois do insert.
+    """
+    if usando_postgres():
+        cursor = run_query(conn, sql.rstrip().rstrip(';') + " RETURNING id", params)
+        return int(cursor.fetchone()['id'])
+    cursor = run_query(conn, sql, params)
+    return int(cursor.lastrowid)
+
+def _adicionar_coluna(conn, tabela, coluna, tipo):
+    # Migracao simples: o SQLite nao tem ADD COLUMN IF NOT EXISTS, entao olha o PRAGMA antes
+    if usando_postgres():
+        run_query(conn, f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS {coluna} {tipo}")
+        return
+    existentes = [linha['name'] for linha in run_query(conn, f"PRAGMA table_info({tabela})").fetchall()]
+    if coluna not in existentes:
+        run_query(conn, f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+
+def _preencher_tipo_dos_dias(conn):
+    # Ciclos criados antes das colunas tipadas: o tipo sai do rotulo (regra antiga do engine), o dia da semana da data
+    linhas = run_query(conn, "SELECT id, nome_coluna, data_dia FROM ciclo_dias WHERE dia_tipo IS NULL OR dia_semana IS NULL").fetchall()
+    atualizacoes = []
+    for linha in linhas:
+        rotulo = linha['nome_coluna'] or ""
+        tipo = "Domingo" if "Dom" in rotulo else "Sabado" if "Sab" in rotulo else "Feriado"
+        dia_semana = date.fromisoformat(str(linha['data_dia'])[:10]).weekday()
+        atualizacoes.append((tipo, dia_semana, linha['id']))
+    if atualizacoes:
+        run_many(conn, "UPDATE ciclo_dias SET dia_tipo = ?, dia_semana = ? WHERE id = ?", atualizacoes)
+
+def init_all_db_tables(avisar=print):
+    # Cria as tabelas uma vez por banco e por processo (CREATE IF NOT EXISTS a cada rerun e desnecessario)
+    dsn = get_dsn()
+    if dsn in _tabelas_inicializadas:
+        return
+    conn = get_db_connection()
+    try:
+        equipe = _equipe.get()
+        if equipe and usando_postgres():
+            # Particao da equipe: o search_path da conexao ja aponta para o schema
+            run_query(conn, f"CREATE SCHEMA IF NOT EXISTS {schema_da_equipe(equipe)}")
+
+        # --- TABELAS ---
+        # Versao por tabela (antes de tudo: qualquer escrita abaixo ja incrementa)
+        run_query(conn, 'CREATE TABLE IF NOT EXISTS versao_tabelas (tabela TEXT PRIMARY KEY, versao INTEGER NOT NULL DEFAULT 0);')
+
+        # Analistas
+        run_query(conn, '''
+            CREATE TABLE IF NOT EXISTS analistas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL UNIQUE, 
+                email TEXT UNIQUE,
+                nivel TEXT NOT NULL,
+                data_admissao DATE NOT NULL,
+                ativo BOOLEAN NOT NULL DEFAULT TRUE,
+                skill_cplug BOOLEAN NOT NULL DEFAULT FALSE,
+                skill_dd BOOLEAN NOT NULL DEFAULT FALSE,
+                pref_dia TEXT DEFAULT 'Tanto faz',
+                pref_turno TEXT DEFAULT 'Tanto faz'
+            );
+        ''')
+        
+        # Indisponibilidades
+        run_query(conn, '''
+            CREATE TABLE IF NOT EXISTS indisponibilidades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_analista INTEGER NOT NULL, 
+                data DATE NOT NULL,
+                data_importacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (id_analista) REFERENCES analistas(id),
+                UNIQUE(id_analista, data)
+            );
+        ''')
+        # carregar_pacote_ciclo filtra as folgas pela janela do ciclo
+        run_query(conn, 'CREATE INDEX IF NOT EXISTS idx_indisponibilidades_data ON indisponibilidades (data);')
+
+        # Ausencias em periodo (ferias): uma linha por pedido, nao por dia (ver escala/ausencias.py)
+        run_query(conn, '''
+            CREATE TABLE IF NOT EXISTS ausencias (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_analista INTEGER NOT NULL,
+                data_inicio DATE NOT NULL,
+                data_fim DATE NOT NULL,
+                tipo TEXT NOT NULL DEFAULT 'Ferias',
+                data_importacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (id_analista) REFERENCES analistas(id),
+                UNIQUE(id_analista, data_inicio, data_fim, tipo)
+            );
+        ''')
+        # Sobreposicao com a janela do ciclo: data_fim >= inicio AND data_inicio <= fim
+        run_query(conn, 'CREATE INDEX IF NOT EXISTS idx_ausencias_periodo ON ausencias (data_fim, data_inicio);')
+        
+        # Ciclos
+        run_query(conn, 'CREATE TABLE IF NOT EXISTS ciclos (id INTEGER PRIMARY KEY AUTOINCREMENT, nome_ciclo TEXT UNIQUE, data_inicio DATE, data_fim DATE, revisao INTEGER DEFAULT 0);')
+        # Revisao da escala salva do ciclo: cada save troca N -> N+1 so se ainda estiver em N (ver dados.salvar_escala_historico)
+        _adicionar_coluna(conn, "ciclos", "revisao", "INTEGER DEFAULT 0")
+        # Escala movida para o Parquet de escala/arquivo.py (escala_salva ja nao tem as linhas do ciclo)
+        _adicionar_coluna(conn, "ciclos", "arquivado", "BOOLEAN DEFAULT FALSE")
+        
+        # Ciclo Dias
+        run_query(conn, '''
+            CREATE TABLE IF NOT EXISTS ciclo_dias (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, 
+                id_ciclo INTEGER, 
+                nome_coluna TEXT, 
+                data_dia DATE, 
+                ativo BOOLEAN DEFAULT TRUE,
+                dia_tipo TEXT,
+                dia_semana INTEGER,
+                FOREIGN KEY(id_ciclo) REFERENCES ciclos(id)
+            );
+        ''')
+        # Bancos antigos: tipo do dia (Sabado/Domingo/Feriado) e dia da semana (0 = segunda) gravados na criacao do ciclo
+        _adicionar_coluna(conn, "ciclo_dias", "dia_tipo", "TEXT")
+        _adicionar_coluna(conn, "ciclo_dias", "dia_semana", "INTEGER")
+        _preencher_tipo_dos_dias(conn)
+        
+        # Escala Salva (O ERRO ESTAVA AQUI, no DATETIME)
+        run_query(conn, 'CREATE TABLE IF NOT EXISTS escala_salva (id INTEGER PRIMARY KEY AUTOINCREMENT, id_ciclo INTEGER, nome_analista TEXT, nome_coluna_dia TEXT, turno TEXT, data_salvamento DATETIME, UNIQUE(id_ciclo, nome_analista, nome_coluna_dia));')
+        
+        # Resumo por analista e ciclo (mantido pelo salvar_escala_historico, ver escala/resumo.py)
+        run_query(conn, '''
+            CREATE TABLE IF NOT EXISTS resumo_analista_ciclo (
+                id_ciclo INTEGER NOT NULL,
+                nome_analista TEXT NOT NULL,
+                turnos_manha INTEGER DEFAULT 0,
+                turnos_noite INTEGER DEFAULT 0,
+                turnos_integral INTEGER DEFAULT 0,
+                turnos INTEGER DEFAULT 0,
+                horas REAL DEFAULT 0,
+                fins_de_semana INTEGER,
+                dias_mentor INTEGER,
+                PRIMARY KEY (id_ciclo, nome_analista)
+            );
+        ''')
+        # Bancos criados antes das colunas de fim de semana/mentor (preenchidas por resumo.preencher_ciclos_faltantes)
+        _adicionar_coluna(conn, "resumo_analista_ciclo", "fins_de_semana", "INTEGER")
+        _adicionar_coluna(conn, "resumo_analista_ciclo", "dias_mentor", "INTEGER")
+
+        # Sobreaviso
+        run_query(conn, 'CREATE TABLE IF NOT EXISTS sobreaviso (id INTEGER PRIMARY KEY AUTOINCREMENT, nome_analista TEXT, data_inicio DATE, data_fim DATE);')
+        # Lista paginada da tela Sobreaviso (dados.pagina_sobreaviso ordena por data_inicio, id)
+        run_query(conn, 'CREATE INDEX IF NOT EXISTS idx_sobreaviso_inicio ON sobreaviso (data_inicio, id);')
+        
+        # Regras e Configs
+        run_query(conn, 'CREATE TABLE IF NOT EXISTS regras_staff (id INTEGER PRIMARY KEY AUTOINCREMENT, dia_tipo TEXT, turno TEXT, quantidade INTEGER, UNIQUE(dia_tipo, turno));')
+        # Cobertura minima de skill por turno (ex: pelo menos 1 skill_dd em toda Noite de Sabado)
+        run_query(conn, 'CREATE TABLE IF NOT EXISTS regras_skill (id INTEGER PRIMARY KEY AUTOINCREMENT, dia_tipo TEXT, turno TEXT, skill TEXT, quantidade INTEGER, UNIQUE(dia_tipo, turno, skill));')
+        run_query(conn, 'CREATE TABLE IF NOT EXISTS configuracao_turnos (id INTEGER PRIMARY KEY AUTOINCREMENT, turno TEXT UNIQUE, horas REAL);')
+        run_query(conn, 'CREATE TABLE IF NOT EXISTS configuracao_limites (id INTEGER PRIMARY KEY AUTOINCREMENT, chave TEXT UNIQUE, valor REAL);')
+        
+        # Feriados
+        run_query(conn, '''
+            CREATE TABLE IF NOT EXISTS feriados_anuais (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data_iso DATE UNIQUE,
+                nome_feriado TEXT,
+                usar_na_escala BOOLEAN DEFAULT TRUE
+            );
+        ''')
+
+        # Calendario pre-calculado (biblioteca holidays): uf = 'BR' para nacionais, senao so os estaduais
+        run_query(conn, '''
+            CREATE TABLE IF NOT EXISTS calendario_feriados (
+                data_iso DATE NOT NULL,
+                uf TEXT NOT NULL,
+                nome_feriado TEXT,
+                PRIMARY KEY (uf, data_iso)
+            );
+        ''')
+        run_query(conn, 'CREATE INDEX IF NOT EXISTS idx_calendario_feriados_data ON calendario_feriados (data_iso);')
+
+        # Cadastro de equipes (usado no banco base; ver escala/equipes.py)
+        run_query(conn, 'CREATE TABLE IF NOT EXISTS equipes (slug TEXT PRIMARY KEY, nome TEXT NOT NULL, criada_em DATETIME DEFAULT CURRENT_TIMESTAMP);')
+
+        # Ultima execucao das rotinas periodicas (ver escala/manutencao.py); fora do versao_tabelas
+        run_query(conn, 'CREATE TABLE IF NOT EXISTS agendamentos (rotina TEXT PRIMARY KEY, ultima_execucao REAL NOT NULL DEFAULT 0);')
+
+        # Fila de tarefas de fundo (importacao, geracao, exportacao; ver escala/tarefas.py)
+        run_query(conn, '''
+            CREATE TABLE IF NOT EXISTS tarefas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                parametros TEXT,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                progresso REAL DEFAULT 0,
+                mensagem TEXT,
+                resultado TEXT,
+                erro TEXT,
+                cancelar BOOLEAN DEFAULT FALSE,
+                criada_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+                atualizada_em DATETIME,
+                concluida_em DATETIME
+            );
+        ''')
+        run_query(conn, 'CREATE INDEX IF NOT EXISTS idx_tarefas_status ON tarefas (status, id);')
+
+        conn.commit()
+
+        # --- MIGRACOES DE DADOS ---
+        # Escalas salvas antes do resumo (ou das colunas de fim de semana/mentor): resumidas aqui,
+        # uma vez, para as telas e o saldo so lerem a tabela
+        from escala import dados, resumo
+        resumo.preencher_ciclos_faltantes(conn, dados.load_shift_hours_from_db(conn))
+
+        _tabelas_inicializadas.add(dsn)
+    except Exception as e:
+        avisar(f"Erro ao inicializar DB: {e}")
+    finally:
+        conn.close()
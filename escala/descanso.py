@@ -0,0 +1,93 @@
+"""
+Regras de descanso em janelas de datas reais (configuraveis em configuracao_limites).
+
+    max_fds_consecutivos    fins de semana seguidos com algum turno (0 = sem limite)
+    min_horas_descanso      horas minimas entre o fim de um turno e o inicio do proximo
+                            (ex: Noite de sabado -> Manha de domingo; 0 = sem limite)
+    max_turnos_7_dias       turnos numa janela movel de 7 dias (0 = sem limite)
+    penalidade_dom_sab      custo extra para quem trabalhou o Domingo 6 dias antes do Sabado
+
+O ControleDescanso guarda, por analista, o ultimo fim de semana trabalhado, o
+tamanho da sequencia, a hora em que terminou o ultimo turno e os dias trabalhados
+dentro da janela de 7 dias. Cada verificacao de candidato e O(1): nada de
+reler a matriz da escala.
+"""
+from collections import deque
+
+REGRAS_PADRAO = {
+    "max_fds_consecutivos": 0,
+    "min_horas_descanso": 0,
+    "max_turnos_7_dias": 0,
+    "penalidade_dom_sab": 200,
+}
+
+# Hora de inicio de cada turno; o fim e inicio + horas do turno (configuracao_turnos)
+INICIO_TURNO = {"Manha": 7.0, "Integral": 7.0, "Noite": 17.0}
+
+JANELA_DIAS = 7
+
+FDS_CONSECUTIVOS = "fds_consecutivos"
+DESCANSO_MINIMO = "descanso_minimo"
+TURNOS_NA_JANELA = "turnos_na_janela"
+
+
+class ControleDescanso:
+    def __init__(self, analistas, regras, horas_turno):
+        self.regras = {**REGRAS_PADRAO, **(regras or {})}
+        self.horas_turno = horas_turno
+        self.semana_fds = {nome: None for nome in analistas}
+        self.sequencia_fds = {nome: 0 for nome in analistas}
+        self.fim_ultimo_turno = {nome: None for nome in analistas}
+        self.dias_na_janela = {nome: deque() for nome in analistas}
+
+    def _semana(self, data):
+        # Sabado e Domingo do mesmo fim de semana caem na mesma "semana" (contada a partir de sabado)
+        return (data.toordinal() + 1) // 7
+
+    def _inicio_absoluto(self, data, turno):
+        return data.toordinal() * 24 + INICIO_TURNO.get(turno, 0.0)
+
+    def _limpar_janela(self, nome, data):
+        janela = self.dias_na_janela[nome]
+        while janela and janela[0] <= data.toordinal() - JANELA_DIAS:
+            janela.popleft()
+        return janela
+
+    def bloqueio(self, nome, dia, turno):
+        """Devolve o motivo (constante do modulo) se o analista nao pode pegar este turno, senao None."""
+        max_fds = self.regras["max_fds_consecutivos"]
+        if max_fds and dia.dia_semana >= 5:
+            semana = self._semana(dia.data)
+            ultima = self.semana_fds[nome]
+            if ultima is not None and ultima == semana - 1 and self.sequencia_fds[nome] + 1 > max_fds:
+                return FDS_CONSECUTIVOS
+
+        min_horas = self.regras["min_horas_descanso"]
+        fim_anterior = self.fim_ultimo_turno[nome]
+        if min_horas and fim_anterior is not None:
+            if self._inicio_absoluto(dia.data, turno) - fim_anterior < min_horas:
+                return DESCANSO_MINIMO
+
+        max_turnos = self.regras["max_turnos_7_dias"]
+        if max_turnos and len(self._limpar_janela(nome, dia.data)) + 1 > max_turnos:
+            return TURNOS_NA_JANELA
+        return None
+
+    def penalidade(self, nome, dia):
+        # Regra antiga do engine: evitar Domingo + Sabado seguinte
+        if dia.tipo == "Sabado" and dia.dia_semana == 5:
+            domingo = dia.data.toordinal() - 6
+            if domingo in self._limpar_janela(nome, dia.data):
+                return self.regras["penalidade_dom_sab"]
+        return 0
+
+    def registrar(self, nome, dia, turno):
+        # Chamado quando o analista e alocado (os dias chegam em ordem cronologica)
+        if dia.dia_semana >= 5:
+            semana = self._semana(dia.data)
+            ultima = self.semana_fds[nome]
+            if ultima != semana:
+                self.sequencia_fds[nome] = self.sequencia_fds[nome] + 1 if ultima == semana - 1 else 1
+                self.semana_fds[nome] = semana
+        self.fim_ultimo_turno[nome] = self._inicio_absoluto(dia.data, turno) + self.horas_turno.get(turno, 0)
+        self.dias_na_janela[nome].append(dia.data.toordinal())
@@ -0,0 +1,47 @@
+"""
+Cadastro das equipes atendidas pelo mesmo deploy.
+
+O cadastro fica no banco base (sem equipe); os dados de cada equipe ficam na
+particao dela (db.dsn_da_equipe). O Sistema.py mostra o seletor quando ha
+equipes cadastradas e chama db.usar_equipe a cada rerun.
+"""
+import re
+import unicodedata
+
+import pandas as pd
+
+from escala import db
+
+
+def sugerir_slug(nome):
+    # "Suporte N2" -> "suporte_n2"
+    texto = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode().lower()
+    return re.sub(r"[^a-z0-9]+", "_", texto).strip("_")[:40]
+
+
+def listar_equipes():
+    """DataFrame (slug, nome) das equipes cadastradas no banco base."""
+    with db.na_equipe(None):
+        db.init_all_db_tables()
+        conn = db.get_read_connection()
+        try:
+            return pd.read_sql_query("SELECT slug, nome FROM equipes ORDER BY nome", conn)
+        finally:
+            conn.close()
+
+
+def criar_equipe(nome, slug=None):
+    """Cadastra a equipe no banco base e cria as tabelas na particao dela. Devolve o slug."""
+    slug = db.validar_equipe(slug or sugerir_slug(nome))
+    with db.na_equipe(None):
+        db.init_all_db_tables()
+        conn = db.get_db_connection()
+        try:
+            db.run_query(conn, "INSERT INTO equipes (slug, nome) VALUES (?, ?) ON CONFLICT (slug) DO UPDATE SET nome = excluded.nome",
+                         (slug, nome.strip()))
+            conn.commit()
+        finally:
+            conn.close()
+    with db.na_equipe(slug):
+        db.init_all_db_tables()
+    return slug
@@ -0,0 +1,83 @@
+"""
+Calendario de feriados pre-calculado.
+
+A biblioteca holidays e consultada uma vez por faixa de anos (nacionais + todas as UFs)
+e o resultado fica na tabela calendario_feriados, indexada por data. Depois disso,
+"feriados entre A e B para os estados S" e so uma consulta por intervalo.
+"""
+import pandas as pd
+
+from escala import db
+
+UF_NACIONAL = "BR"
+TODAS_UFS = ["AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA", "PB", "PR", "PE",
+             "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"]
+
+# Quando um ano falta, ja calcula os seguintes tambem (uma ida a biblioteca por faixa de anos)
+ANOS_A_FRENTE = 5
+
+
+def calcular_feriados(anos, ufs=TODAS_UFS):
+    """Monta (data_iso, uf, nome_feriado) com a biblioteca holidays: nacionais + o que cada UF acrescenta."""
+    import holidays
+
+    anos = list(anos)
+    nacionais = holidays.BR(years=anos)
+    linhas = [(data, UF_NACIONAL, nome) for data, nome in nacionais.items()]
+    for uf in ufs:
+        estaduais = holidays.BR(subdiv=uf, years=anos)
+        for data in estaduais:
+            # Guarda so os nomes que a UF acrescenta (o nacional do mesmo dia ja esta em 'BR')
+            extras = [n for n in estaduais.get_list(data) if n not in nacionais.get_list(data)]
+            if extras:
+                linhas.append((data, uf, "; ".join(extras)))
+    return pd.DataFrame(linhas, columns=["data_iso", "uf", "nome_feriado"])
+
+
+def anos_calculados(conn, anos):
+    """Quais dos anos pedidos ja estao na tabela (todo ano tem feriado nacional)."""
+    anos = sorted(anos)
+    df = pd.read_sql_query(f"""
+        SELECT data_iso FROM calendario_feriados
+        WHERE uf = '{UF_NACIONAL}' AND data_iso BETWEEN '{anos[0]}-01-01' AND '{anos[-1]}-12-31'
+    """, conn)
+    return set(pd.to_datetime(df['data_iso']).dt.year) & set(anos)
+
+
+def precalcular(conn, anos):
+    """Grava os anos que ainda faltam (todas as UFs de uma vez). Sem commit. Devolve os anos gravados."""
+    faltando = sorted(set(anos) - anos_calculados(conn, anos))
+    if not faltando:
+        return []
+    df = calcular_feriados(faltando)
+    db.run_many(conn, """
+        INSERT INTO calendario_feriados (data_iso, uf, nome_feriado) VALUES (?, ?, ?)
+        ON CONFLICT(uf, data_iso) DO NOTHING
+    """, [(d.strftime('%Y-%m-%d'), uf, nome) for d, uf, nome in df.itertuples(index=False)])
+    return faltando
+
+
+def feriados_entre(conn, data_inicio, data_fim, ufs=()):
+    """
+    Feriados nacionais + das UFs pedidas entre as datas (inclusive), um por dia:
+    DataFrame (data_iso: date, nome_feriado). Calcula e grava os anos que faltarem.
+    """
+    data_inicio = pd.Timestamp(data_inicio).date()
+    data_fim = pd.Timestamp(data_fim).date()
+    if precalcular(conn, range(data_inicio.year, data_fim.year + 1 + ANOS_A_FRENTE)):
+        conn.commit()
+
+    lista_ufs = ", ".join(f"'{uf}'" for uf in [UF_NACIONAL, *ufs] if uf in TODAS_UFS or uf == UF_NACIONAL)
+    df = pd.read_sql_query(f"""
+        SELECT data_iso, nome_feriado FROM calendario_feriados
+        WHERE data_iso BETWEEN '{data_inicio}' AND '{data_fim}' AND uf IN ({lista_ufs})
+    """, conn)
+    if df.empty:
+        return pd.DataFrame(columns=["data_iso", "nome_feriado"])
+
+    # Mesmo dia em mais de uma UF (ou nacional + estadual): junta os nomes como o holidays faz
+    df['data_iso'] = pd.to_datetime(df['data_iso']).dt.date
+    df = df.assign(nome_feriado=df['nome_feriado'].str.split("; ")).explode('nome_feriado')
+    return (df.groupby('data_iso')['nome_feriado']
+              .agg(lambda nomes: "; ".join(sorted(set(nomes))))
+              .reset_index())
@@ -0,0 +1,176 @@
+"""
+Importacao da planilha do Google Forms (folgas, ferias e preferencias), sem Streamlit.
+
+A pagina Registrar Indisponibilidade envia a planilha como tarefa de fundo
+(escala/tarefas.py): planilha_para_json() deixa o DataFrame gravavel na tabela
+tarefas e importar_formulario() roda no worker, informando o andamento por linha.
+"""
+import re
+import unicodedata
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from escala import ausencias, dados, db
+
+
+def normalizar_chave(texto):
+    if not isinstance(texto, str): return ""
+    nfkd_form = unicodedata.normalize('NFKD', texto)
+    texto_sem_acento = "".join([c for c in nfkd_form if not unicodedata.combining(c)])
+    return texto_sem_acento.lower().strip()
+
+
+def planilha_para_json(df):
+    # Datas do Excel viram 'YYYY-MM-DD' (um dos formatos que importar_formulario reconhece)
+    def valor(v):
+        if isinstance(v, datetime): return v.strftime('%Y-%m-%d')
+        if pd.isna(v): return None
+        return v.item() if hasattr(v, "item") else v
+    return {"colunas": [str(c) for c in df.columns],
+            "linhas": [[valor(v) for v in linha] for linha in df.itertuples(index=False)]}
+
+
+def planilha_de_json(planilha):
+    return pd.DataFrame(planilha["linhas"], columns=planilha["colunas"])
+
+
+def _mapa_email_id(conn):
+    analistas_df = pd.read_sql_query("SELECT id, email FROM analistas", conn)
+    return {str(email).lower().strip(): id_ for email, id_ in zip(analistas_df['email'], analistas_df['id']) if email}
+
+
+def importar_formulario(df, ts_agora, andamento=None):
+    """
+    Grava preferencias, folgas (indisponibilidades) e ferias (ausencias) de cada linha da planilha.
+    andamento(fracao, mensagem): chamado a cada linha; se levantar excecao (cancelamento) nada e gravado.
+    Devolve {"logs": [...], "datas": n, "ferias": n}. ValueError se a planilha nao serve.
+    """
+    conn = db.get_db_connection()
+    try:
+        mapa_email_id = _mapa_email_id(conn)
+        if not mapa_email_id:
+            raise ValueError("Nenhum analista com email cadastrado no sistema.")
+
+        # Identifica colunas
+        col_email = None
+        col_folgas = None
+        col_ferias_ini = None
+        col_ferias_dias = None
+        col_pref_dia = None
+        col_pref_turno = None
+
+        for col in df.columns:
+            c_norm = normalizar_chave(str(col))
+            if "e-mail" in c_norm or "email" in c_norm: col_email = col
+            if "nao pode trabalhar" in c_norm: col_folgas = col
+            if "ferias agendada" in c_norm: col_ferias_ini = col
+            if "quantos dias" in c_norm: col_ferias_dias = col
+            if "preferencia" in c_norm and "dia" in c_norm: col_pref_dia = col
+            if "deseja fazer turnos" in c_norm: col_pref_turno = col
+
+        if not col_email:
+            raise ValueError("Coluna de Email não encontrada.")
+
+        logs = []
+        # Tudo e gravado so no fim: durante o laco esta conexao nao segura o lock de escrita
+        # do SQLite, e andamento() (outra conexao) grava o progresso sem esperar
+        linhas_pref_turno = []
+        linhas_pref_dia = []
+        linhas_indisp = []
+        linhas_ferias = []
+        total_rows = len(df)
+
+        for index, (_, row) in enumerate(df.iterrows()):
+            if andamento is not None:
+                andamento(index / total_rows, f"Linha {index + 1} de {total_rows}")
+
+            email_raw = str(row[col_email]).strip().lower()
+            id_analista = mapa_email_id.get(email_raw)
+
+            log = {"Email": email_raw, "Analista": "OK" if id_analista else "N/A", "Detalhes": ""}
+
+            if not id_analista:
+                logs.append(log)
+                continue
+
+            # A. Preferencias
+            if col_pref_turno and pd.notna(row[col_pref_turno]):
+                val = str(row[col_pref_turno]).lower()
+                p = "Tanto faz"
+                if "10" in val or "integral" in val: p = "Integral"
+                elif "5" in val: p = "Curto"
+                linhas_pref_turno.append((p, id_analista))
+
+            if col_pref_dia and pd.notna(row[col_pref_dia]):
+                val = str(row[col_pref_dia]).lower()
+                p = "Tanto faz"
+                if "sabado" in val or "sábado" in val: p = "Sabado"
+                elif "domingo" in val: p = "Domingo"
+                linhas_pref_dia.append((p, id_analista))
+
+            datas_para_salvar = set()
+            periodo_ferias = None
+
+            # B. Folgas
+            if col_folgas and pd.notna(row[col_folgas]):
+                raw_text = str(row[col_folgas])
+                matches = re.findall(r'(\d{1,2})[/-](\d{1,2})', raw_text)
+                for d, m in matches:
+                    try:
+                        dia, mes = int(d), int(m)
+                        if 1 <= mes <= 12 and 1 <= dia <= 31:
+                            ano = datetime.now().year
+                            # Se for Dezembro e a folga for Jan, assume proximo ano
+                            if datetime.now().month == 12 and mes == 1: ano += 1
+                            datas_para_salvar.add(datetime(ano, mes, dia).strftime('%Y-%m-%d'))
+                    except: pass
+
+            # C. Ferias
+            if col_ferias_ini and col_ferias_dias and pd.notna(row[col_ferias_ini]) and pd.notna(row[col_ferias_dias]):
+                try:
+                    val_ini = row[col_ferias_ini]
+                    dt_ini = None
+                    if isinstance(val_ini, datetime):
+                        dt_ini = val_ini
+                    else:
+                        str_val = str(val_ini).strip()
+                        if re.search(r'\d', str_val):
+                            # Tenta varios formatos
+                            for fmt in ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y']:
+                                try: dt_ini = datetime.strptime(str_val, fmt); break
+                                except: pass
+
+                    if dt_ini:
+                        dur_match = re.search(r'\d+', str(row[col_ferias_dias]))
+                        if dur_match and int(dur_match.group(0)) > 0:
+                            # Um periodo so (tabela ausencias), nao uma linha por dia
+                            duracao = int(dur_match.group(0))
+                            periodo_ferias = (dt_ini.strftime('%Y-%m-%d'), (dt_ini + timedelta(days=duracao - 1)).strftime('%Y-%m-%d'))
+                            linhas_ferias.append((id_analista, *periodo_ferias, "Ferias", ts_agora))
+                except: pass
+
+            linhas_indisp.extend((id_analista, dt_str, ts_agora) for dt_str in datas_para_salvar)
+            count_linha = len(datas_para_salvar)
+
+            if count_linha > 0:
+                log["Detalhes"] = f"+{count_linha} datas."
+            if periodo_ferias:
+                log["Detalhes"] = (log["Detalhes"] + f" Férias {periodo_ferias[0]} a {periodo_ferias[1]}.").strip()
+
+            logs.append(log)
+
+        if linhas_pref_turno:
+            db.run_many(conn, "UPDATE analistas SET pref_turno = ? WHERE id = ?", linhas_pref_turno)
+        if linhas_pref_dia:
+            db.run_many(conn, "UPDATE analistas SET pref_dia = ? WHERE id = ?", linhas_pref_dia)
+        # Um executemany so; datas repetidas atualizam a data de importacao
+        dados.registrar_indisponibilidades(conn, linhas_indisp)
+        ausencias.registrar(conn, linhas_ferias)
+        conn.commit()
+        return {"logs": logs, "datas": len(linhas_indisp), "ferias": len(linhas_ferias)}
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,125 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import avaliacao
+import engine
+from escala import dados, db
+
+
+def _usar_banco(dsn):
+    # dsn: caminho de um arquivo SQLite ou URL postgresql://... (uma equipe = um banco)
+    if dsn:
+        db.configurar(dsn)
+
+
+def listar_ciclos(dsn=None, apenas_pendentes=False):
+    """Ids dos ciclos do banco (mais recentes primeiro); apenas_pendentes ignora os que ja tem escala salva."""
+    _usar_banco(dsn)
+    db.init_all_db_tables()
+    conn = db.get_db_connection()
+    try:
+        query = "SELECT id FROM ciclos ORDER BY data_inicio DESC"
+        if apenas_pendentes:
+            query = "SELECT id FROM ciclos WHERE id NOT IN (SELECT DISTINCT id_ciclo FROM escala_salva) AND NOT arquivado ORDER BY data_inicio DESC"
+        return [int(i) for i in pd.read_sql_query(query, conn)['id']]
+    finally:
+        conn.close()
+
+
+def gerar_ciclo(id_ciclo, dsn=None, salvar=False, sobrescrever=False, pasta_xlsx=None, semente=None, usar_saldo=True):
+    """
+    Gera a escala de um ciclo como a pagina "Gerar Escala" faz (indisponibilidades, engine,
+    MENTOR e SOBREAVISO) e opcionalmente grava no historico e/ou num .xlsx.
+    Devolve um dicionario com status, resumo do log e metricas de qualidade.
+    """
+    _usar_banco(dsn)
+    if semente is not None:
+        random.seed(semente)
+    t0 = time.perf_counter()
+    resultado = {"db": db.get_dsn(), "id_ciclo": int(id_ciclo)}
+
+    db.init_all_db_tables()
+    conn = db.get_db_connection()
+    try:
+        # So a janela do ciclo (folgas, sobreaviso, dias e escala salva)
+        pacote = dados.carregar_pacote_ciclo(id_ciclo, conn)
+        if pacote is None:
+            return {**resultado, "status": "erro", "erro": "Ciclo nao encontrado"}
+        nome_ciclo = pacote["nome_ciclo"]
+        resultado["nome_ciclo"] = nome_ciclo
+
+        if not sobrescrever and not pacote["df_escala_salva"].empty:
+            return {**resultado, "status": "ja_salva"}
+        revisao = pacote["revisao"]
+
+        regras_staff = dados.load_staff_rules_from_db(conn)
+        horas_turno = dados.load_shift_hours_from_db(conn)
+        saldo_anterior = dados.carregar_saldo_anterior(id_ciclo, conn) if usar_saldo else {}
+    finally:
+        conn.close()
+
+    df_analistas = pacote["df_analistas"]
+    if df_analistas.empty:
+        return {**resultado, "status": "erro", "erro": "Nenhum analista cadastrado"}
+
+    df_dias_ciclo = pacote["df_dias_ciclo"]
+    dias_ciclo = engine.montar_dias(df_dias_ciclo)
+    mapa_coluna_data = {dia.coluna: dia.data for dia in dias_ciclo}
+
+    df_proposta = engine.montar_proposta(df_analistas, pacote["df_indisp"], dias_ciclo, pacote["df_ausencias"])
+    df_escala, log_geracao = engine.executar_logica_de_alocacao(
+        df_proposta, df_analistas, dias_ciclo, regras_staff, dados.REGRAS_QUALIDADE, saldo_anterior=saldo_anterior)
+    df_final = engine.adicionar_rodape(
+        df_escala, df_analistas, pacote["df_sobreaviso"], mapa_coluna_data, dados.REGRAS_QUALIDADE["niveis_experientes"])
+
+    resultado["status"] = "gerada"
+    if salvar:
+        conn = db.get_db_connection()
+        try:
+            # Sem --sobrescrever, um save feito por outra sessao durante a geracao vira erro (ConflitoDeRevisao)
+            resultado["registros_salvos"] = dados.salvar_escala_historico(
+                conn, id_ciclo, df_final, revisao_esperada=None if sobrescrever else revisao)
+            conn.commit()
+        finally:
+            conn.close()
+        resultado["status"] = "salva"
+
+    if pasta_xlsx:
+        os.makedirs(pasta_xlsx, exist_ok=True)
+        nome_arquivo = f"escala_{nome_ciclo}.xlsx".replace('/', '-').replace(' ', '_')
+        caminho = os.path.join(pasta_xlsx, nome_arquivo)
+        with open(caminho, "wb") as f:
+            f.write(dados.to_excel(df_final))
+        resultado["arquivo_xlsx"] = caminho
+
+    metricas = avaliacao.avaliar_escala(df_final, df_analistas, regras_staff, horas_turno)
+    metricas.pop("vagas_nao_preenchidas")
+    resultado.update(log_geracao.resumo())
+    resultado.update(metricas)
+    resultado["segundos"] = round(time.perf_counter() - t0, 3)
+    return resultado
+
+
+def _executar_tarefa(tarefa):
+    # Roda dentro do worker: um erro num ciclo nao derruba o lote inteiro
+    dsn, id_ciclo, opcoes = tarefa
+    try:
+        return gerar_ciclo(id_ciclo, dsn=dsn, **opcoes)
+    except Exception as e:
+        return {"db": dsn, "id_ciclo": id_ciclo, "status": "erro", "erro": str(e)}
+
+
+def gerar_lote(tarefas, workers=1, **opcoes):
+    """
+    tarefas: lista de (dsn, id_ciclo). Com workers > 1 cada ciclo roda num processo separado.
+    As opcoes (salvar, sobrescrever, pasta_xlsx, semente, usar_saldo) valem para todos.
+    """
+    lista = [(dsn, id_ciclo, opcoes) for dsn, id_ciclo in tarefas]
+    if workers <= 1 or len(lista) <= 1:
+        return [_executar_tarefa(t) for t in lista]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_executar_tarefa, lista))
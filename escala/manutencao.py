@@ -0,0 +1,219 @@
+"""
+Manutencao da tabela indisponibilidades (cresce a cada importacao do Forms):
+
+    remover_duplicadas   apaga repeticoes de (analista, data) em lotes, mantendo o maior id
+                         (so roda em bancos sem o UNIQUE(id_analista, data), os unicos com repeticoes)
+    aplicar_retencao     apaga, ou move para o Parquet do escala/arquivo.py, as folgas
+                         (e os periodos de ausencias) anteriores a hoje - N meses
+    otimizar             ANALYZE sempre; VACUUM (no SQLite so quando sobra espaco livre)
+                         so com vacuum=True
+
+Tambem apaga as tarefas de fundo (escala/tarefas.py) terminadas ha mais de
+tarefas.DIAS_GUARDAR dias, com o resultado e o .zip das exportacoes.
+
+executar() roda as tres; executar_se_vencida() so se a ultima execucao tiver mais de
+INTERVALO_DIAS (o Sistema.py chama em segundo plano, uma vez por processo e banco).
+O VACUUM disputa o banco com quem esta gravando, entao fica fora da rodada de fundo:
+so o botao da pagina e "python -m escala manutencao" (para agendar no cron) o pedem.
+
+Parametros em configuracao_limites: retencao_indisp_meses (0, o padrao, desliga a
+retencao) e retencao_indisp_arquivar (1 guarda no Parquet antes de apagar).
+"""
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from escala import arquivo, db, tarefas
+
+TAMANHO_LOTE = 5000
+INTERVALO_DIAS = 7
+# Retencao desligada ate o admin escolher os meses na pagina (apaga dados do usuario)
+RETENCAO_PADRAO = {"retencao_indisp_meses": 0, "retencao_indisp_arquivar": 1}
+# VACUUM so compensa quando boa parte das paginas do arquivo esta livre
+FRACAO_LIVRE_VACUUM = 0.2
+
+_agendados = set()
+_lock_agendados = threading.Lock()
+
+
+def carregar_retencao(conn):
+    regras = dict(RETENCAO_PADRAO)
+    df = pd.read_sql_query("SELECT chave, valor FROM configuracao_limites", conn)
+    for chave, valor in zip(df['chave'], df['valor']):
+        if chave in regras: regras[chave] = int(valor)
+    return regras
+
+
+def _tem_unico(conn):
+    # UNIQUE(id_analista, data) (todo banco criado pelo init_all_db_tables) impede repeticoes
+    if db.usando_postgres():
+        linhas = db.run_query(conn, """
+            SELECT indexdef FROM pg_indexes
+            WHERE tablename = 'indisponibilidades' AND schemaname = current_schema()
+        """).fetchall()
+        return any("UNIQUE" in linha['indexdef'] and "(id_analista, data)" in linha['indexdef'] for linha in linhas)
+    for indice in db.run_query(conn, "PRAGMA index_list(indisponibilidades)").fetchall():
+        colunas = [c['name'] for c in db.run_query(conn, f"PRAGMA index_info(\"{indice['name']}\")").fetchall()]
+        if indice['unique'] and colunas == ["id_analista", "data"]:
+            return True
+    return False
+
+
+def remover_duplicadas(conn, lote=TAMANHO_LOTE):
+    """ROW_NUMBER por (analista, data), lotes com commit: o lock de escrita fica curto. Devolve as linhas apagadas."""
+    if _tem_unico(conn):
+        return 0
+    total = 0
+    while True:
+        cursor = db.run_query(conn, """
+            DELETE FROM indisponibilidades WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY id_analista, data ORDER BY id DESC) AS ordem
+                    FROM indisponibilidades
+                ) repetidas
+                WHERE ordem > 1
+                LIMIT ?
+            )
+        """, (lote,))
+        conn.commit()
+        total += max(cursor.rowcount, 0)
+        if cursor.rowcount < lote:
+            return total
+
+
+# tabela: (coluna que decide a idade, colunas guardadas no arquivo)
+RETENCAO_TABELAS = {
+    "indisponibilidades": ("data", "t.id_analista, t.data, t.data_importacao"),
+    "ausencias": ("data_fim", "t.id_analista, t.data_inicio, t.data_fim, t.tipo, t.data_importacao"),
+}
+
+
+def aplicar_retencao(conn, meses, arquivar=True, lote=TAMANHO_LOTE):
+    """
+    Folgas e periodos de ausencia que terminaram antes de hoje - meses saem das tabelas
+    (para o Parquet, com arquivar). Devolve as linhas removidas.
+    """
+    if not meses:
+        return 0
+    limite = str(date.today() - relativedelta(months=meses))
+    total = 0
+    for tabela, (coluna_data, colunas) in RETENCAO_TABELAS.items():
+        while True:
+            sql = f"""
+                SELECT t.id, {colunas}, a.nome AS analista
+                FROM {tabela} t
+                LEFT JOIN analistas a ON a.id = t.id_analista
+                WHERE t.{coluna_data} < ?
+                ORDER BY t.{coluna_data}
+                LIMIT {int(lote)}
+            """
+            if db.usando_postgres():
+                sql = sql.replace('?', '%s')
+            df = pd.read_sql_query(sql, conn, params=[limite])
+            if df.empty:
+                break
+            # Parquet antes do DELETE: se o banco falhar, a proxima execucao grava o lote de novo
+            if arquivar:
+                arquivo.arquivar_registros(df, tabela, coluna_data)
+            db.run_many(conn, f"DELETE FROM {tabela} WHERE id = ?", [(int(i),) for i in df['id']])
+            conn.commit()
+            total += len(df)
+            if len(df) < lote:
+                break
+    return total
+
+
+def otimizar(conn, vacuum=False):
+    """Atualiza as estatisticas do planejador e, com vacuum, devolve o espaco livre. Faz commit antes. True se rodou VACUUM."""
+    conn.commit()
+    if db.usando_postgres():
+        if not vacuum:
+            conn.cursor().execute("ANALYZE indisponibilidades")
+            conn.commit()
+            return False
+        # VACUUM nao roda dentro de transacao
+        conn.autocommit = True
+        try:
+            conn.cursor().execute("VACUUM ANALYZE indisponibilidades")
+        finally:
+            conn.autocommit = False
+        return True
+    conn.execute("ANALYZE indisponibilidades")
+    conn.execute("PRAGMA optimize")
+    if not vacuum:
+        return False
+    paginas = conn.execute("PRAGMA page_count").fetchone()[0]
+    livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if paginas and livres / paginas >= FRACAO_LIVRE_VACUUM:
+        conn.execute("VACUUM")
+        return True
+    return False
+
+
+def _reservar(conn, intervalo_dias):
+    # Troca condicional do horario da ultima execucao: so um processo/replica ganha a vez.
+    # Em agendamentos (e nao em configuracao_limites): a escrita nao invalida o cache das regras
+    agora = time.time()
+    db.run_query(conn, """
+        INSERT INTO agendamentos (rotina, ultima_execucao) VALUES ('manutencao', 0)
+        ON CONFLICT (rotina) DO NOTHING
+    """)
+    cursor = db.run_query(conn, """
+        UPDATE agendamentos SET ultima_execucao = ?
+        WHERE rotina = 'manutencao' AND ultima_execucao <= ?
+    """, (agora, agora - intervalo_dias * 86400))
+    conn.commit()
+    return cursor.rowcount == 1
+
+
+def executar(conn=None, vacuum=False):
+    """Duplicadas, retencao e otimizacao (VACUUM so com vacuum=True). Devolve um dict com o que foi feito."""
+    db.init_all_db_tables()
+    fechar = conn is None
+    if fechar: conn = db.get_db_connection()
+    try:
+        regras = carregar_retencao(conn)
+        resultado = {
+            "duplicadas": remover_duplicadas(conn),
+            "retencao": aplicar_retencao(conn, regras["retencao_indisp_meses"], bool(regras["retencao_indisp_arquivar"])),
+            "tarefas": tarefas.limpar_finalizadas(conn),
+        }
+        conn.commit()
+        resultado["vacuum"] = otimizar(conn, vacuum)
+        return resultado
+    finally:
+        if fechar: conn.close()
+
+
+def executar_se_vencida(intervalo_dias=INTERVALO_DIAS):
+    db.init_all_db_tables()
+    conn = db.get_db_connection()
+    try:
+        if not _reservar(conn, intervalo_dias):
+            return None
+        return executar(conn)
+    finally:
+        conn.close()
+
+
+def agendar(intervalo_dias=INTERVALO_DIAS):
+    """Dispara executar_se_vencida numa thread de fundo, no maximo uma vez por processo e banco."""
+    dsn = db.get_dsn()
+    with _lock_agendados:
+        if dsn in _agendados:
+            return
+        _agendados.add(dsn)
+
+    equipe = db.equipe_atual()
+
+    def rodar():
+        try:
+            with db.na_equipe(equipe):
+                executar_se_vencida(intervalo_dias)
+        except Exception as e:
+            print(f"Aviso: manutencao de indisponibilidades falhou: {e}")
+
+    threading.Thread(target=rodar, name="escala-manutencao", daemon=True).start()
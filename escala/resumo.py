@@ -0,0 +1,140 @@
+"""
+Resumo por analista e ciclo (turnos, horas, fins de semana e dias de mentor)
+mantido a cada escala salva.
+
+salvar_escala_historico atualiza as linhas do ciclo na mesma transacao, entao o
+saldo dos ciclos anteriores e os relatorios (pagina Analise de Carga) saem de
+poucas linhas desta tabela em vez de reler todo o escala_salva. Bancos que ja tinham escalas salvas antes da tabela
+existir sao preenchidos uma vez (preencher_ciclos_faltantes, no init_all_db_tables).
+"""
+import pandas as pd
+
+from escala import db
+
+TURNOS_TRABALHO = ["Manha", "Noite", "Integral"]
+LINHAS_RODAPE = ["MENTOR", "SOBREAVISO"]
+
+# Quantos ciclos salvos anteriores entram no saldo levado para o proximo ciclo
+CICLOS_SALDO = 3
+
+_bancos_preenchidos = set()
+
+
+def resumir_matriz(df_final, horas_turno, datas_coluna=None):
+    """
+    Linhas (nome_analista, turnos_manha, turnos_noite, turnos_integral, turnos, horas, fins_de_semana, dias_mentor)
+    da matriz do ciclo. datas_coluna ({rotulo: date}) identifica os sabados/domingos.
+    """
+    datas_coluna = datas_coluna or {}
+    # Sabado e o Domingo seguinte contam como um fim de semana so
+    semana_fds = {coluna: (data.toordinal() + 1) // 7 for coluna, data in datas_coluna.items() if data.weekday() >= 5}
+    linha_mentor = df_final.loc["MENTOR"] if "MENTOR" in df_final.index else pd.Series(dtype=object)
+    mentor_por_nome = linha_mentor.value_counts()
+
+    df_turnos = df_final.drop(index=LINHAS_RODAPE, errors='ignore')
+    linhas = []
+    for nome, linha in df_turnos.iterrows():
+        contagem = linha.value_counts()
+        por_turno = [int(contagem.get(turno, 0)) for turno in TURNOS_TRABALHO]
+        horas = sum(qtd * float(horas_turno.get(turno, 0)) for turno, qtd in zip(TURNOS_TRABALHO, por_turno))
+        trabalhados = linha.index[linha.isin(TURNOS_TRABALHO)]
+        fins_de_semana = len({semana_fds[coluna] for coluna in trabalhados if coluna in semana_fds})
+        linhas.append((nome, *por_turno, sum(por_turno), horas, fins_de_semana, int(mentor_por_nome.get(nome, 0))))
+    return linhas
+
+
+def datas_do_ciclo(conn, id_ciclo):
+    df_dias = pd.read_sql_query(f"SELECT nome_coluna, data_dia FROM ciclo_dias WHERE id_ciclo = {int(id_ciclo)}", conn)
+    return dict(zip(df_dias['nome_coluna'], pd.to_datetime(df_dias['data_dia']).dt.date))
+
+
+def atualizar_ciclo(conn, id_ciclo, df_final, horas_turno, datas_coluna=None):
+    # Sem commit: roda dentro da transacao de salvar_escala_historico (que ja passa as datas lidas antes)
+    if datas_coluna is None:
+        datas_coluna = datas_do_ciclo(conn, id_ciclo)
+    linhas = resumir_matriz(df_final, horas_turno, datas_coluna)
+    db.run_query(conn, "DELETE FROM resumo_analista_ciclo WHERE id_ciclo = ?", (int(id_ciclo),))
+    db.run_many(conn, """
+        INSERT INTO resumo_analista_ciclo (id_ciclo, nome_analista, turnos_manha, turnos_noite, turnos_integral,
+                                           turnos, horas, fins_de_semana, dias_mentor)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(int(id_ciclo), *linha) for linha in linhas])
+
+
+def preencher_ciclos_faltantes(conn, horas_turno):
+    """
+    Resume (uma vez por banco e processo) os ciclos salvos que ainda nao estao na tabela
+    ou que foram resumidos antes das colunas de fim de semana/mentor. Faz commit.
+    """
+    dsn = db.get_dsn()
+    if dsn in _bancos_preenchidos:
+        return 0
+    df_faltantes = pd.read_sql_query("""
+        SELECT e.id_ciclo, e.nome_analista, e.nome_coluna_dia, e.turno
+        FROM escala_salva e
+        WHERE e.id_ciclo NOT IN (SELECT DISTINCT id_ciclo FROM resumo_analista_ciclo WHERE dias_mentor IS NOT NULL)
+    """, conn)
+    for id_ciclo, df_ciclo in df_faltantes.groupby('id_ciclo'):
+        matriz = df_ciclo.pivot(index='nome_analista', columns='nome_coluna_dia', values='turno')
+        atualizar_ciclo(conn, id_ciclo, matriz, horas_turno)
+    conn.commit()
+    _bancos_preenchidos.add(dsn)
+    return df_faltantes['id_ciclo'].nunique()
+
+
+def carregar_carga(conn, data_inicio=None, data_fim=None, niveis=None):
+    """
+    Linhas do resumo (uma por analista e ciclo) dos ciclos que comecam no periodo,
+    com nome/data do ciclo e o nivel atual do analista. niveis filtra pelo nivel.
+    """
+    filtros = []
+    params = []
+    if data_inicio is not None:
+        filtros.append("c.data_inicio >= ?")
+        params.append(str(data_inicio))
+    if data_fim is not None:
+        filtros.append("c.data_inicio <= ?")
+        params.append(str(data_fim))
+    if niveis:
+        filtros.append(f"a.nivel IN ({', '.join('?' for _ in niveis)})")
+        params.extend(niveis)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+
+    sql = f"""
+        SELECT r.id_ciclo, c.nome_ciclo, c.data_inicio, r.nome_analista, a.nivel,
+               r.turnos_manha, r.turnos_noite, r.turnos_integral, r.turnos, r.horas,
+               r.fins_de_semana, r.dias_mentor
+        FROM resumo_analista_ciclo r
+        JOIN ciclos c ON c.id = r.id_ciclo
+        LEFT JOIN analistas a ON a.nome = r.nome_analista
+        {where}
+        ORDER BY c.data_inicio, r.nome_analista
+    """
+    if db.usando_postgres():
+        sql = sql.replace('?', '%s')
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def carregar_saldo(conn, id_ciclo, ciclos=CICLOS_SALDO):
+    """
+    Saldo de cada analista nos ultimos ciclos salvos que comecaram antes deste:
+    {nome: {"turnos": x, "horas": y}}, com x/y = diferenca para a media da equipe por ciclo
+    (positivo = trabalhou mais que a media). Sem historico devolve {}.
+    """
+    df = pd.read_sql_query(f"""
+        SELECT r.id_ciclo, r.nome_analista, r.turnos, r.horas
+        FROM resumo_analista_ciclo r
+        WHERE r.id_ciclo IN (
+            SELECT id FROM ciclos
+            WHERE data_inicio < (SELECT data_inicio FROM ciclos WHERE id = {int(id_ciclo)})
+            AND id IN (SELECT DISTINCT id_ciclo FROM resumo_analista_ciclo)
+            ORDER BY data_inicio DESC
+            LIMIT {int(ciclos)}
+        )
+    """, conn)
+    if df.empty:
+        return {}
+    qtd_ciclos = df['id_ciclo'].nunique()
+    totais = df.groupby('nome_analista')[['turnos', 'horas']].sum()
+    saldo = (totais - totais.mean()) / qtd_ciclos
+    return {nome: {"turnos": float(linha['turnos']), "horas": float(linha['horas'])} for nome, linha in saldo.iterrows()}
@@ -0,0 +1,335 @@
+"""
+Fila local de tarefas demoradas (importacao da planilha, geracao de ciclos, exportacao),
+gravada na tabela tarefas do proprio banco e executada num pool de threads do processo.
+
+    id_tarefa = tarefas.enviar("gerar_ciclos", ids_ciclo=[3, 4], salvar=True)
+    tarefas.status(id_tarefa)      # {"status": "executando", "progresso": 0.5, "mensagem": ...}
+    tarefas.cancelar(id_tarefa)
+    tarefas.resultado(id_tarefa)   # o dict devolvido pela funcao, quando "concluida"
+
+A pagina so envia e consulta o status: a tarefa continua se a aba for recarregada.
+Cada funcao registrada com @tipo("nome") recebe um Andamento e os parametros (JSON);
+andamento(fracao, mensagem) grava o progresso e levanta TarefaCancelada se alguem
+pediu o cancelamento. Tarefas pendentes de um processo que parou sao retomadas por
+retomar_pendentes() (Sistema.py) ou pelo "python -m escala worker".
+
+Status: pendente -> executando -> concluida | erro | cancelada.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import traceback
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from escala import arquivo, db
+
+MAX_WORKERS = 2
+# executando sem sinal de vida ha mais que isso: o processo que rodava morreu
+TEMPO_SEM_SINAL = timedelta(minutes=10)
+# andamento() grava no maximo uma vez por intervalo (o cancelamento e checado junto)
+INTERVALO_PROGRESSO = 0.5
+
+ATIVAS = ("pendente", "executando")
+# Concluidas/com erro/canceladas mais antigas que isso saem na manutencao (com o .zip da exportacao)
+DIAS_GUARDAR = 7
+
+_tipos = {}
+_executor = None
+_lock_executor = threading.Lock()
+_retomados = set()
+
+
+class TarefaCancelada(Exception):
+    pass
+
+
+def tipo(nome):
+    def decorador(func):
+        _tipos[nome] = func
+        return func
+    return decorador
+
+
+def _agora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _pool():
+    global _executor
+    with _lock_executor:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="escala-tarefa")
+        return _executor
+
+
+def _agendar(id_tarefa):
+    # A thread herda a equipe (ContextVar) de quem enviou, mas nao as versoes lidas naquele rerun
+    contexto = contextvars.copy_context()
+    contexto.run(db.esquecer_versoes)
+    _pool().submit(contexto.run, executar, id_tarefa)
+
+
+def enviar(nome_tipo, **parametros):
+    """Grava a tarefa como pendente e a coloca no pool deste processo. Devolve o id."""
+    if nome_tipo not in _tipos:
+        raise ValueError(f"Tipo de tarefa desconhecido: {nome_tipo}")
+    db.init_all_db_tables()
+    conn = db.get_db_connection()
+    try:
+        id_tarefa = db.inserir_retornando_id(conn, """
+            INSERT INTO tarefas (tipo, parametros, status, progresso, criada_em, atualizada_em)
+            VALUES (?, ?, 'pendente', 0, ?, ?)
+        """, (nome_tipo, json.dumps(parametros, default=str), _agora(), _agora()))
+        conn.commit()
+    finally:
+        conn.close()
+    _agendar(id_tarefa)
+    return id_tarefa
+
+
+def _ler(conn, id_tarefa):
+    cursor = db.run_query(conn, """
+        SELECT id, tipo, status, progresso, mensagem, erro, cancelar, criada_em, concluida_em
+        FROM tarefas WHERE id = ?
+    """, (int(id_tarefa),))
+    linha = cursor.fetchone()
+    # sqlite3.Row e RealDictRow (Postgres) viram dict pelo nome das colunas
+    return dict(linha) if linha is not None else None
+
+
+def status(id_tarefa):
+    conn = db.get_read_connection()
+    try:
+        return _ler(conn, id_tarefa)
+    finally:
+        conn.close()
+
+
+def listar(tipos=None, limite=10):
+    """Tarefas mais recentes (dos tipos pedidos), sem parametros nem resultado."""
+    filtro = f"WHERE tipo IN ({', '.join('?' for _ in tipos)})" if tipos else ""
+    sql = f"""
+        SELECT id, tipo, status, progresso, mensagem, erro, criada_em, concluida_em
+        FROM tarefas {filtro} ORDER BY id DESC LIMIT {int(limite)}
+    """
+    if db.usando_postgres():
+        sql = sql.replace('?', '%s')
+    db.init_all_db_tables()
+    conn = db.get_read_connection()
+    try:
+        return pd.read_sql_query(sql, conn, params=list(tipos or []))
+    finally:
+        conn.close()
+
+
+def resultado(id_tarefa):
+    conn = db.get_read_connection()
+    try:
+        linha = db.run_query(conn, "SELECT resultado FROM tarefas WHERE id = ? AND status = 'concluida'",
+                             (int(id_tarefa),)).fetchone()
+    finally:
+        conn.close()
+    return json.loads(linha['resultado']) if linha and linha['resultado'] else None
+
+
+def cancelar(id_tarefa):
+    """Pendente cancela na hora; executando para no proximo andamento()."""
+    conn = db.get_db_connection()
+    try:
+        db.run_query(conn, "UPDATE tarefas SET status = 'cancelada', concluida_em = ? WHERE id = ? AND status = 'pendente'",
+                     (_agora(), int(id_tarefa)))
+        db.run_query(conn, "UPDATE tarefas SET cancelar = TRUE WHERE id = ? AND status = 'executando'", (int(id_tarefa),))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class Andamento:
+    """Passado para a funcao da tarefa: andamento(fracao, mensagem) grava o progresso."""
+
+    def __init__(self, id_tarefa):
+        self.id_tarefa = id_tarefa
+        self._ultima = 0.0
+
+    def __call__(self, fracao, mensagem=None, forcar=False):
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima < INTERVALO_PROGRESSO:
+            return
+        self._ultima = agora
+        conn = db.get_db_connection()
+        try:
+            db.run_query(conn, "UPDATE tarefas SET progresso = ?, mensagem = ?, atualizada_em = ? WHERE id = ?",
+                         (float(fracao), mensagem, _agora(), self.id_tarefa))
+            conn.commit()
+            tarefa = _ler(conn, self.id_tarefa)
+            # Linha apagada (RESETAR TUDO) tambem para a tarefa
+            cancelada = tarefa is None or tarefa["cancelar"]
+        finally:
+            conn.close()
+        if cancelada:
+            raise TarefaCancelada()
+
+
+def _finalizar(id_tarefa, status_final, resultado_json=None, erro=None):
+    conn = db.get_db_connection()
+    try:
+        db.run_query(conn, """
+            UPDATE tarefas SET status = ?, resultado = ?, erro = ?, progresso = CASE WHEN ? = 'concluida' THEN 1 ELSE progresso END,
+                               concluida_em = ?, atualizada_em = ?
+            WHERE id = ?
+        """, (status_final, resultado_json, erro, status_final, _agora(), _agora(), id_tarefa))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def executar(id_tarefa):
+    """Roda a tarefa se ainda estiver pendente (a troca pendente -> executando decide quem roda)."""
+    conn = db.get_db_connection()
+    try:
+        cursor = db.run_query(conn, "UPDATE tarefas SET status = 'executando', atualizada_em = ? WHERE id = ? AND status = 'pendente'",
+                              (_agora(), int(id_tarefa)))
+        conn.commit()
+        if cursor.rowcount != 1:
+            return None
+    finally:
+        conn.close()
+
+    # Daqui em diante qualquer falha termina como "erro" (nunca fica executando para sempre)
+    try:
+        conn = db.get_read_connection()
+        try:
+            linha = db.run_query(conn, "SELECT tipo, parametros FROM tarefas WHERE id = ?", (int(id_tarefa),)).fetchone()
+        finally:
+            conn.close()
+        parametros = json.loads(linha['parametros'] or "{}")
+        valor = _tipos[linha['tipo']](Andamento(int(id_tarefa)), **parametros)
+        _finalizar(int(id_tarefa), "concluida", json.dumps(valor, default=str))
+        return "concluida"
+    except TarefaCancelada:
+        _finalizar(int(id_tarefa), "cancelada")
+        return "cancelada"
+    except Exception as e:
+        traceback.print_exc()
+        _finalizar(int(id_tarefa), "erro", erro=str(e) or type(e).__name__)
+        return "erro"
+
+
+def retomar_pendentes():
+    """
+    Marca como erro as tarefas "executando" sem sinal de vida e coloca as pendentes no pool.
+    Uma vez por processo e banco (o Sistema.py chama a cada rerun).
+    """
+    dsn = db.get_dsn()
+    with _lock_executor:
+        if dsn in _retomados:
+            return
+        _retomados.add(dsn)
+    db.init_all_db_tables()
+    conn = db.get_db_connection()
+    try:
+        limite = (datetime.now() - TEMPO_SEM_SINAL).strftime('%Y-%m-%d %H:%M:%S')
+        db.run_query(conn, """
+            UPDATE tarefas SET status = 'erro', erro = 'Interrompida (o processo parou durante a execucao)', concluida_em = ?
+            WHERE status = 'executando' AND atualizada_em < ?
+        """, (_agora(), limite))
+        conn.commit()
+        pendentes = [linha['id'] for linha in db.run_query(conn, "SELECT id FROM tarefas WHERE status = 'pendente' ORDER BY id").fetchall()]
+    finally:
+        conn.close()
+    for id_tarefa in pendentes:
+        _agendar(id_tarefa)
+
+
+def pasta_exportacoes():
+    """Os .zip das exportacoes ficam junto do arquivo morto (escala/arquivo.py), fora do banco."""
+    return os.path.join(arquivo.pasta_arquivo(), "exportacoes")
+
+
+def _caminho_zip(id_tarefa):
+    return os.path.join(pasta_exportacoes(), f"escalas_{int(id_tarefa)}.zip")
+
+
+def limpar_finalizadas(conn, dias=DIAS_GUARDAR):
+    """Apaga as tarefas que terminaram ha mais de `dias` (com o resultado e o .zip). Sem commit; devolve as linhas."""
+    limite = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%d %H:%M:%S')
+    filtro = f"status NOT IN ({', '.join('?' for _ in ATIVAS)}) AND concluida_em < ?"
+    ids = [linha['id'] for linha in db.run_query(conn, f"SELECT id FROM tarefas WHERE {filtro}", (*ATIVAS, limite)).fetchall()]
+    for id_tarefa in ids:
+        try:
+            os.remove(_caminho_zip(id_tarefa))
+        except FileNotFoundError:
+            pass
+    db.run_many(conn, "DELETE FROM tarefas WHERE id = ?", [(int(i),) for i in ids])
+    return len(ids)
+
+
+def processar_fila(intervalo=2.0, uma_vez=False):
+    """Worker fora do Streamlit ("python -m escala worker"): roda as pendentes deste banco, uma por vez."""
+    db.init_all_db_tables()
+    while True:
+        conn = db.get_read_connection()
+        try:
+            linha = db.run_query(conn, "SELECT id FROM tarefas WHERE status = 'pendente' ORDER BY id LIMIT 1").fetchone()
+        finally:
+            conn.close()
+        if linha is not None:
+            print(f"tarefa {linha['id']}: {executar(linha['id'])}")
+        elif uma_vez:
+            return
+        else:
+            time.sleep(intervalo)
+
+
+# --- Tipos de tarefa ---
+
+@tipo("importar_formulario")
+def _importar_formulario(andamento, planilha, ts_agora):
+    from escala import importacao
+    return importacao.importar_formulario(importacao.planilha_de_json(planilha), ts_agora, andamento)
+
+
+@tipo("gerar_ciclos")
+def _gerar_ciclos(andamento, ids_ciclo, salvar=False, sobrescrever=False, semente=None, usar_saldo=True):
+    # Sem dsn: lote.gerar_ciclo usa o banco (e a equipe) desta thread
+    from escala import lote
+    resultados = []
+    for i, id_ciclo in enumerate(ids_ciclo):
+        andamento(i / len(ids_ciclo), f"Ciclo {i + 1} de {len(ids_ciclo)}", forcar=True)
+        try:
+            resultados.append(lote.gerar_ciclo(id_ciclo, salvar=salvar, sobrescrever=sobrescrever,
+                                               semente=semente, usar_saldo=usar_saldo))
+        except Exception as e:
+            resultados.append({"id_ciclo": id_ciclo, "status": "erro", "erro": str(e)})
+    return {"resultados": resultados}
+
+
+@tipo("exportar_escalas")
+def _exportar_escalas(andamento, ids_ciclo):
+    """Um .xlsx por ciclo salvo, num .zip em pasta_exportacoes() (o resultado guarda so o caminho)."""
+    from escala import dados
+    caminho = _caminho_zip(andamento.id_tarefa)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    gravados = 0
+    # Grava ao lado e renomeia no fim: cancelada ou com erro nao deixa .zip pela metade
+    try:
+        with zipfile.ZipFile(caminho + ".tmp", "w", zipfile.ZIP_DEFLATED) as arquivo_zip:
+            for i, id_ciclo in enumerate(ids_ciclo):
+                andamento(i / len(ids_ciclo), f"Ciclo {i + 1} de {len(ids_ciclo)}", forcar=True)
+                nome_ciclo, matriz = dados.carregar_matriz_salva(id_ciclo)
+                if matriz.empty:
+                    continue
+                nome_arquivo = f"escala_{nome_ciclo}.xlsx".replace('/', '-').replace(' ', '_')
+                arquivo_zip.writestr(nome_arquivo, dados.to_excel(matriz))
+                gravados += 1
+    except BaseException:
+        os.remove(caminho + ".tmp")
+        raise
+    os.replace(caminho + ".tmp", caminho)
+    return {"arquivo": os.path.abspath(caminho), "ciclos": gravados}
@@ -0,0 +1,78 @@
+"""
+Log estruturado e limitado da alocacao.
+
+O engine registra eventos tipados (slot processado, sem candidatos, rejeicao
+por limite de horas ou por regra de descanso, vaga sem a skill exigida) num buffer circular de tamanho fixo e mantem contadores
+agregados de todos os eventos, inclusive dos que ja sairam do buffer. O texto
+so e montado quando alguem pede (renderizar / iterar).
+"""
+from collections import Counter, deque, namedtuple
+from itertools import islice
+
+INFO = "info"
+SLOT_PROCESSADO = "slot_processado"
+SEM_CANDIDATOS = "sem_candidatos"
+LIMITE_HORAS = "limite_horas"
+DESCANSO = "descanso"
+SKILL_FALTANTE = "skill_faltante"
+
+CAPACIDADE_PADRAO = 500
+
+Evento = namedtuple("Evento", ["tipo", "coluna_dia", "turno", "detalhe"])
+
+
+def _formatar(evento):
+    dia = (evento.coluna_dia or "").replace("\n", " ")
+    if evento.tipo == SLOT_PROCESSADO:
+        return f"Processando: {dia} - {evento.turno} ({evento.detalhe} alocado(s))"
+    if evento.tipo == SEM_CANDIDATOS:
+        return f"  -> ALERTA: Sem candidatos em {dia} - {evento.turno}."
+    if evento.tipo == LIMITE_HORAS:
+        return f"  -> {evento.detalhe} analista(s) barrado(s) pelo limite de horas em {dia} - {evento.turno}"
+    if evento.tipo == DESCANSO:
+        motivos = ", ".join(f"{motivo}: {qtd}" for motivo, qtd in evento.detalhe.items())
+        return f"  -> Barrados por regra de descanso em {dia} - {evento.turno} ({motivos})"
+    if evento.tipo == SKILL_FALTANTE:
+        faltas = ", ".join(f"{skill}: falta(m) {qtd}" for skill, qtd in evento.detalhe.items())
+        return f"  -> ALERTA: Cobertura de skill incompleta em {dia} - {evento.turno} ({faltas})"
+    return str(evento.detalhe)
+
+
+class LogAlocacao:
+    def __init__(self, capacidade=CAPACIDADE_PADRAO):
+        self.eventos = deque(maxlen=capacidade)
+        self.contadores = Counter()
+        self.total_eventos = 0
+
+    def registrar(self, tipo, coluna_dia=None, turno=None, detalhe=None, quantidade=1):
+        # quantidade > 1 agrega varias ocorrencias (ex: N rejeicoes) num unico evento
+        self.contadores[tipo] += quantidade
+        self.total_eventos += 1
+        self.eventos.append(Evento(tipo, coluna_dia, turno, detalhe))
+
+    def info(self, mensagem):
+        self.registrar(INFO, detalhe=mensagem)
+
+    @property
+    def descartados(self):
+        # Eventos que ja sairam do buffer circular (continuam contados em self.contadores)
+        return self.total_eventos - len(self.eventos)
+
+    def resumo(self):
+        return {
+            "slots_processados": self.contadores[SLOT_PROCESSADO],
+            "slots_sem_candidatos": self.contadores[SEM_CANDIDATOS],
+            "rejeicoes_limite_horas": self.contadores[LIMITE_HORAS],
+            "rejeicoes_descanso": self.contadores[DESCANSO],
+            "vagas_sem_skill": self.contadores[SKILL_FALTANTE],
+        }
+
+    def __iter__(self):
+        return (_formatar(evento) for evento in self.eventos)
+
+    def __len__(self):
+        return len(self.eventos)
+
+    def renderizar(self, tipos=None, limite=None):
+        eventos = (e for e in self.eventos if tipos is None or e.tipo in tipos)
+        return "\n".join(_formatar(e) for e in islice(eventos, limite))
@@ -0,0 +1,87 @@
+import streamlit as st
+import pandas as pd
+from datetime import date
+from dateutil.relativedelta import relativedelta
+
+import database
+from escala import resumo
+
+st.set_page_config(layout="wide", page_title="Análise de Carga")
+st.title("Análise de Carga por Analista")
+st.caption("Lê o resumo por analista e ciclo (atualizado a cada escala salva), sem reler o histórico inteiro.")
+database.init_all_db_tables()
+
+# --- Filtros ---
+# Escalas salvas antes do resumo existir ja foram resumidas no init_all_db_tables
+conn = database.get_read_connection()
+try:
+    df_niveis = pd.read_sql_query("SELECT DISTINCT nivel FROM analistas ORDER BY nivel", conn)
+finally:
+    conn.close()
+
+hoje = date.today()
+col_periodo, col_nivel = st.columns([1, 1])
+with col_periodo:
+    periodo = st.date_input("Ciclos que começam entre", value=(hoje - relativedelta(months=6), hoje), format="DD/MM/YYYY")
+with col_nivel:
+    niveis_sel = st.multiselect("Nível", df_niveis['nivel'].dropna().tolist())
+
+if not isinstance(periodo, (tuple, list)) or len(periodo) != 2:
+    st.info("Selecione a data inicial e a final do período.")
+    st.stop()
+
+conn = database.get_read_connection()
+try:
+    df_carga = resumo.carregar_carga(conn, periodo[0], periodo[1], niveis_sel)
+finally:
+    conn.close()
+
+if df_carga.empty:
+    st.info("Nenhuma escala salva no período/níveis selecionados.")
+    st.stop()
+
+# --- Totais por analista ---
+df_por_analista = df_carga.groupby('nome_analista').agg(
+    nivel=('nivel', 'first'),
+    ciclos=('id_ciclo', 'nunique'),
+    turnos=('turnos', 'sum'),
+    manha=('turnos_manha', 'sum'),
+    noite=('turnos_noite', 'sum'),
+    integral=('turnos_integral', 'sum'),
+    horas=('horas', 'sum'),
+    fins_de_semana=('fins_de_semana', 'sum'),
+    dias_mentor=('dias_mentor', 'sum'),
+)
+df_por_analista['horas_por_ciclo'] = df_por_analista['horas'] / df_por_analista['ciclos']
+df_por_analista = df_por_analista.sort_values('horas', ascending=False)
+
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Ciclos", df_carga['id_ciclo'].nunique())
+c2.metric("Analistas", len(df_por_analista))
+c3.metric("Horas no período", f"{df_por_analista['horas'].sum():.1f}")
+c4.metric("Maior - menor (h/ciclo)", f"{df_por_analista['horas_por_ciclo'].max() - df_por_analista['horas_por_ciclo'].min():.1f}")
+
+st.header("1. Totais por Analista")
+st.dataframe(
+    df_por_analista,
+    column_config={
+        "horas": st.column_config.NumberColumn("Horas", format="%.1f"),
+        "horas_por_ciclo": st.column_config.NumberColumn("Horas/ciclo", format="%.1f"),
+        "fins_de_semana": "Fins de semana",
+        "dias_mentor": "Dias de mentor",
+    },
+    use_container_width=True
+)
+st.bar_chart(df_por_analista['horas'])
+
+st.header("2. Horas por Ciclo")
+ordem_ciclos = df_carga.drop_duplicates('id_ciclo').sort_values('data_inicio')['nome_ciclo'].tolist()
+df_horas_ciclo = df_carga.pivot_table(index='nome_analista', columns='nome_ciclo', values='horas', aggfunc='sum')
+st.dataframe(df_horas_ciclo.reindex(columns=ordem_ciclos), use_container_width=True)
+
+st.download_button(
+    label="📥 Baixar totais (CSV)",
+    data=df_por_analista.to_csv().encode('utf-8'),
+    file_name="carga_por_analista.csv",
+    mime="text/csv"
+)
@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import database
 import utils
-import holidays
+from escala import arquivo, cenarios, equipes, feriados
 import time 
 from datetime import time as dt_time, datetime
 
@@ -55,7 +55,6 @@ def save_staff_rules(regras):
         conn.commit()
         st.toast("Regras de Staff salvas com sucesso!", icon="✅")
         time.sleep(0.5) 
-        st.cache_data.clear()
         return True
     except Exception as e:
         st.error(f"Erro ao salvar: {e}")
@@ -63,6 +62,28 @@ def save_staff_rules(regras):
     finally:
         conn.close()
 
+def save_skill_rules(df_regras):
+    conn = database.get_db_connection()
+    try:
+        # A tabela e pequena: regrava tudo o que veio do editor
+        database.run_query(conn, "DELETE FROM regras_skill")
+        linhas = [(r['dia_tipo'], r['turno'], r['skill'], int(r['quantidade']))
+                  for _, r in df_regras.dropna(subset=['dia_tipo', 'turno', 'skill']).iterrows()
+                  if pd.notna(r['quantidade']) and int(r['quantidade']) > 0]
+        database.run_many(conn, """
+            INSERT INTO regras_skill (dia_tipo, turno, skill, quantidade) VALUES (?, ?, ?, ?)
+            ON CONFLICT(dia_tipo, turno, skill) DO UPDATE SET quantidade = excluded.quantidade
+        """, linhas)
+        conn.commit()
+        st.toast("Cobertura de skills salva!", icon="🎯")
+        time.sleep(0.5)
+        return True
+    except Exception as e:
+        st.error(f"Erro ao salvar skills: {e}")
+        return False
+    finally:
+        conn.close()
+
 def save_shift_hours(horas):
     conn = database.get_db_connection()
     try:
@@ -74,7 +95,6 @@ def save_shift_hours(horas):
         conn.commit()
         st.toast("Carga horária atualizada!", icon="⏰")
         time.sleep(0.5)
-        st.cache_data.clear()
         return True
     except Exception as e:
         st.error(f"Erro ao salvar horas: {e}")
@@ -92,7 +112,6 @@ def save_limits(limite):
         conn.commit()
         st.toast(f"Limite de horas salvo: {limite}h", icon="🛡️")
         time.sleep(0.5)
-        st.cache_data.clear()
         return True
     except Exception as e:
         st.error(f"Erro ao salvar limite: {e}")
@@ -100,17 +119,38 @@ def save_limits(limite):
     finally:
         conn.close()
 
+def save_rest_rules(regras):
+    conn = database.get_db_connection()
+    try:
+        database.run_many(conn, """
+            INSERT INTO configuracao_limites (chave, valor) VALUES (?, ?) 
+            ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor
+        """, list(regras.items()))
+        conn.commit()
+        st.toast("Regras de descanso salvas!", icon="🛌")
+        time.sleep(0.5)
+        return True
+    except Exception as e:
+        st.error(f"Erro ao salvar regras de descanso: {e}")
+        return False
+    finally:
+        conn.close()
+
 def delete_all_data():
     conn = database.get_db_connection()
     try:
         # Ordem importante para não quebrar Constraints (Foreign Keys)
         # Apagamos primeiro quem depende (filhos), depois os pais
         tables = [
+            "tarefas",
             "indisponibilidades", 
+            "ausencias", 
             "escala_salva", 
+            "resumo_analista_ciclo", 
             "ciclo_dias", 
             "sobreaviso", 
             "regras_staff",
+            "regras_skill",
             "configuracao_turnos", 
             "configuracao_limites", 
             "analistas", 
@@ -120,7 +160,7 @@ def delete_all_data():
         
         # CORREÇÃO CRÍTICA: Não tentar apagar sqlite_sequence no Postgres
         # Se tentar, a transação aborta e nada é apagado.
-        is_postgres = "POSTGRES_URL" in st.secrets
+        is_postgres = database.usando_postgres()
         if not is_postgres:
             tables.append("sqlite_sequence")
 
@@ -132,9 +172,10 @@ def delete_all_data():
                 print(f"Aviso ao limpar {t}: {e}")
             
         conn.commit()
+        # Escalas dos ciclos arquivados (Parquet fora do banco)
+        arquivo.apagar_arquivo()
         st.balloons() 
         st.success("Banco de dados resetado com sucesso!")
-        st.cache_data.clear()
         time.sleep(2)
     except Exception as e:
         st.error(f"Erro crítico ao resetar: {e}")
@@ -188,6 +229,30 @@ with st.form("form_regras_staff"):
         if save_staff_rules(novas_regras):
             st.rerun()
 
+st.subheader("Cobertura de Skills")
+st.caption("Mínimo de analistas com a skill em cada turno (ex: pelo menos 1 DD em toda Noite). O gerador garante essas vagas antes de completar o turno.")
+regras_skill = utils.load_skill_rules_from_db()
+df_regras_skill = pd.DataFrame(
+    [(dia, turno, skill, qtd) for dia, turnos in regras_skill.items() for turno, skills in turnos.items() for skill, qtd in skills.items()],
+    columns=["dia_tipo", "turno", "skill", "quantidade"]
+)
+df_skill_editado = st.data_editor(
+    df_regras_skill,
+    column_config={
+        "dia_tipo": st.column_config.SelectboxColumn("Dia", options=["Sabado", "Domingo", "Feriado"], required=True),
+        "turno": st.column_config.SelectboxColumn("Turno", options=["Manha", "Noite", "Integral"], required=True),
+        "skill": st.column_config.SelectboxColumn("Skill", options=list(utils.SKILLS), required=True),
+        "quantidade": st.column_config.NumberColumn("Mínimo", min_value=0, max_value=20, step=1, default=1),
+    },
+    num_rows="dynamic",
+    hide_index=True,
+    use_container_width=True,
+    key="editor_regras_skill"
+)
+if st.button("💾 Salvar Cobertura de Skills"):
+    if save_skill_rules(df_skill_editado):
+        st.rerun()
+
 # ==============================================================================
 # 2. CARGA HORÁRIA
 # ==============================================================================
@@ -221,6 +286,56 @@ with st.form("form_lim"):
         if save_limits(lh + lm / 60.0):
             st.rerun()
 
+st.subheader("Regras de Descanso")
+st.caption("Valem sobre as datas reais do ciclo. Use 0 para desligar uma regra.")
+regras_descanso = utils.load_rest_rules_from_db()
+
+with st.form("form_descanso"):
+    c1, c2 = st.columns(2)
+    with c1:
+        r_fds = st.number_input("Máx. fins de semana seguidos trabalhando", 0, 10, regras_descanso["max_fds_consecutivos"])
+        r_horas = st.number_input("Mín. horas de descanso entre turnos (ex: Noite → Manhã)", 0, 48, regras_descanso["min_horas_descanso"])
+    with c2:
+        r_turnos = st.number_input("Máx. turnos em 7 dias", 0, 7, regras_descanso["max_turnos_7_dias"])
+        r_pen = st.number_input("Penalidade Domingo → Sábado seguinte", 0, 1000, regras_descanso["penalidade_dom_sab"], step=50)
+
+    if st.form_submit_button("Salvar Regras de Descanso"):
+        if save_rest_rules({"max_fds_consecutivos": r_fds, "min_horas_descanso": r_horas,
+                            "max_turnos_7_dias": r_turnos, "penalidade_dom_sab": r_pen}):
+            st.rerun()
+
+with st.expander("🧪 Simular antes de salvar (e se...?)", expanded=False):
+    st.caption("Gera a escala de um ciclo em memória com as regras abaixo e compara com as regras atuais. Nada é gravado.")
+    conn_sim = database.get_read_connection()
+    try:
+        df_ciclos_sim = pd.read_sql_query("SELECT id, nome_ciclo FROM ciclos ORDER BY data_inicio DESC", conn_sim)
+    finally:
+        conn_sim.close()
+
+    if df_ciclos_sim.empty:
+        st.info("Crie um ciclo para poder simular.")
+    else:
+        ciclos_sim = dict(zip(df_ciclos_sim['id'], df_ciclos_sim['nome_ciclo']))
+        id_ciclo_sim = st.selectbox("Ciclo", options=ciclos_sim.keys(), format_func=lambda x: ciclos_sim[x], key="ciclo_sim")
+        df_staff_sim = st.data_editor(
+            pd.DataFrame(regras_atuais).reindex(index=["Manha", "Noite", "Integral"]).fillna(0).astype(int),
+            use_container_width=True,
+            key="editor_staff_sim"
+        )
+        # O limite salvo pode ser qualquer valor de 0 a 300: entra nas opcoes para poder ser o padrao
+        opcoes_limite = sorted({18, 24, 30, 36, 42, 48, int(lim)})
+        limites_sim = st.multiselect("Limites de horas a testar", opcoes_limite, default=[int(lim)], key="limites_sim")
+
+        if st.button("▶️ Simular", key="btn_simular"):
+            proposto = {dia: {turno: int(qtd) for turno, qtd in turnos.items()} for dia, turnos in df_staff_sim.to_dict().items()}
+            lista_cenarios = {"Atual": {}}
+            for limite_sim in limites_sim or [lim]:
+                lista_cenarios[f"Proposto ({limite_sim}h)"] = {"regras_staff": proposto, "max_horas_ciclo": limite_sim}
+            with st.spinner("Simulando..."):
+                base_sim = cenarios.carregar_base(id_ciclo_sim)
+                df_comparacao = cenarios.comparar(base_sim, lista_cenarios)
+            st.dataframe(df_comparacao, use_container_width=True)
+
 # ==============================================================================
 # 4. BANCO MESTRE DE FERIADOS
 # ==============================================================================
@@ -232,35 +347,29 @@ with st.expander("🛠️ Gerar Feriados Automaticamente", expanded=False):
     with col_ano:
         ano_geracao = st.number_input("Ano", min_value=2024, max_value=2030, value=datetime.now().year + 1)
     with col_est:
-        states = ["AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA", "PB", "PR", "PE",
-                  "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"]
-        estados_sel = st.multiselect("Estados", states, default=['PR', 'SP'])
+        estados_sel = st.multiselect("Estados", feriados.TODAS_UFS, default=['PR', 'SP'])
     with col_btn:
         st.write("")
         st.write("")
         if st.button("Gerar e Salvar", type="primary"):
-            br_holidays = holidays.BR(years=ano_geracao)
-            for state in estados_sel:
-                br_holidays += holidays.BR(state=state, years=ano_geracao)
             conn = database.get_db_connection()
-            count_new = 0
-            for date, name in br_holidays.items():
-                try:
-                    database.run_query(conn, 
-                        "INSERT INTO feriados_anuais (data_iso, nome_feriado, usar_na_escala) VALUES (?, ?, TRUE) ON CONFLICT(data_iso) DO NOTHING",
-                        (date.strftime('%Y-%m-%d'), name))
-                    count_new += 1
-                except: pass
-            conn.commit()
-            conn.close()
+            try:
+                # Calendario pre-calculado: so consulta a biblioteca holidays na primeira vez que o ano aparece
+                df_gerados = feriados.feriados_entre(conn, f"{ano_geracao}-01-01", f"{ano_geracao}-12-31", estados_sel)
+                cursor = database.run_many(conn,
+                    "INSERT INTO feriados_anuais (data_iso, nome_feriado, usar_na_escala) VALUES (?, ?, TRUE) ON CONFLICT(data_iso) DO NOTHING",
+                    [(d.strftime('%Y-%m-%d'), nome) for d, nome in df_gerados.itertuples(index=False)])
+                count_new = cursor.rowcount if cursor.rowcount >= 0 else len(df_gerados)
+                conn.commit()
+            finally:
+                conn.close()
             st.toast(f"{count_new} novos feriados adicionados!", icon="📅")
             time.sleep(1)
             st.rerun()
 
 # --- Editor ---
-conn = database.get_db_connection()
 try:
-    df_feriados = pd.read_sql_query("SELECT * FROM feriados_anuais ORDER BY data_iso", conn)
+    df_feriados = utils.carregar_feriados_mestre()
     if not df_feriados.empty:
         df_feriados['data_iso'] = pd.to_datetime(df_feriados['data_iso'])
         anos_dispo = sorted(df_feriados['data_iso'].dt.year.unique())
@@ -300,33 +409,31 @@ try:
         st.info("Nenhum feriado cadastrado.")
 except Exception as e:
     st.error(f"Erro ao carregar feriados: {e}")
-finally:
-    conn.close()
 
 # ==============================================================================
 # 5. AJUSTE FINO (CICLOS CRIADOS)
 # ==============================================================================
 st.divider()
 st.header("5. Ajuste Fino (Ciclo Atual)")
-conn = database.get_db_connection()
+conn = database.get_read_connection()
 try:
     df_ciclos = pd.read_sql_query("SELECT id, nome_ciclo FROM ciclos ORDER BY data_inicio DESC", conn)
     if not df_ciclos.empty:
         ciclos_dict = dict(zip(df_ciclos['id'], df_ciclos['nome_ciclo']))
         id_ciclo_edit = st.selectbox("Selecione o Ciclo:", options=ciclos_dict.keys(), format_func=lambda x: ciclos_dict[x])
 
-        df_dias = pd.read_sql_query(f"SELECT id, nome_coluna, data_dia, ativo FROM ciclo_dias WHERE id_ciclo = {id_ciclo_edit} ORDER BY data_dia ASC", conn)
+        df_dias = pd.read_sql_query(f"SELECT id, nome_coluna, data_dia, dia_tipo, ativo FROM ciclo_dias WHERE id_ciclo = {id_ciclo_edit} ORDER BY data_dia ASC", conn)
         if not df_dias.empty:
             df_dias['ativo'] = df_dias['ativo'].apply(lambda x: True if x else False)
-            df_editado_ciclo = st.data_editor(df_dias, column_config={"ativo": st.column_config.CheckboxColumn("Ativo?"), "id": None, "nome_coluna": "Nome", "data_dia": st.column_config.DateColumn("Data", disabled=True)}, hide_index=True, use_container_width=True)
+            df_editado_ciclo = st.data_editor(df_dias, column_config={"ativo": st.column_config.CheckboxColumn("Ativo?"), "id": None, "nome_coluna": "Nome", "data_dia": st.column_config.DateColumn("Data", disabled=True), "dia_tipo": st.column_config.SelectboxColumn("Regra", options=["Sabado", "Domingo", "Feriado"], required=True)}, hide_index=True, use_container_width=True)
 
             if st.button("💾 Atualizar Ciclo Atual"):
                 conn_save = database.get_db_connection()
                 try:
                     for i, row in df_editado_ciclo.iterrows():
                         database.run_query(conn_save, 
-                            "UPDATE ciclo_dias SET nome_coluna = ?, ativo = ? WHERE id = ?", 
-                            (row['nome_coluna'], bool(row['ativo']), row['id']))
+                            "UPDATE ciclo_dias SET nome_coluna = ?, dia_tipo = ?, ativo = ? WHERE id = ?", 
+                            (row['nome_coluna'], row['dia_tipo'], bool(row['ativo']), row['id']))
                     conn_save.commit()
                     st.toast("Ciclo atualizado!", icon="✅")
                     time.sleep(1)
@@ -337,10 +444,35 @@ except: pass
 finally: conn.close()
 
 # ==============================================================================
-# 6. ZONA DE PERIGO
+# 6. EQUIPES
+# ==============================================================================
+st.divider()
+st.header("6. Equipes")
+st.caption("Cada equipe tem seus próprios analistas, ciclos, regras e escalas (arquivo/schema separado). Com alguma equipe cadastrada, o seletor aparece na barra lateral.")
+df_equipes = equipes.listar_equipes()
+if not df_equipes.empty:
+    st.dataframe(df_equipes, column_config={"slug": "Identificador", "nome": "Equipe"}, hide_index=True, use_container_width=True)
+with st.form("form_equipe"):
+    c_nome, c_slug = st.columns([2, 1])
+    nome_equipe = c_nome.text_input("Nome da equipe")
+    slug_equipe = c_slug.text_input("Identificador (opcional)", help="Letras minúsculas, números e _. Vazio: gerado a partir do nome.")
+    if st.form_submit_button("➕ Cadastrar Equipe"):
+        if not nome_equipe.strip():
+            st.warning("Informe o nome da equipe.")
+        else:
+            try:
+                slug_criado = equipes.criar_equipe(nome_equipe, slug_equipe.strip() or None)
+                st.toast(f"Equipe '{slug_criado}' cadastrada!", icon="👥")
+                time.sleep(0.5)
+                st.rerun()
+            except ValueError as e:
+                st.error(str(e))
+
+# ==============================================================================
+# 7. ZONA DE PERIGO
 # ==============================================================================
 st.divider()
-st.header("6. Zona de Perigo")
+st.header("7. Zona de Perigo")
 c = st.checkbox("Confirmar exclusão total")
 if st.button("RESETAR TUDO", type="primary", disabled=not c):
     if c: delete_all_data(); st.rerun()
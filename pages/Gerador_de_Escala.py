@@ -1,35 +1,47 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
-from datetime import datetime
-import holidays
-import random
-import io
-from openpyxl.worksheet.datavalidation import DataValidation
 
 # --- NOSSOS MODULOS ---
 import database
 import utils
 import engine
+import profiler
+from escala import tarefas
 
 st.set_page_config(layout="wide", page_title="Gerador de Escala")
 st.title("Gerador de Escala (Matriz)")
 
+profiler.iniciar_execucao("Gerador_de_Escala")
+modo_debug = st.sidebar.checkbox("Debug: tempos por etapa", key="debug_tempos",
+                                 help="Mostra quanto tempo cada etapa (banco, engine, Excel) levou neste rerun.")
+
 # --- Carregar Dados ---
-df_analistas, df_indisp = utils.carregar_dados_locais()
-REGRAS_STAFF = utils.load_staff_rules_from_db()
-HORAS_TURNO = utils.load_shift_hours_from_db()
+def carregar_ciclos():
+    conn = database.get_read_connection()
+    try:
+        return pd.read_sql_query("SELECT id, nome_ciclo FROM ciclos ORDER BY data_inicio DESC", conn)
+    finally:
+        conn.close()
+
+# Leituras independentes vao juntas (cada uma na sua conexao): o rerun espera so a mais lenta
+with profiler.etapa("carregar_dados"):
+    carga = utils.carregar_em_paralelo({
+        "analistas": utils.carregar_analistas_ativos,
+        "regras_staff": utils.load_staff_rules_from_db,
+        "horas_turno": utils.load_shift_hours_from_db,
+        "ciclos": carregar_ciclos,
+    }, ignorar_erros=True)
+    df_analistas = pd.DataFrame() if isinstance(carga["analistas"], Exception) else carga["analistas"]
+    REGRAS_STAFF = carga["regras_staff"]
+    HORAS_TURNO = carga["horas_turno"]
 # -------------------------------------------
 
 # --- Carregar Ciclos Salvos ---
-try:
-    conn = database.get_db_connection()
-    df_ciclos = pd.read_sql_query("SELECT id, nome_ciclo FROM ciclos ORDER BY data_inicio DESC", conn)
-    ciclos_dict = dict(zip(df_ciclos['id'], df_ciclos['nome_ciclo']))
-    conn.close()
-except Exception as e:
-    st.error(f"Erro ao carregar ciclos: {e}")
+if isinstance(carga["ciclos"], Exception):
+    st.error(f"Erro ao carregar ciclos: {carga['ciclos']}")
     ciclos_dict = {}
+else:
+    ciclos_dict = dict(zip(carga["ciclos"]['id'], carga["ciclos"]['nome_ciclo']))
 
 # --- Interface Principal ---
 if df_analistas.empty:
@@ -52,29 +64,43 @@ else:
     if 'ciclo_anterior' not in st.session_state: st.session_state.ciclo_anterior = -1
     if 'df_analistas_editada' not in st.session_state: st.session_state.df_analistas_editada = None
     if 'df_rodape_editada' not in st.session_state: st.session_state.df_rodape_editada = None
+    if 'log_geracao' not in st.session_state: st.session_state.log_geracao = None
+    if 'revisao_base' not in st.session_state: st.session_state.revisao_base = 0
+    if 'conflito_save' not in st.session_state: st.session_state.conflito_save = None
+
+    def descartar_edicao():
+        # Volta a ler o ciclo do banco no proximo rerun (inclusive o estado interno dos editores)
+        for chave in ["df_analistas_editada", "df_rodape_editada", "escala_editor_analistas", "escala_editor_rodape"]:
+            st.session_state.pop(chave, None)
+        st.session_state.log_geracao = None
+        st.session_state.conflito_save = None
 
     if st.session_state.ciclo_anterior != id_ciclo_selecionado:
         st.session_state.ciclo_anterior = id_ciclo_selecionado
         st.session_state.df_analistas_editada = None
         st.session_state.df_rodape_editada = None
+        st.session_state.log_geracao = None
+        st.session_state.conflito_save = None
 
     if st.session_state.df_analistas_editada is None:
-        conn = database.get_db_connection()
-
-        # Carrega escala salva (se houver)
-        df_historico = pd.read_sql_query(
-            f"SELECT nome_analista, nome_coluna_dia, turno FROM escala_salva WHERE id_ciclo = {id_ciclo_selecionado}",
-            conn)
-
-        # Filtra apenas dias ATIVOS (Sem usar = 1 para compatibilidade Postgres)
-        df_dias_ciclo = pd.read_sql_query(
-            f"SELECT nome_coluna, data_dia FROM ciclo_dias WHERE id_ciclo = {id_ciclo_selecionado} AND ativo ORDER BY data_dia ASC",
-            conn)
-        
-        conn.close()
-
-        dias_para_coluna_str = df_dias_ciclo['nome_coluna'].tolist()
-        mapa_coluna_data = dict(zip(df_dias_ciclo['nome_coluna'], pd.to_datetime(df_dias_ciclo['data_dia']).dt.date))
+        with profiler.etapa("pacote_ciclo"):
+            # Analistas, folgas e sobreaviso da janela do ciclo, dias ATIVOS e escala salva (se houver)
+            pacote = utils.carregar_pacote_ciclo(id_ciclo_selecionado)
+            # Ciclo apagado ou arquivado depois que a lista foi carregada
+            if pacote is None:
+                st.warning("Este ciclo não existe mais ou foi arquivado. Escolha outro ciclo.")
+                st.stop()
+            # Revisao que esta sessao abriu (o save so passa se o banco ainda estiver nela)
+            st.session_state.revisao_base = pacote["revisao"]
+            df_analistas = pacote["df_analistas"]
+            df_indisp = pacote["df_indisp"]
+            df_ausencias = pacote["df_ausencias"]
+            df_historico = pacote["df_escala_salva"]
+            df_dias_ciclo = pacote["df_dias_ciclo"]
+
+        dias_ciclo = engine.montar_dias(df_dias_ciclo)
+        mapa_coluna_data = {dia.coluna: dia.data for dia in dias_ciclo}
+        dias_para_coluna_str = [dia.coluna for dia in dias_ciclo]
 
         df_escala_pronta = None
 
@@ -89,89 +115,67 @@ else:
 
         else:
             st.info("Nenhuma escala salva encontrada para este ciclo. Clique abaixo para gerar uma nova proposta.")
+            usar_saldo = st.checkbox("Compensar o saldo dos ciclos anteriores", value=True, key="usar_saldo",
+                                     help="Quem trabalhou acima da media nos ultimos ciclos salvos comeca este com prioridade menor.")
             if st.button("Gerar Proposta de Escala", type="primary"):
                 
                 with st.spinner(f"Gerando matriz da escala para '{ciclos_dict[id_ciclo_selecionado]}'..."):
-                    lista_analistas = df_analistas["nome"].tolist()
-                    df_proposta = pd.DataFrame(index=lista_analistas, columns=dias_para_coluna_str)
-                    df_proposta = df_proposta.fillna("FOLGA")
-
-                    if not df_indisp.empty:
-                        df_indisp['data_obj'] = pd.to_datetime(df_indisp['data']).dt.date
-                        mapa_id_nome = dict(zip(df_analistas['id'], df_analistas['nome']))
-                        for idx, indisponivel in df_indisp.iterrows():
-                            analista_nome = mapa_id_nome.get(indisponivel['id_analista'])
-                            data_indisp = indisponivel['data_obj']
-                            if analista_nome in df_proposta.index:
-                                for col_str in dias_para_coluna_str:
-                                    if data_indisp.strftime('%d/%m') in col_str:
-                                        df_proposta.loc[analista_nome, col_str] = "Ferias"
-                                        break
-
-                    df_escala_pronta, logs = engine.executar_logica_de_alocacao(
+                    with profiler.etapa("marcar_indisponibilidades"):
+                        df_proposta = engine.montar_proposta(df_analistas, df_indisp, dias_ciclo, df_ausencias)
+
+                    with profiler.etapa("regras_e_saldo"):
+                        cargas = {
+                            "descanso": utils.load_rest_rules_from_db,
+                            "skill": utils.load_skill_rules_from_db,
+                            "max_horas": utils.load_max_hours_limit,
+                        }
+                        if usar_saldo:
+                            cargas["saldo"] = (utils.carregar_saldo_anterior, id_ciclo_selecionado)
+                        regras = utils.carregar_em_paralelo(cargas)
+
+                    df_escala_pronta, log_geracao = engine.executar_logica_de_alocacao(
                         df_proposta.copy(),
                         df_analistas,
-                        dias_para_coluna_str,
+                        dias_ciclo,
                         REGRAS_STAFF,
-                        utils.REGRAS_QUALIDADE
+                        utils.REGRAS_QUALIDADE,
+                        regras_descanso=regras["descanso"],
+                        saldo_anterior=regras.get("saldo", {}),
+                        regras_skill=regras["skill"],
+                        horas_turno=HORAS_TURNO,
+                        max_horas=regras["max_horas"]
                     )
-
-                    with st.expander("Ver Logs da Geracao", expanded=False):
-                        st.code("\n".join(logs), language=None)
+                    st.session_state.log_geracao = log_geracao
                 st.success("Proposta de escala gerada!")
 
         if df_escala_pronta is not None:
-            mapa_experiencia = dict(zip(df_analistas['nome'], df_analistas['nivel']))
-            niveis_experientes = utils.REGRAS_QUALIDADE["niveis_experientes"]
-            mentor_row = []
-
-            for coluna in df_escala_pronta.columns:
-                turno_do_dia = df_escala_pronta[coluna]
-                mentor_encontrado = None
-                analista_integral_list = turno_do_dia[turno_do_dia == "Integral"].index.tolist()
-                if analista_integral_list:
-                    nome_integral = analista_integral_list[0]
-                    if mapa_experiencia.get(nome_integral) in niveis_experientes:
-                        mentor_encontrado = nome_integral
-                if not mentor_encontrado:
-                    trabalhando_manha = turno_do_dia[turno_do_dia == "Manha"].index.tolist()
-                    trabalhando_noite = turno_do_dia[turno_do_dia == "Noite"].index.tolist()
-                    candidatos = trabalhando_manha + trabalhando_noite
-                    candidatos_experientes = [nome for nome in candidatos if
-                                              mapa_experiencia.get(nome) in niveis_experientes]
-                    if candidatos_experientes:
-                        random.shuffle(candidatos_experientes)
-                        mentor_encontrado = candidatos_experientes[0]
-                mentor_row.append(mentor_encontrado if mentor_encontrado else "(Nao Encontrado)")
-            df_escala_pronta.loc["MENTOR"] = mentor_row
-
-            conn = database.get_db_connection()
-            df_sobreaviso = pd.read_sql_query("SELECT * FROM sobreaviso", conn)
-            conn.close()
-            if not df_sobreaviso.empty:
-                df_sobreaviso['data_inicio'] = pd.to_datetime(df_sobreaviso['data_inicio']).dt.date
-                df_sobreaviso['data_fim'] = pd.to_datetime(df_sobreaviso['data_fim']).dt.date
-
-            sobreaviso_row = []
-            for coluna in df_escala_pronta.columns:
-                dia_atual = mapa_coluna_data.get(coluna)
-                analista_sobreaviso = "(Vazio)"
-                if dia_atual and not df_sobreaviso.empty:
-                    match = df_sobreaviso[
-                        (df_sobreaviso['data_inicio'] <= dia_atual) &
-                        (df_sobreaviso['data_fim'] >= dia_atual)
-                        ]
-                    if not match.empty:
-                        analista_sobreaviso = match.iloc[0]['nome_analista']
-                sobreaviso_row.append(analista_sobreaviso)
-            df_escala_pronta.loc["SOBREAVISO"] = sobreaviso_row
-
-            linhas_analistas = sorted([nome for nome in df_escala_pronta.index if nome not in ["MENTOR", "SOBREAVISO"]])
-            linhas_ordenadas = linhas_analistas + ["MENTOR", "SOBREAVISO"]
-            df_escala_pronta = df_escala_pronta.reindex(index=linhas_ordenadas)
-
-            st.session_state.df_analistas_editada = df_escala_pronta.drop(index=["MENTOR", "SOBREAVISO"], errors='ignore')
-            st.session_state.df_rodape_editada = df_escala_pronta.loc[["MENTOR", "SOBREAVISO"]]
+            with profiler.etapa("mentor_sobreaviso"):
+                df_escala_pronta = engine.adicionar_rodape(
+                    df_escala_pronta,
+                    df_analistas,
+                    pacote["df_sobreaviso"],
+                    mapa_coluna_data,
+                    utils.REGRAS_QUALIDADE["niveis_experientes"]
+                )
+
+                st.session_state.df_analistas_editada = df_escala_pronta.drop(index=["MENTOR", "SOBREAVISO"], errors='ignore')
+                st.session_state.df_rodape_editada = df_escala_pronta.loc[["MENTOR", "SOBREAVISO"]]
+
+    # --- Logs da Geracao (so monta o texto se pedirem) ---
+    if st.session_state.log_geracao is not None:
+        log_geracao = st.session_state.log_geracao
+        with st.expander("Ver Logs da Geracao", expanded=False):
+            resumo_log = log_geracao.resumo()
+            c_log1, c_log2, c_log3, c_log4, c_log5 = st.columns(5)
+            c_log1.metric("Slots processados", resumo_log["slots_processados"])
+            c_log2.metric("Slots sem candidatos", resumo_log["slots_sem_candidatos"])
+            c_log3.metric("Barrados pelo limite de horas", resumo_log["rejeicoes_limite_horas"])
+            c_log4.metric("Barrados por descanso", resumo_log["rejeicoes_descanso"])
+            c_log5.metric("Vagas sem a skill exigida", resumo_log["vagas_sem_skill"])
+            if st.checkbox("Mostrar eventos detalhados", key="log_detalhado"):
+                if log_geracao.descartados:
+                    st.caption(f"{log_geracao.descartados} eventos mais antigos foram descartados (log limitado).")
+                st.code(log_geracao.renderizar(), language=None)
 
     # --- Secao 2: Analise e Ajuste ---
     if st.session_state.df_analistas_editada is not None:
@@ -196,84 +200,62 @@ else:
         )
 
         # --- Secao 3. Validacao e Contagem ---
-        st.header("3. Validacao e Contagem")
-        st.subheader("Vagas Preenchidas por Dia")
-        contagem_dia = df_editada_analistas.apply(lambda col: col.value_counts()).reindex(["Manha", "Noite", "Integral"]).fillna(0).astype(int)
-        st.dataframe(contagem_dia, use_container_width=True)
-
-        st.divider()
-        st.subheader("Carga Horaria por Analista")
-        contagem_analista = df_editada_analistas.apply(lambda row: row.value_counts(), axis=1).fillna(0)
-        for t in ["Manha", "Noite", "Integral"]: 
-            if t not in contagem_analista.columns: contagem_analista[t] = 0
-
-        contagem_analista['Horas_Decimal'] = (
-                (contagem_analista['Manha'] * HORAS_TURNO["Manha"]) +
-                (contagem_analista['Noite'] * HORAS_TURNO["Noite"]) +
-                (contagem_analista['Integral'] * HORAS_TURNO["Integral"])
-        )
+        with profiler.etapa("validacao_contagem"):
+            st.header("3. Validacao e Contagem")
+            st.subheader("Vagas Preenchidas por Dia")
+            contagem_dia = df_editada_analistas.apply(lambda col: col.value_counts()).reindex(["Manha", "Noite", "Integral"]).fillna(0).astype(int)
+            st.dataframe(contagem_dia, use_container_width=True)
+
+            st.divider()
+            st.subheader("Carga Horaria por Analista")
+            contagem_analista = df_editada_analistas.apply(lambda row: row.value_counts(), axis=1).fillna(0)
+            for t in ["Manha", "Noite", "Integral"]: 
+                if t not in contagem_analista.columns: contagem_analista[t] = 0
+
+            contagem_analista['Horas_Decimal'] = (
+                    (contagem_analista['Manha'] * HORAS_TURNO["Manha"]) +
+                    (contagem_analista['Noite'] * HORAS_TURNO["Noite"]) +
+                    (contagem_analista['Integral'] * HORAS_TURNO["Integral"])
+            )
 
-        def format_hours(val):
-            hours = int(val); minutes = int(round((val - hours) * 60))
-            return f"{hours:02d}:{minutes:02d}"
+            def format_hours(val):
+                hours = int(val); minutes = int(round((val - hours) * 60))
+                return f"{hours:02d}:{minutes:02d}"
 
-        st.dataframe(
-            contagem_analista[["Manha", "Noite", "Integral", "Horas_Decimal"]].astype(float)
-            .style.applymap(lambda v: 'background-color: #ff4b4b' if v > 30 else '', subset=['Horas_Decimal'])
-            .format({'Horas_Decimal': format_hours, 'Manha': '{:.0f}', 'Noite': '{:.0f}', 'Integral': '{:.0f}'}),
-            use_container_width=True
-        )
+            st.dataframe(
+                contagem_analista[["Manha", "Noite", "Integral", "Horas_Decimal"]].astype(float)
+                .style.applymap(lambda v: 'background-color: #ff4b4b' if v > 30 else '', subset=['Horas_Decimal'])
+                .format({'Horas_Decimal': format_hours, 'Manha': '{:.0f}', 'Noite': '{:.0f}', 'Integral': '{:.0f}'}),
+                use_container_width=True
+            )
 
         # --- Secao 4: Salvar ---
         st.header("4. Salvar Escala (Excel e Historico)")
         col1_save, col2_save = st.columns(2)
         df_final_para_salvar = pd.concat([df_editada_analistas, df_editada_rodape])
 
+        def salvar_no_historico(df_para_salvar, revisao_esperada):
+            conn = database.get_db_connection()
+            try:
+                # Troca a revisao e substitui a matriz inteira numa transacao curta
+                count_inserts = utils.salvar_escala_historico(conn, id_ciclo_selecionado, df_para_salvar, revisao_esperada)
+
+                conn.commit()
+                st.success(f"Escala salva com sucesso! ({count_inserts} registros)")
+
+                descartar_edicao()
+                st.rerun()
+
+            except utils.ConflitoDeRevisao as e:
+                st.session_state.conflito_save = {"mensagem": str(e), "revisao_atual": e.revisao_atual, "df_minha": df_para_salvar}
+            except Exception as e:
+                st.error(f"Erro ao salvar no historico: {e}")
+            finally:
+                if conn: conn.close()
+
         with col1_save:
             if st.button("Salvar no Historico", type="primary"):
-                conn = database.get_db_connection()
-                try:
-                    # 1. Limpa registros anteriores deste ciclo
-                    # Usamos run_query para compatibilidade e segurança
-                    database.run_query(conn, "DELETE FROM escala_salva WHERE id_ciclo = ?", (id_ciclo_selecionado,))
-
-                    # 2. Prepara os dados (Melt)
-                    df_final_para_salvar.index.name = 'nome_analista_temp'
-                    df_para_salvar = df_final_para_salvar.reset_index().melt(
-                        id_vars='nome_analista_temp',
-                        var_name='nome_coluna_dia',
-                        value_name='turno'
-                    ).rename(columns={'nome_analista_temp': 'nome_analista'})
-
-                    df_para_salvar['id_ciclo'] = id_ciclo_selecionado
-                    df_para_salvar['data_salvamento'] = datetime.now()
-
-                    # 3. Inserção Manual (Substituindo to_sql para evitar erros de driver/Pandas)
-                    # Isso garante que funcione 100% no Postgres do Neon e no SQLite local
-                    
-                    # Seleciona apenas as colunas necessárias na ordem certa
-                    cols_db = ['id_ciclo', 'nome_analista', 'nome_coluna_dia', 'turno', 'data_salvamento']
-                    df_insert = df_para_salvar[cols_db]
-
-                    count_inserts = 0
-                    for _, row in df_insert.iterrows():
-                        database.run_query(conn, """
-                            INSERT INTO escala_salva (id_ciclo, nome_analista, nome_coluna_dia, turno, data_salvamento)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, tuple(row))
-                        count_inserts += 1
-                    
-                    conn.commit()
-                    st.success(f"Escala salva com sucesso! ({count_inserts} registros)")
-
-                    del st.session_state.df_analistas_editada
-                    del st.session_state.df_rodape_editada
-                    st.rerun()
-
-                except Exception as e:
-                    st.error(f"Erro ao salvar no historico: {e}")
-                finally:
-                    if conn: conn.close()
+                salvar_no_historico(df_final_para_salvar, st.session_state.revisao_base)
 
         with col2_save:
             df_excel = utils.to_excel(df_final_para_salvar)
@@ -283,3 +265,63 @@ else:
                 file_name=f"escala_{ciclos_dict.get(id_ciclo_selecionado, 'ciclo')}.xlsx".replace('/', '-'),
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
+
+        # --- Conflito: outra sessao salvou este ciclo depois que esta abriu ---
+        conflito = st.session_state.conflito_save
+        if conflito is not None:
+            st.warning(conflito["mensagem"])
+            df_salva = utils.carregar_escala_salva(id_ciclo_selecionado).pivot(
+                index='nome_analista', columns='nome_coluna_dia', values='turno'
+            ).reindex(columns=conflito["df_minha"].columns)
+            df_diferencas = utils.diferencas_escala(conflito["df_minha"], df_salva)
+            st.caption(f"{len(df_diferencas)} celula(s) diferentes entre a sua versao e a salva:")
+            st.dataframe(df_diferencas, use_container_width=True, hide_index=True)
+
+            c_merge, c_over, c_reload = st.columns(3)
+            if c_merge.button("Mesclar (minhas edicoes sobre a versao salva)"):
+                df_base = pd.concat([st.session_state.df_analistas_editada, st.session_state.df_rodape_editada])
+                df_mesclada, conflitos_celula = utils.mesclar_escalas(df_base, conflito["df_minha"], df_salva)
+                descartar_edicao()
+                st.session_state.df_analistas_editada = df_mesclada.drop(index=["MENTOR", "SOBREAVISO"], errors='ignore')
+                st.session_state.df_rodape_editada = df_mesclada.reindex(["MENTOR", "SOBREAVISO"])
+                st.session_state.revisao_base = conflito["revisao_atual"]
+                if len(conflitos_celula):
+                    st.toast(f"{len(conflitos_celula)} celula(s) alteradas pelos dois: ficou a sua versao. Revise e salve.")
+                st.rerun()
+            if c_over.button("Sobrescrever com a minha versao"):
+                salvar_no_historico(conflito["df_minha"], conflito["revisao_atual"])
+            if c_reload.button("Descartar a minha e recarregar"):
+                descartar_edicao()
+                st.rerun()
+
+# --- Varios ciclos de uma vez (tarefa de fundo, escala/tarefas.py) ---
+if ciclos_dict and not df_analistas.empty:
+    with st.expander("⚙️ Gerar vários ciclos em segundo plano"):
+        st.caption("Gera com as regras atuais, sem edição manual, e salva no histórico. "
+                   "Pode sair da página: a geração continua no servidor.")
+        ids_lote = st.multiselect("Ciclos", options=list(ciclos_dict.keys()), format_func=lambda x: ciclos_dict[x], key="ciclos_lote")
+        sobrescrever_lote = st.checkbox("Sobrescrever escalas já salvas", key="sobrescrever_lote")
+        if st.button("Gerar em segundo plano", disabled=not ids_lote):
+            # Sempre salva: o resultado da tarefa so traz o status de cada ciclo, nao a escala
+            id_tarefa = tarefas.enviar("gerar_ciclos", ids_ciclo=[int(i) for i in ids_lote],
+                                       salvar=True, sobrescrever=sobrescrever_lote)
+            st.toast(f"Geração #{id_tarefa} enviada.", icon="⏳")
+
+        def mostrar_lote(id_tarefa, resultado):
+            df_resultados = pd.DataFrame(resultado["resultados"])
+            colunas = [c for c in ["nome_ciclo", "id_ciclo", "status", "erro"] if c in df_resultados.columns]
+            st.dataframe(df_resultados[colunas], use_container_width=True, hide_index=True)
+
+        utils.painel_tarefas(["gerar_ciclos"], mostrar_lote)
+
+# --- Debug: Tempos por Etapa (opt-in pela barra lateral) ---
+tempos_jsonl = profiler.finalizar_execucao()
+if modo_debug:
+    with st.expander("Ver Tempos por Etapa (debug)", expanded=False):
+        st.dataframe(pd.DataFrame(profiler.resumo()), use_container_width=True, hide_index=True)
+        st.download_button(
+            label="Baixar tempos (JSON lines)",
+            data=tempos_jsonl,
+            file_name="tempos_gerador.jsonl",
+            mime="application/json"
+        )
@@ -7,7 +7,7 @@ st.title("Gerenciar Analistas")
 
 def carregar_analistas():
     database.init_all_db_tables()
-    conn = database.get_db_connection()
+    conn = database.get_read_connection()
     try:
         query = "SELECT id, nome, email, nivel, data_admissao, ativo, skill_cplug, skill_dd FROM analistas ORDER BY nome"
         df = pd.read_sql_query(query, conn)
@@ -51,7 +51,6 @@ with st.expander("Cadastrar Manualmente"):
                     
                     conn.commit()
                     st.success(f"Analista {nome} salvo!")
-                    st.cache_data.clear()
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro: {e}")
@@ -152,7 +151,6 @@ if uploaded_file is not None:
                 if erros_log:
                     with st.expander("Ver erros"): st.write(erros_log)
                         
-                st.cache_data.clear()
                 import time
                 time.sleep(2)
                 st.rerun()
@@ -198,7 +196,6 @@ try:
                     ))
                 conn.commit()
                 st.toast("Alterações salvas!", icon="💾")
-                st.cache_data.clear()
                 import time
                 time.sleep(1)
                 st.rerun()
@@ -218,12 +215,13 @@ try:
                         if not id_res.empty:
                             id_del = int(id_res.iloc[0]['id'])
                             database.run_query(conn, "DELETE FROM indisponibilidades WHERE id_analista = ?", (id_del,))
+                            database.run_query(conn, "DELETE FROM ausencias WHERE id_analista = ?", (id_del,))
                             database.run_query(conn, "DELETE FROM escala_salva WHERE nome_analista = ?", (nome_del,))
+                            database.run_query(conn, "DELETE FROM resumo_analista_ciclo WHERE nome_analista = ?", (nome_del,))
                             database.run_query(conn, "DELETE FROM sobreaviso WHERE nome_analista = ?", (nome_del,))
                             database.run_query(conn, "DELETE FROM analistas WHERE id = ?", (id_del,))
                             conn.commit()
                             st.success("Analista excluído.")
-                            st.cache_data.clear()
                             st.rerun()
                     except Exception as e:
                         st.error(f"Erro ao excluir: {e}")
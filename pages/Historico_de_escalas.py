@@ -1,8 +1,10 @@
+import os
 import streamlit as st
 import sqlite3
 import pandas as pd
 import database
 import utils
+from escala import arquivo, tarefas
 
 # Carrega configurações
 HORAS_TURNO = utils.load_shift_hours_from_db()
@@ -11,12 +13,13 @@ st.title("Consulta de Escalas Salvas (Historico)")
 database.init_all_db_tables()
 
 try:
-    conn = database.get_db_connection()
+    conn = database.get_read_connection()
     # CORREÇÃO SQL: Adicionamos c.data_inicio no SELECT para poder usar no ORDER BY
+    # Ciclos arquivados (escala/arquivo.py) ja nao tem linhas em escala_salva
     query_ciclos = """
-        SELECT DISTINCT c.id, c.nome_ciclo, c.data_inicio 
+        SELECT c.id, c.nome_ciclo, c.data_inicio 
         FROM ciclos c 
-        JOIN escala_salva e ON c.id = e.id_ciclo 
+        WHERE c.id IN (SELECT DISTINCT id_ciclo FROM escala_salva) OR c.arquivado
         ORDER BY c.data_inicio DESC
     """
     df_ciclos_salvos = pd.read_sql_query(query_ciclos, conn)
@@ -38,41 +41,12 @@ else:
     )
 
     if id_ciclo_selecionado:
-        conn = database.get_db_connection()
+        conn = database.get_read_connection()
         try:
-            # Carrega dados da escala salva
-            df_historico = pd.read_sql_query(
-                f"SELECT nome_analista, nome_coluna_dia, turno FROM escala_salva WHERE id_ciclo = {id_ciclo_selecionado}",
-                conn)
-            
-            # Carrega ordem das colunas (dias)
-            df_dias_ciclo = pd.read_sql_query(
-                f"SELECT nome_coluna FROM ciclo_dias WHERE id_ciclo = {id_ciclo_selecionado} ORDER BY data_dia ASC",
-                conn)
-            colunas_ordenadas = df_dias_ciclo['nome_coluna'].tolist()
-
-            # Define ordem das linhas (Analistas + Mentor + Sobreaviso)
-            df_analistas = pd.read_sql_query("SELECT nome FROM analistas ORDER BY nome", conn)
-            linhas_salvas = df_historico['nome_analista'].unique()
-            linhas_analistas = sorted([nome for nome in linhas_salvas if nome not in ["MENTOR", "SOBREAVISO"]])
-
-            linhas_ordenadas = linhas_analistas
-            if "MENTOR" in linhas_salvas: linhas_ordenadas.append("MENTOR")
-            if "SOBREAVISO" in linhas_salvas: linhas_ordenadas.append("SOBREAVISO")
-
+            # Matriz da escala salva (tabela quente ou Parquet, se o ciclo foi arquivado), na ordem dos dias
+            _, df_escala_matrix = utils.carregar_matriz_salva(id_ciclo_selecionado, conn)
             conn.close()
 
-            # Monta a Matriz Visual
-            df_escala_matrix = df_historico.pivot(
-                index='nome_analista',
-                columns='nome_coluna_dia',
-                values='turno'
-            )
-
-            # Reordena colunas e linhas
-            df_escala_matrix = df_escala_matrix.reindex(columns=colunas_ordenadas)
-            df_escala_matrix = df_escala_matrix.reindex(index=linhas_ordenadas).dropna(how='all')
-
             st.markdown(f"### 📅 Escala: {ciclos_dict[id_ciclo_selecionado]}")
             st.dataframe(df_escala_matrix, use_container_width=True)
 
@@ -95,3 +69,47 @@ else:
         except Exception as e:
             st.error(f"Erro ao carregar a escala do historico: {e}")
             if conn: conn.close()
+
+if ciclos_dict:
+    # Tarefa de fundo (escala/tarefas.py): um .xlsx por ciclo, num .zip
+    with st.expander("📦 Exportar vários ciclos (.zip)"):
+        ids_exportar = st.multiselect("Ciclos", options=list(ciclos_dict.keys()), format_func=lambda x: ciclos_dict[x], key="ciclos_exportar")
+        if st.button("Exportar em segundo plano", disabled=not ids_exportar):
+            id_tarefa = tarefas.enviar("exportar_escalas", ids_ciclo=[int(i) for i in ids_exportar])
+            st.toast(f"Exportação #{id_tarefa} enviada.", icon="⏳")
+
+        def mostrar_zip(id_tarefa, resultado):
+            # O .zip sai do disco na manutencao (tarefas.DIAS_GUARDAR) ou no RESETAR TUDO
+            if not os.path.exists(resultado["arquivo"]):
+                st.warning("O arquivo desta exportação não existe mais. Exporte de novo.")
+                return
+            with open(resultado["arquivo"], "rb") as f:
+                conteudo = f.read()
+            st.download_button(
+                label=f"📥 Baixar {resultado['ciclos']} escala(s) (.zip)",
+                data=conteudo,
+                file_name=f"escalas_{id_tarefa}.zip",
+                mime="application/zip",
+                key=f"baixar_zip_{id_tarefa}"
+            )
+
+        utils.painel_tarefas(["exportar_escalas"], mostrar_zip)
+
+st.markdown("---")
+with st.expander("🗄️ Arquivar ciclos antigos"):
+    st.caption("Move as escalas dos ciclos encerrados para arquivos Parquet comprimidos. "
+               "Continuam disponíveis nesta página e no saldo/Análise de Carga; a tabela do banco fica só com os ciclos recentes.")
+    meses_arquivo = st.number_input("Ciclos encerrados há mais de (meses)", min_value=1, value=arquivo.MESES_PADRAO, step=1)
+    conn = database.get_read_connection()
+    try:
+        df_para_arquivar = arquivo.ciclos_para_arquivar(conn, meses_arquivo)
+    finally:
+        conn.close()
+    if df_para_arquivar.empty:
+        st.info("Nenhum ciclo para arquivar.")
+    else:
+        st.write(", ".join(df_para_arquivar['nome_ciclo']))
+        if st.button(f"Arquivar {len(df_para_arquivar)} ciclo(s)"):
+            arquivados = arquivo.arquivar_ciclos(meses_arquivo)
+            st.success(f"{len(arquivados)} ciclo(s) arquivados ({sum(linhas for _, linhas in arquivados)} linhas).")
+            st.rerun()
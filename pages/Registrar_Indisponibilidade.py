@@ -2,8 +2,8 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 import database
-import re
-import unicodedata
+import utils
+from escala import ausencias, importacao, manutencao, tarefas
 import pytz
 
 st.title("Registrar Indisponibilidade (Folgas)")
@@ -16,15 +16,9 @@ def get_br_time():
     except:
         return datetime.utcnow() - timedelta(hours=3)
 
-def normalizar_chave(texto):
-    if not isinstance(texto, str): return ""
-    nfkd_form = unicodedata.normalize('NFKD', texto)
-    texto_sem_acento = "".join([c for c in nfkd_form if not unicodedata.combining(c)])
-    return texto_sem_acento.lower().strip()
-
 def carregar_analistas_ativos():
     database.init_all_db_tables()
-    conn = database.get_db_connection()
+    conn = database.get_read_connection()
     try:
         # PostgreSQL exige TRUE, SQLite aceita 1. O Pandas lida bem com isso na leitura.
         # Mas para garantir, usamos a query compatível.
@@ -42,17 +36,6 @@ def carregar_analistas_ativos():
     finally:
         conn.close()
 
-def get_analista_email_map():
-    database.init_all_db_tables()
-    conn = database.get_db_connection()
-    try:
-        analistas_df = pd.read_sql_query("SELECT id, email FROM analistas", conn)
-        return {str(email).lower().strip(): id_ for email, id_ in zip(analistas_df['email'], analistas_df['id']) if email}
-    except:
-        return {}
-    finally:
-        conn.close()
-
 # --- 1. Manual ---
 analistas_dict_manual = carregar_analistas_ativos()
 with st.expander("Cadastrar Manualmente"):
@@ -67,12 +50,7 @@ with st.expander("Cadastrar Manualmente"):
                 conn = database.get_db_connection()
                 try:
                     ts_agora = get_br_time().strftime('%Y-%m-%d %H:%M:%S')
-                    # CORREÇÃO: Usar run_query
-                    database.run_query(conn, """
-                        INSERT INTO indisponibilidades (id_analista, data, data_importacao) 
-                        VALUES (?, ?, ?) 
-                        ON CONFLICT(id_analista, data) DO NOTHING
-                    """, (analista_id, data_indisponivel.strftime('%Y-%m-%d'), ts_agora))
+                    utils.registrar_indisponibilidades(conn, [(analista_id, data_indisponivel.strftime('%Y-%m-%d'), ts_agora)])
                     
                     conn.commit()
                     st.success("Salvo!")
@@ -81,6 +59,31 @@ with st.expander("Cadastrar Manualmente"):
                 finally:
                     conn.close()
 
+        # Ferias/licenca: um registro com inicio e fim (tabela ausencias)
+        with st.form("form_ausencia", clear_on_submit=True):
+            analista_aus = st.selectbox("Analista", options=analistas_dict_manual.keys(), format_func=lambda x: analistas_dict_manual[x], key="analista_ausencia")
+            col_periodo, col_tipo = st.columns([2, 1])
+            with col_periodo:
+                periodo_aus = st.date_input("Período", value=(datetime.today(), datetime.today() + timedelta(days=29)), format="DD/MM/YYYY")
+            with col_tipo:
+                tipo_aus = st.selectbox("Tipo", ausencias.TIPOS)
+
+            if st.form_submit_button("Salvar Período"):
+                if not isinstance(periodo_aus, (tuple, list)) or len(periodo_aus) != 2:
+                    st.warning("Selecione a data inicial e a final.")
+                else:
+                    conn = database.get_db_connection()
+                    try:
+                        ts_agora = get_br_time().strftime('%Y-%m-%d %H:%M:%S')
+                        ausencias.registrar(conn, [(analista_aus, periodo_aus[0].strftime('%Y-%m-%d'),
+                                                    periodo_aus[1].strftime('%Y-%m-%d'), tipo_aus, ts_agora)])
+                        conn.commit()
+                        st.success("Salvo!")
+                    except Exception as e:
+                        st.error(f"Erro: {e}")
+                    finally:
+                        conn.close()
+
 # --- 2. Importar Arquivo ---
 st.divider()
 st.header("Importar Indisponibilidade")
@@ -115,175 +118,106 @@ if uploaded_file is not None:
         st.caption("Se os dados acima parecerem corretos, clique no botão abaixo para processar.")
 
         if st.button("Confirmar e Importar Dados", type="primary"):
-            df = st.session_state.df_preview_indisp
-            mapa_email_id = get_analista_email_map()
-
-            if not mapa_email_id:
-                st.error("Nenhum analista com email cadastrado no sistema.")
-            else:
-                conn = database.get_db_connection()
-                try:
-                    # Identifica colunas
-                    col_email = None
-                    col_folgas = None
-                    col_ferias_ini = None
-                    col_ferias_dias = None
-                    col_pref_dia = None
-                    col_pref_turno = None
-
-                    for col in df.columns:
-                        c_norm = normalizar_chave(str(col))
-                        if "e-mail" in c_norm or "email" in c_norm: col_email = col
-                        if "nao pode trabalhar" in c_norm: col_folgas = col
-                        if "ferias agendada" in c_norm: col_ferias_ini = col
-                        if "quantos dias" in c_norm: col_ferias_dias = col
-                        if "preferencia" in c_norm and "dia" in c_norm: col_pref_dia = col
-                        if "deseja fazer turnos" in c_norm: col_pref_turno = col
-
-                    if not col_email:
-                        st.error("Coluna de Email não encontrada.")
-                    else:
-                        logs = []
-                        total_salvos = 0
-                        ts_agora = get_br_time().strftime('%Y-%m-%d %H:%M:%S')
-
-                        progress_bar = st.progress(0)
-                        total_rows = len(df)
-
-                        for index, row in df.iterrows():
-                            progress_bar.progress((index + 1) / total_rows)
+            # Roda em segundo plano (escala/tarefas.py): a pagina so acompanha o andamento abaixo
+            id_tarefa = tarefas.enviar(
+                "importar_formulario",
+                planilha=importacao.planilha_para_json(st.session_state.df_preview_indisp),
+                ts_agora=get_br_time().strftime('%Y-%m-%d %H:%M:%S'),
+            )
+            st.toast(f"Importação #{id_tarefa} enviada.", icon="⏳")
 
-                            email_raw = str(row[col_email]).strip().lower()
-                            id_analista = mapa_email_id.get(email_raw)
+def mostrar_importacao(id_tarefa, resultado):
+    st.success(f"Concluido! {resultado['datas']} datas e {resultado['ferias']} período(s) de férias gravados.")
+    with st.expander("Detalhes por linha"):
+        st.dataframe(pd.DataFrame(resultado["logs"]), use_container_width=True)
 
-                            log = {"Email": email_raw, "Analista": "OK" if id_analista else "N/A", "Detalhes": ""}
-
-                            if not id_analista:
-                                logs.append(log)
-                                continue
-
-                            # A. Preferencias (Aqui estava o erro!)
-                            if col_pref_turno and pd.notna(row[col_pref_turno]):
-                                val = str(row[col_pref_turno]).lower()
-                                p = "Tanto faz"
-                                if "10" in val or "integral" in val: p = "Integral"
-                                elif "5" in val: p = "Curto"
-                                
-                                # CORREÇÃO: Usar run_query
-                                database.run_query(conn, "UPDATE analistas SET pref_turno = ? WHERE id = ?", (p, id_analista))
-
-                            if col_pref_dia and pd.notna(row[col_pref_dia]):
-                                val = str(row[col_pref_dia]).lower()
-                                p = "Tanto faz"
-                                if "sabado" in val or "sábado" in val: p = "Sabado"
-                                elif "domingo" in val: p = "Domingo"
-                                
-                                # CORREÇÃO: Usar run_query
-                                database.run_query(conn, "UPDATE analistas SET pref_dia = ? WHERE id = ?", (p, id_analista))
-
-                            datas_para_salvar = set()
-
-                            # B. Folgas
-                            if col_folgas and pd.notna(row[col_folgas]):
-                                raw_text = str(row[col_folgas])
-                                matches = re.findall(r'(\d{1,2})[/-](\d{1,2})', raw_text)
-                                for d, m in matches:
-                                    try:
-                                        dia, mes = int(d), int(m)
-                                        if 1 <= mes <= 12 and 1 <= dia <= 31:
-                                            ano = datetime.now().year
-                                            # Se for Dezembro e a folga for Jan, assume proximo ano
-                                            if datetime.now().month == 12 and mes == 1: ano += 1
-                                            datas_para_salvar.add(datetime(ano, mes, dia).strftime('%Y-%m-%d'))
-                                    except: pass
-
-                            # C. Ferias
-                            if col_ferias_ini and col_ferias_dias and pd.notna(row[col_ferias_ini]) and pd.notna(row[col_ferias_dias]):
-                                try:
-                                    val_ini = row[col_ferias_ini]
-                                    dt_ini = None
-                                    if isinstance(val_ini, datetime):
-                                        dt_ini = val_ini
-                                    else:
-                                        str_val = str(val_ini).strip()
-                                        if re.search(r'\d', str_val):
-                                            # Tenta varios formatos
-                                            for fmt in ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y']:
-                                                try: dt_ini = datetime.strptime(str_val, fmt); break
-                                                except: pass
-
-                                    if dt_ini:
-                                        dur_match = re.search(r'\d+', str(row[col_ferias_dias]))
-                                        if dur_match:
-                                            duracao = int(dur_match.group(0))
-                                            for i in range(duracao):
-                                                dt_f = dt_ini + timedelta(days=i)
-                                                datas_para_salvar.add(dt_f.strftime('%Y-%m-%d'))
-                                except: pass
-
-                            count_linha = 0
-                            for dt_str in datas_para_salvar:
-                                # CORREÇÃO: Usar run_query
-                                database.run_query(conn, """
-                                    INSERT INTO indisponibilidades (id_analista, data, data_importacao) 
-                                    VALUES (?, ?, ?) 
-                                    ON CONFLICT(id_analista, data) DO NOTHING
-                                """, (id_analista, dt_str, ts_agora))
-                                count_linha += 1 # No Postgres, rowcount as vezes é impreciso em batch, mas ok aqui
-
-                            if count_linha > 0:
-                                total_salvos += count_linha
-                                log["Detalhes"] = f"+{count_linha} datas."
-
-                            logs.append(log)
-
-                        conn.commit()
-                        st.success(f"Concluido! Registros processados.")
-                        st.dataframe(pd.DataFrame(logs))
-                
-                except Exception as e:
-                    st.error(f"Erro no processamento: {e}")
-                finally:
-                    conn.close()
+utils.painel_tarefas(["importar_formulario"], mostrar_importacao)
 
 # --- 3. Visualizar ---
 st.divider()
 st.header("Banco de Dados")
-if st.button("Limpar registros antigos (Manter apenas os mais recentes)"):
-    conn = database.get_db_connection()
+with st.expander("🧹 Manutenção"):
+    st.caption(f"Roda sozinha a cada {manutencao.INTERVALO_DIAS} dias: remove datas repetidas e atualiza as estatísticas "
+               "(a compactação do banco só roda pelo botão abaixo). "
+               "A retenção (apagar folgas e férias antigas) só vale depois de escolher os meses abaixo.")
+    conn = database.get_read_connection()
     try:
-        # Query complexa que deleta duplicados mantendo o ultimo import
-        # Simplificação: Apagar tudo antigo
-        # CORREÇÃO: Usar run_query
-        database.run_query(conn, "DELETE FROM indisponibilidades WHERE id NOT IN (SELECT MAX(id) FROM indisponibilidades GROUP BY id_analista, data)")
-        conn.commit()
-        st.success("Limpeza realizada.")
-        st.rerun()
-    except Exception as e:
-        st.error(f"Erro ao limpar: {e}")
+        retencao = manutencao.carregar_retencao(conn)
     finally:
         conn.close()
-
+    col_meses, col_arquivar = st.columns(2)
+    with col_meses:
+        meses_retencao = st.number_input("Manter folgas e férias dos últimos (meses, 0 = desligada)", min_value=0,
+                                         value=retencao["retencao_indisp_meses"], step=1)
+    with col_arquivar:
+        arquivar_retencao = st.checkbox("Guardar as antigas no arquivo (Parquet) antes de apagar",
+                                        value=bool(retencao["retencao_indisp_arquivar"]))
+    if st.button("Salvar e executar agora"):
+        conn = database.get_db_connection()
+        try:
+            database.run_many(conn, """
+                INSERT INTO configuracao_limites (chave, valor) VALUES (?, ?)
+                ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor
+            """, [("retencao_indisp_meses", int(meses_retencao)), ("retencao_indisp_arquivar", int(arquivar_retencao))])
+            conn.commit()
+            resultado = manutencao.executar(conn, vacuum=True)
+            st.success(f"Manutenção concluída: {resultado['duplicadas']} repetidas e {resultado['retencao']} antigas removidas.")
+        except Exception as e:
+            st.error(f"Erro na manutenção: {e}")
+        finally:
+            conn.close()
+
+# Filtros aplicados no banco; so a pagina visivel e lida (dados.pagina_indisponibilidades)
+col_analista, col_de, col_ate = st.columns([2, 1, 1])
+with col_analista:
+    filtro_analista = st.selectbox("Analista", options=[None, *analistas_dict_manual.keys()],
+                                   format_func=lambda x: "Todos" if x is None else analistas_dict_manual[x])
+with col_de:
+    filtro_de = st.date_input("De", value=None, format="DD/MM/YYYY")
+with col_ate:
+    filtro_ate = st.date_input("Até", value=None, format="DD/MM/YYYY")
+
+paginacao = utils.estado_paginacao("indisp", (filtro_analista, filtro_de, filtro_ate))
 try:
-    conn = database.get_db_connection()
-    # Postgres usa TO_CHAR, SQLite usa strftime. Pandas read_sql nao resolve isso.
-    # Vamos trazer a data bruta e formatar no Pandas
-    query = """
-            SELECT a.nome AS Analista, \
-                   i.data as Data_Folga, 
-                   i.data_importacao
-            FROM indisponibilidades i \
-                     JOIN analistas a ON i.id_analista = a.id \
-            ORDER BY i.data_importacao DESC, a.nome \
-            """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    
-    if not df.empty:
-        # Formata datas no Python para evitar briga SQL
-        df['Data_Folga'] = pd.to_datetime(df['Data_Folga']).dt.strftime('%d/%m/%Y')
-        st.dataframe(df, use_container_width=True)
-    else:
-        st.info("Banco vazio.")
-except:
-    pass
+    df, proximo = utils.pagina_indisponibilidades(filtro_analista, filtro_de, filtro_ate, cursor=paginacao["cursores"][-1])
+except Exception as e:
+    st.error(f"Erro ao carregar registros: {e}")
+    df, proximo = pd.DataFrame(), None
+
+if not df.empty:
+    st.dataframe(
+        df[['analista', 'data', 'data_importacao']],
+        column_config={
+            "analista": "Analista",
+            "data": st.column_config.DateColumn("Data_Folga", format="DD/MM/YYYY"),
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+    utils.controles_paginacao("indisp", paginacao, proximo)
+else:
+    st.info("Nenhum registro encontrado.")
+
+st.subheader("Férias e Licenças (períodos)")
+paginacao_aus = utils.estado_paginacao("ausencias", (filtro_analista, filtro_de, filtro_ate))
+try:
+    df_aus, proximo_aus = utils.pagina_ausencias(filtro_analista, filtro_de, filtro_ate, cursor=paginacao_aus["cursores"][-1])
+except Exception as e:
+    st.error(f"Erro ao carregar períodos: {e}")
+    df_aus, proximo_aus = pd.DataFrame(), None
+
+if not df_aus.empty:
+    st.dataframe(
+        df_aus[['analista', 'tipo', 'data_inicio', 'data_fim', 'data_importacao']],
+        column_config={
+            "analista": "Analista",
+            "tipo": "Tipo",
+            "data_inicio": st.column_config.DateColumn("Início", format="DD/MM/YYYY"),
+            "data_fim": st.column_config.DateColumn("Fim", format="DD/MM/YYYY"),
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+    utils.controles_paginacao("ausencias", paginacao_aus, proximo_aus)
+else:
+    st.info("Nenhum período encontrado.")
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import database
+import utils
 from datetime import datetime
 import time # Para alertas visuais
 
@@ -134,15 +135,19 @@ if uploaded_file is not None:
 st.divider()
 st.subheader("📋 Registros Ativos")
 
-conn = database.get_db_connection()
+# Filtros aplicados no banco; so a pagina visivel e lida (dados.pagina_sobreaviso)
+col_nome, col_de, col_ate = st.columns([2, 1, 1])
+with col_nome:
+    filtro_nome = st.text_input("Nome contém")
+with col_de:
+    filtro_de = st.date_input("De", value=None, format="DD/MM/YYYY")
+with col_ate:
+    filtro_ate = st.date_input("Até", value=None, format="DD/MM/YYYY")
+
+paginacao = utils.estado_paginacao("sobreaviso", (filtro_nome, filtro_de, filtro_ate))
 try:
-    # Leitura (SELECT) continua normal com pandas
-    df_sobreaviso = pd.read_sql_query("""
-        SELECT id, nome_analista, data_inicio, data_fim 
-        FROM sobreaviso 
-        ORDER BY data_inicio DESC
-    """, conn)
-    
+    df_sobreaviso, proximo = utils.pagina_sobreaviso(filtro_nome, filtro_de, filtro_ate, cursor=paginacao["cursores"][-1])
+
     if df_sobreaviso.empty:
         st.info("Nenhum registro encontrado.")
     else:
@@ -157,20 +162,23 @@ try:
             hide_index=True,
             use_container_width=True
         )
+        utils.controles_paginacao("sobreaviso", paginacao, proximo)
 
         with st.expander("🗑️ Excluir Registro"):
-            lista_opcoes = df_sobreaviso.apply(
-                lambda x: f"{x['id']} - {x['nome_analista']} ({pd.to_datetime(x['data_inicio']).strftime('%d/%m')} até {pd.to_datetime(x['data_fim']).strftime('%d/%m')})", 
-                axis=1
-            )
-            selecionado = st.selectbox("Selecione para excluir:", options=lista_opcoes)
+            # Rotulos montados em colunas (so da pagina visivel)
+            rotulos = dict(zip(
+                df_sobreaviso['id'],
+                df_sobreaviso['id'].astype(str) + " - " + df_sobreaviso['nome_analista'] + " ("
+                + pd.to_datetime(df_sobreaviso['data_inicio']).dt.strftime('%d/%m') + " até "
+                + pd.to_datetime(df_sobreaviso['data_fim']).dt.strftime('%d/%m') + ")"
+            ))
+            id_del = st.selectbox("Selecione para excluir:", options=list(rotulos), format_func=rotulos.get)
             
             if st.button("Apagar Selecionado", type="secondary"):
-                id_del = selecionado.split(" - ")[0]
-                conn = database.get_db_connection() # Reabre conexão limpa
+                conn = database.get_db_connection()
                 try:
                     # CORREÇÃO: Usar run_query
-                    database.run_query(conn, "DELETE FROM sobreaviso WHERE id = ?", (id_del,))
+                    database.run_query(conn, "DELETE FROM sobreaviso WHERE id = ?", (int(id_del),))
                     conn.commit()
                     st.toast("Registro apagado.", icon="🗑️")
                     time.sleep(1)
@@ -180,5 +188,3 @@ try:
 
 except Exception as e:
     st.error(f"Erro ao carregar dados: {e}")
-finally:
-    if conn: conn.close()
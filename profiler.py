@@ -0,0 +1,115 @@
+"""
+Instrumentacao leve por etapa (tempo e round trips de SQL) para cada rerun.
+
+    profiler.iniciar_execucao("Gerador_de_Escala")
+    with profiler.etapa("carregar_dados"):
+        ...
+    @profiler.cronometrar("to_excel")
+    def to_excel(df): ...
+
+Os contadores ficam por thread (o Streamlit roda cada sessao na sua propria
+thread), entao sessoes simultaneas nao se misturam. Se a variavel de ambiente
+ESCALA_PERF_JSONL apontar para um arquivo, finalizar_execucao() acrescenta
+as linhas la para analise offline.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+_estado = threading.local()
+
+
+def iniciar_execucao(rotulo="execucao"):
+    _estado.execucao = {
+        "rotulo": rotulo,
+        "inicio": datetime.now().isoformat(timespec="seconds"),
+        "t0": time.perf_counter(),
+        "etapas": {},
+        "contadores": {"queries": 0, "conexoes": 0},
+    }
+    return _estado.execucao
+
+
+def _execucao_atual():
+    execucao = getattr(_estado, "execucao", None)
+    if execucao is None:
+        execucao = iniciar_execucao()
+    return execucao
+
+
+def execucao_atual():
+    return _execucao_atual()
+
+
+def usar_execucao(execucao):
+    # Threads auxiliares (escala/assincrono.py) somam os contadores na execucao de quem as disparou
+    _estado.execucao = execucao
+
+
+def contar(chave, n=1):
+    # Chamado por database.run_query / get_db_connection
+    contadores = _execucao_atual()["contadores"]
+    contadores[chave] = contadores.get(chave, 0) + n
+
+
+@contextmanager
+def etapa(nome):
+    execucao = _execucao_atual()
+    queries_antes = execucao["contadores"]["queries"]
+    conexoes_antes = execucao["contadores"]["conexoes"]
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro = execucao["etapas"].setdefault(nome, {"segundos": 0.0, "chamadas": 0, "queries": 0, "conexoes": 0})
+        registro["segundos"] += time.perf_counter() - t0
+        registro["chamadas"] += 1
+        registro["queries"] += execucao["contadores"]["queries"] - queries_antes
+        registro["conexoes"] += execucao["contadores"]["conexoes"] - conexoes_antes
+
+
+def cronometrar(nome=None):
+    def decorador(func):
+        nome_etapa = nome or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with etapa(nome_etapa):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+def resumo():
+    """Lista de etapas (nome, segundos, chamadas, queries, conexoes) da execucao atual."""
+    execucao = _execucao_atual()
+    linhas = [{"etapa": nome, **dados} for nome, dados in execucao["etapas"].items()]
+    linhas.append({
+        "etapa": "TOTAL",
+        "segundos": time.perf_counter() - execucao["t0"],
+        "chamadas": 1,
+        "queries": execucao["contadores"]["queries"],
+        "conexoes": execucao["contadores"]["conexoes"],
+    })
+    return linhas
+
+
+def exportar_jsonl():
+    execucao = _execucao_atual()
+    return "".join(
+        json.dumps({"rotulo": execucao["rotulo"], "inicio": execucao["inicio"], **linha}, ensure_ascii=False) + "\n"
+        for linha in resumo()
+    )
+
+
+def finalizar_execucao():
+    linhas = exportar_jsonl()
+    caminho = os.environ.get("ESCALA_PERF_JSONL")
+    if caminho:
+        with open(caminho, "a", encoding="utf-8") as f:
+            f.write(linhas)
+    return linhas
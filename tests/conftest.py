@@ -0,0 +1,61 @@
+"""
+Cada teste roda num SQLite novo em tmp_path (db.configurar): o estado dos modulos
+(tabelas inicializadas, pools de leitura, resumo preenchido) e por DSN, entao um
+caminho novo por teste basta para isolar. O arquivo morto fica em <tmp>/escala_arquivo.
+"""
+import os
+import sys
+from datetime import timedelta
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from escala import db  # noqa: E402
+
+
+@pytest.fixture
+def banco(tmp_path):
+    db.configurar(str(tmp_path / "escala.db"))
+    db.init_all_db_tables()
+    yield tmp_path
+    db.configurar(None)
+
+
+@pytest.fixture
+def criar_analista(banco):
+    def criar(nome, email=None, nivel="Pleno"):
+        conn = db.get_db_connection()
+        try:
+            id_analista = db.inserir_retornando_id(
+                conn, "INSERT INTO analistas (nome, email, nivel, data_admissao) VALUES (?, ?, ?, ?)",
+                (nome, email, nivel, "2020-01-01"))
+            conn.commit()
+            return id_analista
+        finally:
+            conn.close()
+    return criar
+
+
+@pytest.fixture
+def criar_ciclo(banco):
+    def criar(nome, inicio, dias=7):
+        """Ciclo com `dias` dias a partir de inicio (date); devolve (id_ciclo, colunas)."""
+        datas = [inicio + timedelta(days=i) for i in range(dias)]
+        conn = db.get_db_connection()
+        try:
+            id_ciclo = db.inserir_retornando_id(
+                conn, "INSERT INTO ciclos (nome_ciclo, data_inicio, data_fim) VALUES (?, ?, ?)",
+                (nome, str(datas[0]), str(datas[-1])))
+            colunas = [d.strftime("%d/%m") for d in datas]
+            db.run_many(conn, """
+                INSERT INTO ciclo_dias (id_ciclo, nome_coluna, data_dia, ativo, dia_tipo, dia_semana)
+                VALUES (?, ?, ?, TRUE, ?, ?)
+            """, [(id_ciclo, coluna, str(d), "Util", d.weekday()) for coluna, d in zip(colunas, datas)])
+            conn.commit()
+            return id_ciclo, colunas
+        finally:
+            conn.close()
+    return criar
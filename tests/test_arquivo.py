@@ -0,0 +1,38 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from escala import arquivo, dados, db
+
+pytest.importorskip("pyarrow")
+
+
+def test_arquivar_e_ler_de_volta(criar_ciclo):
+    id_ciclo, colunas = criar_ciclo("Antigo", date(2020, 1, 6))
+    df_final = pd.DataFrame({"Ana": ["Manha"] * len(colunas), "Bia": ["Noite"] * len(colunas)}, index=colunas).T
+    conn = db.get_db_connection()
+    try:
+        dados.salvar_escala_historico(conn, id_ciclo, df_final, revisao_esperada=0)
+        conn.commit()
+    finally:
+        conn.close()
+    antes = dados.carregar_escala_salva(id_ciclo)
+
+    assert arquivo.arquivar_ciclos(meses=6) == [(id_ciclo, len(antes))]
+
+    conn = db.get_read_connection()
+    try:
+        quente = db.run_query(conn, "SELECT COUNT(*) AS n FROM escala_salva WHERE id_ciclo = ?", (id_ciclo,)).fetchone()["n"]
+        resumo = db.run_query(conn, "SELECT COUNT(*) AS n FROM resumo_analista_ciclo WHERE id_ciclo = ?", (id_ciclo,)).fetchone()["n"]
+    finally:
+        conn.close()
+    assert quente == 0 and resumo == 2
+
+    # O carregador le do Parquet quando o ciclo esta arquivado
+    depois = dados.carregar_escala_salva(id_ciclo)
+    ordem = ["nome_analista", "nome_coluna_dia"]
+    pd.testing.assert_frame_equal(antes.sort_values(ordem).reset_index(drop=True),
+                                  depois.sort_values(ordem).reset_index(drop=True))
+    nome_ciclo, matriz = dados.carregar_matriz_salva(id_ciclo)
+    assert nome_ciclo == "Antigo" and list(matriz.columns) == colunas
@@ -0,0 +1,33 @@
+from datetime import date
+
+import pandas as pd
+
+from escala import ausencias
+
+
+def test_mascara_marca_os_dias_do_periodo_do_analista():
+    datas = [date(2026, 1, d) for d in range(1, 8)]
+    df = pd.DataFrame({
+        "id_analista": [10, 20, 99],
+        "data_inicio": ["2026-01-02", "2025-12-20", "2026-01-01"],
+        "data_fim": ["2026-01-03", "2026-01-01", "2026-01-07"],
+    })
+    resultado = ausencias.mascara([10, 20, 30], datas, df)
+    assert resultado.shape == (3, 7)
+    assert resultado[0].tolist() == [False, True, True, False, False, False, False]
+    # Periodo que comeca antes do ciclo cobre so o comeco
+    assert resultado[1].tolist() == [True] + [False] * 6
+    # Analista 30 sem periodo; o 99 nao esta na lista e e ignorado
+    assert not resultado[2].any()
+
+
+def test_mascara_periodos_sobrepostos_e_vazios():
+    datas = [date(2026, 1, d) for d in range(1, 5)]
+    df = pd.DataFrame({
+        "id_analista": [1, 1],
+        "data_inicio": ["2026-01-01", "2026-01-02"],
+        "data_fim": ["2026-01-02", "2026-01-03"],
+    })
+    assert ausencias.mascara([1], datas, df)[0].tolist() == [True, True, True, False]
+    assert not ausencias.mascara([1], datas, df.iloc[0:0]).any()
+    assert ausencias.mascara([1], [], df).shape == (1, 0)
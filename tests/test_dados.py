@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from escala import dados, db
+
+
+def matriz(colunas, turnos):
+    return pd.DataFrame({nome: [turno] * len(colunas) for nome, turno in turnos.items()}, index=colunas).T
+
+
+def salvar(id_ciclo, df, revisao_esperada):
+    conn = db.get_db_connection()
+    try:
+        dados.salvar_escala_historico(conn, id_ciclo, df, revisao_esperada)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_revisao_troca_condicional(criar_ciclo):
+    id_ciclo, colunas = criar_ciclo("C1", date(2026, 1, 5))
+    salvar(id_ciclo, matriz(colunas, {"Ana": "Manha"}), revisao_esperada=0)
+    assert dados.carregar_revisao(id_ciclo) == 1
+
+    # Outra sessao que abriu a revisao 0 nao grava por cima
+    with pytest.raises(dados.ConflitoDeRevisao) as erro:
+        salvar(id_ciclo, matriz(colunas, {"Ana": "Noite"}), revisao_esperada=0)
+    assert (erro.value.revisao_esperada, erro.value.revisao_atual) == (0, 1)
+    assert set(dados.carregar_escala_salva(id_ciclo)["turno"]) == {"Manha"}
+
+    salvar(id_ciclo, matriz(colunas, {"Ana": "Noite"}), revisao_esperada=1)
+    assert dados.carregar_revisao(id_ciclo) == 2
+    assert set(dados.carregar_escala_salva(id_ciclo)["turno"]) == {"Noite"}
+
+
+def test_paginas_de_folgas_sem_repetir(criar_analista):
+    ana = criar_analista("Ana")
+    bia = criar_analista("Bia")
+    inicio = date(2026, 3, 1)
+    conn = db.get_db_connection()
+    try:
+        dados.registrar_indisponibilidades(conn, [(ana, str(inicio + timedelta(days=i)), "2026-02-01") for i in range(7)])
+        dados.registrar_indisponibilidades(conn, [(bia, str(inicio), "2026-02-01")])
+        conn.commit()
+    finally:
+        conn.close()
+
+    vistas, tamanhos, cursor = [], [], None
+    while True:
+        df, cursor = dados.pagina_indisponibilidades(id_analista=ana, cursor=cursor, limite=3)
+        tamanhos.append(len(df))
+        vistas.extend(df["data"])
+        if cursor is None:
+            break
+    assert tamanhos == [3, 3, 1]
+    assert vistas == sorted((inicio + timedelta(days=i) for i in range(7)), reverse=True)
+
+    df, cursor = dados.pagina_indisponibilidades(data_inicio=inicio, data_fim=inicio, limite=10)
+    assert sorted(df["analista"]) == ["Ana", "Bia"] and cursor is None
+
+
+def test_saldo_anterior_so_le(criar_ciclo):
+    anterior, colunas = criar_ciclo("C1", date(2026, 1, 5))
+    atual, _ = criar_ciclo("C2", date(2026, 2, 2))
+    salvar(anterior, matriz(colunas, {"Ana": "Manha", "Bia": "Noite"}), revisao_esperada=0)
+
+    versoes_antes = db._ler_versoes()
+    saldo = dados.carregar_saldo_anterior(atual)
+    assert set(saldo) == {"Ana", "Bia"}
+    assert db._ler_versoes() == versoes_antes
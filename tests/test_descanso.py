@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+from engine import DiaEscala
+from escala import descanso
+
+HORAS = {"Manha": 5.5, "Noite": 5.0, "Integral": 10.0}
+
+
+def dia(data):
+    tipo = {5: "Sabado", 6: "Domingo"}.get(data.weekday(), "Util")
+    return DiaEscala(data.strftime("%d/%m"), data, tipo, data.weekday())
+
+
+def test_sem_regras_nada_bloqueia():
+    controle = descanso.ControleDescanso(["Ana"], {}, HORAS)
+    sabado = date(2026, 10, 17)
+    controle.registrar("Ana", dia(sabado), "Noite")
+    assert controle.bloqueio("Ana", dia(sabado + timedelta(days=1)), "Manha") is None
+
+
+def test_descanso_minimo_entre_noite_e_manha():
+    controle = descanso.ControleDescanso(["Ana"], {"min_horas_descanso": 11}, HORAS)
+    sabado = date(2026, 10, 17)
+    # Noite termina 22h; Manha do dia seguinte comeca 7h: 9h de descanso
+    controle.registrar("Ana", dia(sabado), "Noite")
+    domingo = dia(sabado + timedelta(days=1))
+    assert controle.bloqueio("Ana", domingo, "Manha") == descanso.DESCANSO_MINIMO
+    assert controle.bloqueio("Ana", domingo, "Noite") is None
+
+
+def test_turnos_na_janela_de_7_dias():
+    controle = descanso.ControleDescanso(["Ana"], {"max_turnos_7_dias": 2}, HORAS)
+    segunda = date(2026, 10, 19)
+    controle.registrar("Ana", dia(segunda), "Manha")
+    controle.registrar("Ana", dia(segunda + timedelta(days=1)), "Manha")
+    assert controle.bloqueio("Ana", dia(segunda + timedelta(days=2)), "Manha") == descanso.TURNOS_NA_JANELA
+    # Sete dias depois do primeiro turno ele sai da janela
+    assert controle.bloqueio("Ana", dia(segunda + timedelta(days=7)), "Manha") is None
+
+
+def test_fins_de_semana_consecutivos():
+    controle = descanso.ControleDescanso(["Ana", "Bia"], {"max_fds_consecutivos": 1}, HORAS)
+    sabado = date(2026, 10, 17)
+    controle.registrar("Ana", dia(sabado), "Manha")
+    proximo_sabado = dia(sabado + timedelta(days=7))
+    assert controle.bloqueio("Ana", proximo_sabado, "Manha") == descanso.FDS_CONSECUTIVOS
+    assert controle.bloqueio("Bia", proximo_sabado, "Manha") is None
+    # Domingo do mesmo fim de semana nao conta como outro
+    assert controle.bloqueio("Ana", dia(sabado + timedelta(days=1)), "Manha") is None
+
+
+def test_penalidade_domingo_e_sabado_seguinte():
+    controle = descanso.ControleDescanso(["Ana"], {}, HORAS)
+    domingo = date(2026, 10, 18)
+    controle.registrar("Ana", dia(domingo), "Manha")
+    assert controle.penalidade("Ana", dia(domingo + timedelta(days=6))) == descanso.REGRAS_PADRAO["penalidade_dom_sab"]
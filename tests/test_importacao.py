@@ -0,0 +1,31 @@
+import time
+
+import pandas as pd
+
+from escala import db, importacao, tarefas
+
+
+def test_importacao_em_fundo_grava_progresso_sem_lock(criar_analista, monkeypatch):
+    # Progresso gravado a cada linha: antes as preferencias seguravam o lock de escrita
+    # durante o laco e andamento() (outra conexao) falhava com "database is locked"
+    monkeypatch.setattr(tarefas, "INTERVALO_PROGRESSO", 0)
+    ids = [criar_analista(f"Analista {i}", f"a{i}@x.com") for i in range(50)]
+    df = pd.DataFrame({
+        "Email": [f"a{i}@x.com" for i in range(50)],
+        "Deseja fazer turnos de 10h?": ["Sim, integral"] * 50,
+        "Datas que não pode trabalhar": ["10/03, 11/03"] * 50,
+    })
+    id_tarefa = tarefas.enviar("importar_formulario", planilha=importacao.planilha_para_json(df), ts_agora="2026-03-01 10:00:00")
+    fim = time.monotonic() + 30
+    while tarefas.status(id_tarefa)["status"] in tarefas.ATIVAS and time.monotonic() < fim:
+        time.sleep(0.05)
+
+    estado = tarefas.status(id_tarefa)
+    assert estado["status"] == "concluida", estado["erro"]
+    assert tarefas.resultado(id_tarefa)["datas"] == 100
+    conn = db.get_read_connection()
+    try:
+        prefs = {linha["pref_turno"] for linha in db.run_query(conn, "SELECT pref_turno FROM analistas").fetchall()}
+    finally:
+        conn.close()
+    assert prefs == {"Integral"} and len(ids) == 50
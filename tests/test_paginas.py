@@ -0,0 +1,24 @@
+import os
+from datetime import date
+
+from streamlit.testing.v1 import AppTest
+
+from escala import db
+
+PAGINAS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages")
+
+
+def test_configuracoes_com_limite_fora_das_opcoes(criar_ciclo):
+    criar_ciclo("C1", date(2026, 1, 5))
+    conn = db.get_db_connection()
+    try:
+        db.run_query(conn, "INSERT INTO configuracao_limites (chave, valor) VALUES ('max_horas_ciclo', 40)")
+        conn.commit()
+    finally:
+        conn.close()
+
+    at = AppTest.from_file(os.path.join(PAGINAS, "Configuracoes.py"), default_timeout=60).run()
+    assert not at.exception
+    limites = at.multiselect(key="limites_sim")
+    # O limite salvo (40) nao esta nas opcoes fixas: entra nelas para poder ser o padrao
+    assert limites.value == [40] and "40" in limites.options
@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+import zipfile
+from datetime import date
+
+import pandas as pd
+
+from escala import dados, db, manutencao, tarefas
+
+_liberar = threading.Event()
+
+
+@tarefas.tipo("teste_somar")
+def _somar(andamento, a, b):
+    andamento(0.5, "somando", forcar=True)
+    return {"soma": a + b}
+
+
+@tarefas.tipo("teste_esperar")
+def _esperar(andamento):
+    # Gira ate o teste liberar; o cancelamento chega por andamento()
+    while not _liberar.wait(0.02):
+        andamento(0.1, "esperando", forcar=True)
+    return {}
+
+
+def esperar_fim(id_tarefa, limite=10):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        estado = tarefas.status(id_tarefa)
+        if estado["status"] not in tarefas.ATIVAS:
+            return estado
+        time.sleep(0.02)
+    raise AssertionError(f"tarefa {id_tarefa} nao terminou: {tarefas.status(id_tarefa)}")
+
+
+def test_ciclo_de_vida_ate_concluida(banco):
+    id_tarefa = tarefas.enviar("teste_somar", a=2, b=3)
+    estado = esperar_fim(id_tarefa)
+    assert estado["status"] == "concluida" and estado["progresso"] == 1
+    assert tarefas.resultado(id_tarefa) == {"soma": 5}
+    # Ja executada: nao roda de novo
+    assert tarefas.executar(id_tarefa) is None
+
+
+def test_cancelar_em_execucao(banco):
+    _liberar.clear()
+    id_tarefa = tarefas.enviar("teste_esperar")
+    while tarefas.status(id_tarefa)["status"] != "executando":
+        time.sleep(0.02)
+    tarefas.cancelar(id_tarefa)
+    try:
+        assert esperar_fim(id_tarefa)["status"] == "cancelada"
+    finally:
+        _liberar.set()
+
+
+def test_erro_fica_registrado(banco):
+    id_tarefa = tarefas.enviar("teste_somar", a=1)
+    estado = esperar_fim(id_tarefa)
+    assert estado["status"] == "erro" and estado["erro"]
+
+
+def test_progresso_nao_muda_versoes(banco):
+    antes = db._ler_versoes()
+    esperar_fim(tarefas.enviar("teste_somar", a=1, b=1))
+    assert db._ler_versoes() == antes
+
+
+def test_exportacao_grava_zip_e_limpeza_apaga(criar_ciclo):
+    id_ciclo, colunas = criar_ciclo("C1", date(2026, 1, 5))
+    conn = db.get_db_connection()
+    try:
+        dados.salvar_escala_historico(conn, id_ciclo, pd.DataFrame({"Ana": ["Manha"] * len(colunas)}, index=colunas).T)
+        conn.commit()
+    finally:
+        conn.close()
+
+    id_tarefa = tarefas.enviar("exportar_escalas", ids_ciclo=[id_ciclo])
+    assert esperar_fim(id_tarefa)["status"] == "concluida"
+    resultado = tarefas.resultado(id_tarefa)
+    assert resultado["ciclos"] == 1
+    assert zipfile.ZipFile(resultado["arquivo"]).namelist() == ["escala_C1.xlsx"]
+
+    conn = db.get_db_connection()
+    try:
+        db.run_query(conn, "UPDATE tarefas SET concluida_em = '2000-01-01 00:00:00'")
+        assert manutencao.executar(conn)["tarefas"] == 1
+    finally:
+        conn.close()
+    assert not os.path.exists(resultado["arquivo"])
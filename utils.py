@@ -1,110 +1,158 @@
+"""
+Adaptador Streamlit dos carregadores de dados.
+
+As funcoes ficam em escala/dados.py (sem Streamlit); aqui so ligamos o st.cache_data
+nas leituras que as paginas repetem a cada rerun.
+
+Cada leitura em cache declara as tabelas que le (cache_por_tabelas). A versao
+dessas tabelas (escala.db.versoes, incrementada por toda escrita) entra na chave:
+salvar um analista invalida so o que le analistas, sem st.cache_data.clear().
+Dados de referencia (analistas, regras de staff, horas por turno, feriados) usam
+o cache compartilhado do escala/cache.py, que pode ser dividido entre replicas.
+"""
+import functools
+import threading
+
 import streamlit as st
-import pandas as pd
-import io
-from openpyxl.worksheet.datavalidation import DataValidation
-import database
-import sqlite3
-import random
-from datetime import datetime, timedelta
-
-# Regras globais de qualidade
-REGRAS_QUALIDADE = {
-    "min_experientes_por_turno": 1,
-    "niveis_experientes": ["Senior", "Especialista", "Pleno"]
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from escala import assincrono as _assincrono
+from escala import cache as _cache
+from escala import dados as _dados
+from escala import db as _db
+from escala import tarefas as _tarefas
+from escala.dados import (
+    REGRAS_QUALIDADE,
+    SKILLS,
+    load_skill_rules_from_db,
+    load_max_hours_limit,
+    load_rest_rules_from_db,
+    carregar_dias_ciclo,
+    carregar_escala_salva,
+    carregar_matriz_salva,
+    carregar_revisao,
+    carregar_saldo_anterior,
+    carregar_sobreaviso,
+    pagina_ausencias,
+    pagina_indisponibilidades,
+    registrar_indisponibilidades,
+    pagina_sobreaviso,
+    salvar_escala_historico,
+    ConflitoDeRevisao,
+    diferencas_escala,
+    mesclar_escalas,
+    to_excel,
+)
+
+_carregadores = {}
+
+
+# Entradas de versoes antigas ficam inalcancaveis e saem pelo ttl/max_entries
+@st.cache_data(ttl=3600, max_entries=256)
+def _ler_em_cache(nome, dsn, versoes, args, kwargs):
+    return _carregadores[nome](*args, **kwargs)
+
+
+def cache_por_tabelas(*tabelas):
+    # Um st.cache_data so para todos (funcoes internas iguais teriam a mesma chave no Streamlit)
+    def decorador(func):
+        nome = f"{func.__module__}.{func.__qualname__}"
+        _carregadores[nome] = func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # dsn na chave: cada equipe (particao) tem as proprias entradas
+            return _ler_em_cache(nome, _db.get_dsn(), _db.versoes(tabelas), args, kwargs)
+        wrapper.tabelas = tabelas
+        return wrapper
+    return decorador
+
+
+# Referencia: cache compartilhado entre sessoes (e replicas, com ESCALA_CACHE apontando para um arquivo)
+carregar_analistas_ativos = _cache.compartilhado("analistas")(_dados.carregar_analistas_ativos)
+load_staff_rules_from_db = _cache.compartilhado("regras_staff")(_dados.load_staff_rules_from_db)
+load_shift_hours_from_db = _cache.compartilhado("configuracao_turnos")(_dados.load_shift_hours_from_db)
+carregar_feriados_mestre = _cache.compartilhado("feriados_anuais")(_dados.carregar_feriados_mestre)
+
+carregar_dados_locais = cache_por_tabelas("analistas", "indisponibilidades")(_dados.carregar_dados_locais)
+_carregar_pacote_ciclo = cache_por_tabelas(
+    "ciclos", "ciclo_dias", "analistas", "indisponibilidades", "ausencias", "sobreaviso", "escala_salva")(_dados.carregar_pacote_ciclo)
+
+
+def carregar_pacote_ciclo(id_ciclo):
+    return _carregar_pacote_ciclo(int(id_ciclo))
+
+
+def carregar_em_paralelo(tarefas, ignorar_erros=False):
+    # escala.assincrono.carregar_tudo com o contexto do rerun ligado em cada thread
+    # (sem ele o st.cache_data avisa "missing ScriptRunContext" e nao ve a sessao)
+    ctx = get_script_run_ctx()
+
+    def ligar_contexto():
+        add_script_run_ctx(threading.current_thread(), ctx)
+
+    return _assincrono.carregar_tudo(tarefas, ignorar_erros, inicializar=ligar_contexto if ctx else None)
+
+
+def estado_paginacao(chave, filtros):
+    """
+    Pilha de cursores (keyset) da lista paginada `chave` na sessao. O topo e o cursor
+    da pagina visivel; filtros diferentes dos da ultima vez voltam para a primeira pagina.
+    """
+    estado = st.session_state.setdefault(f"paginacao_{chave}", {"filtros": None, "cursores": [None]})
+    if estado["filtros"] != filtros:
+        estado["filtros"] = filtros
+        estado["cursores"] = [None]
+    return estado
+
+
+def controles_paginacao(chave, estado, proximo):
+    col_anterior, col_pagina, col_proxima = st.columns([1, 2, 1])
+    if col_anterior.button("◀ Anterior", key=f"{chave}_anterior", disabled=len(estado["cursores"]) == 1):
+        estado["cursores"].pop()
+        st.rerun()
+    col_pagina.caption(f"Página {len(estado['cursores'])}")
+    if col_proxima.button("Próxima ▶", key=f"{chave}_proxima", disabled=proximo is None):
+        estado["cursores"].append(proximo)
+        st.rerun()
+
+
+ROTULOS_STATUS_TAREFA = {
+    "pendente": "⏳ Na fila",
+    "executando": "⚙️ Executando",
+    "concluida": "✅ Concluída",
+    "erro": "❌ Erro",
+    "cancelada": "🚫 Cancelada",
 }
 
-@st.cache_data(ttl=60)
-def carregar_dados_locais():
-    database.init_all_db_tables()
-    conn = database.get_db_connection()
-    try:
-        # CORREÇÃO AQUI: Mudamos 'WHERE ativo = 1' para 'WHERE ativo'
-        # Isso funciona tanto no SQLite (1) quanto no Postgres (TRUE)
-        query = """
-                SELECT id, \
-                       nome, \
-                       email, \
-                       nivel, \
-                       data_admissao, \
-                       ativo, \
-                       skill_cplug, \
-                       skill_dd, \
-                       pref_dia, \
-                       pref_turno
-                FROM analistas
-                WHERE ativo
-                ORDER BY nome \
-                """
-        df_analistas = pd.read_sql_query(query, conn)
-        # Remove colunas duplicadas se houver
-        df_analistas = df_analistas.loc[:, ~df_analistas.columns.duplicated()]
-
-        df_indisp = pd.read_sql_query("SELECT * FROM indisponibilidades", conn)
-        conn.close()
-        return df_analistas, df_indisp
-    except Exception as e:
-        # st.error(f"Erro ao carregar dados: {e}") 
-        try: conn.close()
-        except: pass
-        return pd.DataFrame(), pd.DataFrame()
-
-def load_staff_rules_from_db():
-    conn = database.get_db_connection()
-    regras = {}
-    padrao = {
-        "Sabado":  {"Manha": 5, "Noite": 4, "Integral": 1}, 
-        "Domingo": {"Manha": 4, "Noite": 3, "Integral": 1},
-        "Feriado": {"Manha": 5, "Noite": 4, "Integral": 1}
-    }
-    try:
-        df = pd.read_sql_query("SELECT dia_tipo, turno, quantidade FROM regras_staff", conn)
-        if df.empty: return padrao
-        for _, row in df.iterrows():
-            if row['dia_tipo'] not in regras: regras[row['dia_tipo']] = {}
-            regras[row['dia_tipo']][row['turno']] = row['quantidade']
-        for dia, turnos in padrao.items():
-            if dia not in regras: regras[dia] = turnos
-            else:
-                for turno, qtd in turnos.items():
-                    if turno not in regras[dia]: regras[dia][turno] = qtd
-        return regras
-    except:
-        return padrao
-    finally:
-        conn.close()
-
-def load_shift_hours_from_db():
-    conn = database.get_db_connection()
-    padrao = {"Manha": 5.5, "Noite": 5.0, "Integral": 10.0}
-    try:
-        df = pd.read_sql_query("SELECT turno, horas FROM configuracao_turnos", conn)
-        if df.empty: return padrao
-        return dict(zip(df['turno'], df['horas']))
-    except:
-        return padrao
-    finally:
-        conn.close()
-
-def load_max_hours_limit():
-    conn = database.get_db_connection()
-    try:
-        df = pd.read_sql_query("SELECT valor FROM configuracao_limites WHERE chave='max_horas_ciclo'", conn)
-        if df.empty: return 30.0
-        return float(df.iloc[0]['valor'])
-    except:
-        return 30.0
-    finally:
-        conn.close()
-
-def to_excel(df):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Escala', index=True)
-        ws = writer.sheets['Escala']
-        opcoes = ["FOLGA", "Manha", "Noite", "Integral", "Ferias"]
-        formula = f'"{",".join(opcoes)}"'
-        dv = DataValidation(type="list", formula1=formula, allow_blank=True)
-        if ws.max_row > 2: 
-            dv.add(f"B2:{ws.cell(ws.max_row - 2, ws.max_column).coordinate}")
-            ws.add_data_validation(dv)
-    return output.getvalue()
+
+def painel_tarefas(tipos, mostrar_resultado=None, limite=3):
+    """
+    Ultimas tarefas de fundo (escala/tarefas.py) dos tipos pedidos. O fragmento se atualiza
+    sozinho a cada 2s sem rerodar a pagina; a tarefa segue no servidor mesmo se a aba fechar.
+    mostrar_resultado(id_tarefa, resultado): desenha o resultado de uma tarefa concluida.
+    """
+    # O rerun do fragmento nao passa pelo Sistema.py (nem ve a equipe da sessao): vai como argumento
+    _painel_tarefas(_db.equipe_atual(), tipos, mostrar_resultado, limite)
+
+
+@st.fragment(run_every=2)
+def _painel_tarefas(equipe, tipos, mostrar_resultado, limite):
+    with _db.na_equipe(equipe):
+        df_tarefas = _tarefas.listar(tipos, limite)
+        # Resultado nao muda depois de concluida: le do banco uma vez por sessao (ids se repetem entre equipes)
+        resultados = st.session_state.setdefault("resultados_tarefas", {})
+        for tarefa in df_tarefas.itertuples(index=False):
+            with st.container(border=True):
+                st.markdown(f"**#{tarefa.id}** {ROTULOS_STATUS_TAREFA.get(tarefa.status, tarefa.status)} · {tarefa.criada_em}")
+                if tarefa.status in _tarefas.ATIVAS:
+                    st.progress(min(max(float(tarefa.progresso or 0), 0.0), 1.0), text=tarefa.mensagem or None)
+                    if st.button("Cancelar", key=f"cancelar_tarefa_{tarefa.id}"):
+                        _tarefas.cancelar(tarefa.id)
+                elif tarefa.status == "erro":
+                    st.error(tarefa.erro)
+                elif tarefa.status == "concluida" and mostrar_resultado is not None:
+                    chave = (equipe, tarefa.id)
+                    if chave not in resultados:
+                        resultados[chave] = _tarefas.resultado(tarefa.id)
+                    mostrar_resultado(tarefa.id, resultados[chave])